@@ -2,7 +2,7 @@ import shutil
 import pytest
 from pathlib import Path
 
-from virtool_workflow.analysis.fastqc import fastqc
+from virtool_workflow.analysis.fastqc import fastqc, parse_fastqc, parse_fastqc_data
 from virtool_workflow.analysis.utils import make_read_paths
 
 
@@ -18,3 +18,83 @@ async def test_correct_fastqc(tmpdir, run_subprocess, run_in_executor, data_regr
     out = await run(make_read_paths(work_path, True))
 
     data_regression.check(out)
+
+
+FASTQC_DATA = """##FastQC\t0.11.9
+>>Basic Statistics\tpass
+#Measure\tValue
+Filename\treads_{suffix}.fq.gz
+File type\tConventional base calls
+Encoding\tSanger / Illumina 1.9
+Total Sequences\t{count}
+Sequences flagged as poor quality\t0
+Sequence length\t{length}
+%GC\t{gc}
+>>END_MODULE
+>>Per base sequence quality\tpass
+#Base\tMean\tMedian\tLower Quartile\tUpper Quartile\t10th Percentile\t90th Percentile
+1\t{quality}.5\t34.0\t31.0\t34.0\t30.0\t34.0
+2-3\t30.2\tNaN\tNaN\tNaN\tNaN\tNaN
+>>END_MODULE
+>>Per tile sequence quality\tpass
+#Tile\tBase\tMean
+1101\t1\t0.5
+>>END_MODULE
+>>Per sequence quality scores\tpass
+#Quality\tCount
+30\t{count}.0
+>>END_MODULE
+>>Per base sequence content\tpass
+#Base\tG\tA\tT\tC
+1\t25.1\t24.9\t25.0\t25.0
+2-3\tNaN\tNaN\tNaN\tNaN
+>>END_MODULE
+"""
+
+
+@pytest.fixture
+def fastqc_output(tmpdir):
+    fastqc_path = Path(tmpdir) / "fastqc"
+
+    for suffix, count, gc, quality in ((1, 100, 48, 33), (2, 50, 50, 35)):
+        path = fastqc_path / f"reads_{suffix}_fastqc"
+        path.mkdir(parents=True)
+
+        path.joinpath("fastqc_data.txt").write_text(FASTQC_DATA.format(
+            suffix=suffix,
+            count=count,
+            length="2-3",
+            gc=gc,
+            quality=quality
+        ))
+
+    return fastqc_path
+
+
+def test_parse_fastqc_data(fastqc_output):
+    fastqc = parse_fastqc_data(fastqc_output / "reads_1_fastqc" / "fastqc_data.txt")
+
+    assert fastqc == {
+        "count": 100,
+        "encoding": "Sanger / Illumina 1.9\n",
+        "length": [2, 3],
+        "gc": 48.0,
+        "bases": [[33, 34, 31, 34, 30, 34], [30] * 6, [30] * 6],
+        "sequences": [0] * 30 + [100] + [0] * 19,
+        "composition": [[25, 24, 25, 25], [0] * 4, [0] * 4]
+    }
+
+
+def test_parse_fastqc(fastqc_output, tmpdir):
+    sample_path = Path(tmpdir) / "sample"
+    sample_path.mkdir()
+
+    fastqc = parse_fastqc(fastqc_output, sample_path)
+
+    assert not fastqc_output.exists()
+    assert {path.name for path in sample_path.iterdir()} == {"fastqc_1.txt", "fastqc_2.txt"}
+
+    assert fastqc["count"] == 150
+    assert fastqc["gc"] == 49.0
+    assert fastqc["bases"][0] == [34.0, 34.0, 31.0, 34.0, 30.0, 34.0]
+    assert fastqc["sequences"][30] == 150
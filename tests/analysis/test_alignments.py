@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.alignments import (AlignmentAccumulator,
+                                                  Alignments,
+                                                  SequenceTable,
+                                                  parse_sam,
+                                                  run_bowtie2)
+
+HEADER = "@HD\tVN:1.0\tSO:unsorted\n@SQ\tSN:seq_a\tLN:100\n@SQ\tSN:seq_b\tLN:200\n@SQ\tSN:seq_c\tLN:300\n"
+
+LINES = [
+    # A read that aligns to two sequences in different OTUs.
+    "read_1\t0\tseq_a\t11\t1\t10M2D5M\t*\t0\t0\tACGT\tIIII\tAS:i:-5\tXS:i:-5",
+    "read_1\t256\tseq_c\t21\t255\t15M\t*\t0\t0\t*\t*\tXS:i:-5\tAS:i:-10",
+    # A read that aligns uniquely.
+    "read_2\t16\tseq_b\t1\t42\t3S12M1I2=1X\t*\t0\t0\tACGT\tIIII\tAS:i:12",
+    # An unaligned read.
+    "read_3\t4\t*\t0\t0\t*\t*\t0\t0\tACGT\tIIII\tYT:Z:UU",
+    # A read that aligns twice to the same sequence and has no optional fields.
+    "read_4\t0\tseq_b\t5\t1\t4M\t*\t0\t0\tACGT\tIIII",
+    "read_4\t256\tseq_b\t50\t1\t4M\t*\t0\t0\tACGT\tIIII",
+]
+
+
+@pytest.fixture
+def table():
+    return SequenceTable.create(
+        {"seq_a": "otu_1", "seq_b": "otu_1", "seq_c": "otu_2"},
+        {"seq_a": 100, "seq_b": 200, "seq_c": 300}
+    )
+
+
+@pytest.fixture
+def sam():
+    return (HEADER + "\n".join(LINES) + "\n").encode()
+
+
+def check(alignments):
+    assert alignments.read_count == 4
+
+    assert alignments.reads.tolist() == [0, 0, 1, 3, 3]
+    assert alignments.sequences.tolist() == [0, 2, 1, 1, 1]
+    assert alignments.positions.tolist() == [10, 20, 0, 4, 49]
+    assert alignments.spans.tolist() == [17, 15, 15, 4, 4]
+    assert alignments.scores.tolist() == [-5, -10, 12, 0, 0]
+
+    assert alignments.sequence_counts.tolist() == [1, 3, 1]
+    assert alignments.otu_counts.tolist() == [3, 1]
+
+
+@pytest.mark.parametrize("block_size", [1, 17, 1024])
+def test_parse_sam(block_size, sam, table, tmp_path):
+    path = tmp_path / "alignments.sam"
+    path.write_bytes(sam)
+
+    check(parse_sam(path, table, block_size))
+
+
+def test_unterminated(sam, table):
+    accumulator = AlignmentAccumulator(table)
+
+    accumulator.add(sam[:-1])
+    accumulator.flush()
+
+    check(accumulator.result())
+
+
+def test_read_groups(sam, table):
+    accumulator = AlignmentAccumulator(table)
+    accumulator.add(sam)
+
+    alignments = accumulator.result()
+
+    reads, offsets, sequences = alignments.get_read_groups()
+
+    assert reads.tolist() == [0, 1, 3]
+    assert offsets.tolist() == [0, 2, 3, 4]
+    assert sequences.tolist() == [0, 2, 1, 1]
+
+    reads, offsets, sequences = alignments.get_read_groups(multimapping=True)
+
+    assert reads.tolist() == [0]
+    assert offsets.tolist() == [0, 2]
+    assert sequences.tolist() == [0, 2]
+
+
+@pytest.mark.parametrize("line", [
+    "read_1\t0\tseq_d\t1\t1\t4M\t*\t0\t0\tACGT\tIIII",
+    "read_1\t0\tseq_a\t1\t1\t4M",
+])
+def test_invalid(line, table):
+    accumulator = AlignmentAccumulator(table)
+
+    with pytest.raises(ValueError):
+        accumulator.add(f"{line}\n".encode())
+
+
+async def test_run_bowtie2(sam, table, tmp_path, run_subprocess):
+    sam_path = tmp_path / "input.sam"
+    sam_path.write_bytes(sam)
+
+    # Stand in for Bowtie2 by copying SAM data to the path given with -S.
+    alignments = await run_bowtie2(["sh", "-c", f'cat {sam_path} > "$2"', "sh"], table, tmp_path, run_subprocess)
+
+    check(alignments)
+
+    assert not (tmp_path / "alignments.sam").exists()
+
+
+def test_save(sam, table, tmp_path):
+    accumulator = AlignmentAccumulator(table)
+    accumulator.add(sam)
+
+    accumulator.result().save(tmp_path / "alignments.npz")
+
+    check(Alignments.load(tmp_path / "alignments.npz", table))
+
+    with pytest.raises(ValueError):
+        Alignments.load(tmp_path / "alignments.npz", SequenceTable.create({"foo": "bar"}, {"foo": 10}))
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.alignments import Alignments, SequenceTable
+from virtool_workflow.analysis.coverage import calculate_coverage
+
+
+@pytest.fixture
+def alignments():
+    table = SequenceTable.create(
+        {"seq_a": "otu_1", "seq_b": "otu_1", "seq_c": "otu_2"},
+        {"seq_a": 10, "seq_b": 1000000, "seq_c": 8}
+    )
+
+    return Alignments(
+        table,
+        4,
+        reads=np.array([0, 0, 1, 2, 3], dtype=np.int32),
+        sequences=np.array([2, 0, 2, 0, 2], dtype=np.int32),
+        positions=np.array([0, 2, 2, 5, 6], dtype=np.int32),
+        spans=np.array([4, 4, 2, 10, 4], dtype=np.int32),
+        scores=np.zeros(5, dtype=np.int32)
+    )
+
+
+def test_calculate_coverage(alignments):
+    coverage = calculate_coverage(alignments)
+
+    # No depth array is allocated for seq_b.
+    assert coverage.sequences.tolist() == [0, 2]
+    assert len(coverage.depth) == 18
+    assert "seq_b" not in coverage
+    assert "seq_a" in coverage
+
+    assert coverage.get_depth("seq_a").tolist() == [0, 0, 1, 1, 1, 2, 1, 1, 1, 1]
+    assert coverage.get_depth(2).tolist() == [1, 1, 2, 2, 0, 0, 1, 1]
+
+    assert coverage.breadth.tolist() == [0.8, 0.75]
+    assert coverage.mean_depth.tolist() == [0.9, 1.0]
+
+    with pytest.raises(KeyError):
+        coverage.get_depth("seq_b")
+
+
+def test_selected(alignments):
+    coverage = calculate_coverage(alignments, np.array([True, False, True, False, False]))
+
+    assert coverage.sequences.tolist() == [2]
+    assert coverage.get_depth("seq_c").tolist() == [1, 1, 2, 2, 0, 0, 0, 0]
+
+
+def test_compression(alignments):
+    coverage = calculate_coverage(alignments)
+
+    starts, values = coverage.get_run_lengths("seq_a")
+
+    assert starts.tolist() == [0, 2, 5, 6]
+    assert values.tolist() == [0, 1, 2, 1]
+
+    assert coverage.get_coordinates("seq_a") == [(0, 0), (1, 0), (2, 1), (4, 1), (5, 2), (6, 1), (9, 1)]
@@ -0,0 +1,105 @@
+import gzip
+import random
+
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.depletion import (BloomFilter,
+                                                 build_bloom_filter,
+                                                 deplete_reads,
+                                                 get_bloom_path)
+from virtool_workflow.analysis.fastq import read_fastq
+from virtool_workflow.data_model.subtractions import NucleotideComposition, Subtraction
+
+
+def random_sequence(length: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+HOST = random_sequence(20000, 1)
+VIRUS = random_sequence(5000, 2)
+
+
+@pytest.fixture
+def subtraction(tmp_path):
+    path = tmp_path / "subtractions" / "foo"
+    path.mkdir(parents=True)
+
+    with gzip.open(path / "subtraction.fa.gz", "wt") as f:
+        f.write(f">chr1\n{HOST[:12000]}\n>chr2\n{HOST[12000:]}\n")
+
+    return Subtraction("foo", "Foo", "", 2, NucleotideComposition(), path)
+
+
+def write_reads(path, reads):
+    with gzip.open(path, "wt") as f:
+        for name, read in reads:
+            f.write(f"@{name}\n{read}\n+\n{'I' * len(read)}\n")
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter.create(1000, k=21)
+
+    assert bloom_filter.size == 8192
+
+    kmers = np.arange(0, 2000, 2, dtype=np.uint64)
+
+    bloom_filter.add(kmers)
+
+    assert bloom_filter.contains(kmers).all()
+    assert bloom_filter.contains(kmers + np.uint64(1)).mean() < 0.1
+
+
+def test_build_bloom_filter(subtraction):
+    path = get_bloom_path(subtraction)
+
+    bloom_filter = build_bloom_filter(subtraction.fasta_path, path)
+
+    assert path.name == "subtraction.k31.bloom"
+    assert isinstance(bloom_filter.bits, np.memmap)
+
+    loaded = BloomFilter.load(path)
+
+    assert loaded.k == 31
+    assert np.array_equal(loaded.bits, bloom_filter.bits)
+
+
+@pytest.mark.parametrize("paired", [False, True])
+async def test_deplete_reads(paired, subtraction, tmp_path):
+    host = [(f"host_{i}", HOST[i:i + 100]) for i in range(0, 19900, 100)]
+    virus = [(f"virus_{i}", VIRUS[i:i + 100]) for i in range(0, 4900, 100)]
+
+    # The reverse complement of a host read is still host. Short reads can't be judged and are kept.
+    host.append(("host_rc", HOST[500:600][::-1].translate(str.maketrans("ACGT", "TGCA"))))
+    short = [("short", HOST[:20])]
+
+    reads = host + virus + short
+
+    random.Random(3).shuffle(reads)
+
+    read_paths = [tmp_path / "reads_1.fq.gz"]
+    write_reads(read_paths[0], reads)
+
+    if paired:
+        # Pairs are only removed if both reads are host.
+        mates = [(name, VIRUS[:100] if name == "host_0" else read) for name, read in reads]
+
+        read_paths.append(tmp_path / "reads_2.fq.gz")
+        write_reads(read_paths[1], mates)
+
+    depletion = await deplete_reads([subtraction], tuple(read_paths), tmp_path / "depleted", processes=2)
+
+    assert get_bloom_path(subtraction).is_dir()
+
+    assert depletion.count == len(reads)
+    assert depletion.depleted == len(host) - paired
+
+    assert [path.name for path in depletion.read_paths] == [path.name for path in read_paths]
+
+    for read_path in depletion.read_paths:
+        names = [bytes(record.name).decode() for record in read_fastq(read_path)]
+
+        expected = [name for name, _ in reads if not name.startswith("host") or (paired and name == "host_0")]
+
+        assert names == expected
@@ -0,0 +1,97 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.fastq import (read_fastq,
+                                             read_fastq_batches,
+                                             read_fastq_blocks,
+                                             read_paired_fastq,
+                                             split_fastq_block)
+
+RECORDS = [
+    (b"read_0", b"GGCCA", b"IIIII"),
+    (b"read_1 extra", b"GATTN", b"IIII#"),
+    (b"read_2", b"ACGT", b"5555"),
+]
+
+
+def make_fastq(records) -> bytes:
+    return b"".join(b"@%s\n%s\n+\n%s\n" % record for record in records)
+
+
+@pytest.fixture
+def fastq_path(tmp_path):
+    path = tmp_path / "reads_1.fq.gz"
+
+    with gzip.open(path, "wb") as f:
+        f.write(make_fastq(RECORDS))
+
+    return path
+
+
+@pytest.mark.parametrize("block_size", [7, 1024])
+def test_read_fastq(block_size, fastq_path):
+    records = list(read_fastq(fastq_path, block_size))
+
+    assert all(isinstance(field, memoryview) for record in records for field in record)
+    assert [tuple(bytes(field) for field in record) for record in records] == RECORDS
+
+
+def test_read_fastq_uncompressed(tmp_path):
+    path = tmp_path / "reads_1.fastq"
+    path.write_bytes(make_fastq(RECORDS).rstrip())
+
+    assert [bytes(record.sequence) for record in read_fastq(path)] == [b"GGCCA", b"GATTN", b"ACGT"]
+
+
+def test_read_fastq_blocks(fastq_path):
+    blocks = list(read_fastq_blocks(fastq_path, 30))
+
+    assert sum(len(block) for block in blocks) == 3
+    assert b"".join(block.data for block in blocks) == make_fastq(RECORDS)
+
+
+@pytest.mark.parametrize("data,message", [
+    (b">read_0\nACGT\n+\nIIII\n", "'@'"),
+    (b"@read_0\nACGT\n+\nIII\n", "different lengths"),
+])
+def test_malformed(data, message):
+    with pytest.raises(ValueError, match=message):
+        split_fastq_block(data)
+
+
+def test_incomplete(tmp_path):
+    path = tmp_path / "reads_1.fastq"
+    path.write_bytes(make_fastq(RECORDS) + b"@read_3\nACGT\n")
+
+    with pytest.raises(ValueError, match="incomplete"):
+        list(read_fastq(path))
+
+
+def test_read_paired_fastq(fastq_path, tmp_path):
+    right_path = tmp_path / "reads_2.fastq"
+    right_path.write_bytes(make_fastq([(name, sequence[::-1], quality) for name, sequence, quality in RECORDS]))
+
+    pairs = list(read_paired_fastq(fastq_path, right_path, 16))
+
+    assert [(bytes(left.name), bytes(right.sequence)) for left, right in pairs] == [
+        (b"read_0", b"ACCGG"),
+        (b"read_1 extra", b"NTTAG"),
+        (b"read_2", b"TGCA"),
+    ]
+
+    right_path.write_bytes(make_fastq(RECORDS[:2]))
+
+    with pytest.raises(ValueError, match="different numbers"):
+        list(read_paired_fastq(fastq_path, right_path))
+
+
+def test_read_fastq_batches(fastq_path):
+    batch, = read_fastq_batches(fastq_path)
+
+    assert len(batch) == 3
+    assert batch.lengths.tolist() == [5, 5, 4]
+    assert batch.sequences.dtype == np.uint8
+    assert batch.sequences.tobytes() == b"GGCCAGATTNACGT\x00"
+    assert batch.qualities[2].tobytes() == b"5555\x00"
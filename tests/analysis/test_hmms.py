@@ -1,10 +1,26 @@
+import json
+import os
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
 
 import pytest
 import shutil
 
-from virtool_workflow.analysis.hmms import hmms
+from virtool_workflow.abc.data_providers import AbstractHMMsProvider
+from virtool_workflow.analysis.hmms import (HMMAnnotations,
+                                            HMMHit,
+                                            HMMs,
+                                            get_profiles_digest,
+                                            hmms,
+                                            load_pressed_profiles,
+                                            parse_domtblout,
+                                            search_hmms,
+                                            split_fasta)
 from virtool_workflow.api.hmm import HMMsProvider
+from virtool_workflow.data_model import HMM
+from virtool_workflow.execution.threads import ThreadAllocator
 
 
 @pytest.fixture
@@ -20,9 +36,200 @@ async def test_hmms(http, jobs_api_url, run_in_executor, run_subprocess, tmpdir)
     provider = HMMsProvider(http, jobs_api_url, work_path)
 
     try:
-        await hmms(provider, work_path, run_subprocess)
+        await hmms(provider, work_path, run_subprocess, ThreadAllocator(1))
     except FileNotFoundError as e:
         if "hmmpress" in e.args[0]:
             raise RuntimeError("hmmpress not installed.")
         else:
             raise e
+
+
+def create_hmm(hmm_id: str, cluster: int, families: dict, genera: dict) -> HMM:
+    return HMM(hmm_id, cluster, 10, [], families, genera, False, 100 + cluster, 0.5, 50.0, ("foo", "bar", "baz"))
+
+
+def test_hmm_annotations():
+    annotations = HMMs([
+        create_hmm("a", 7, {"Geminiviridae": 3, "None": 1}, {"Begomovirus": 3}),
+        create_hmm("b", 2, {"Potyviridae": 2}, {}),
+        create_hmm("c", 5, {"Geminiviridae": 1}, {"Curtovirus": 1})
+    ], Path("hmms")).annotations
+
+    assert isinstance(annotations, HMMAnnotations)
+    assert len(annotations) == 3
+
+    assert annotations.get_positions(np.array([5, 7, 4, 2, 7, 9, 1])).tolist() == [2, 0, -1, 1, 0, -1, -1]
+    assert annotations.get_ids(np.array([2, 3, 7])).tolist() == ["b", None, "a"]
+
+    assert annotations.get_position("c") == 2
+
+    with pytest.raises(KeyError):
+        annotations.get_position("d")
+
+    assert annotations.get_family_positions("Geminiviridae").tolist() == [0, 2]
+    assert annotations.get_family_positions("Picornaviridae").tolist() == []
+
+    assert annotations.get_families(0) == {"Geminiviridae": 3, "None": 1}
+    assert annotations.get_genera(1) == {}
+    assert annotations.get_names(1) == ("foo", "bar", "baz")
+
+    # Strings are interned once.
+    assert annotations.strings.count("Geminiviridae") == 1
+
+    assert annotations.lengths.tolist() == [107, 102, 105]
+
+
+class MockHMMsProvider(AbstractHMMsProvider):
+
+    def __init__(self, path: Path, profiles: bytes, etag: Optional[str]):
+        self.path = path
+        self.profiles = profiles
+        self.etag = etag
+        self.downloads = 0
+
+    async def get(self, hmm_id: str):
+        ...
+
+    async def hmm_list(self):
+        return []
+
+    async def get_profiles(self, etag: Optional[str] = None) -> Optional[Path]:
+        if etag is not None and etag == self.etag:
+            return None
+
+        self.downloads += 1
+        self.profiles_etag = self.etag
+
+        (self.path / "profiles.hmm").write_bytes(self.profiles)
+
+        return self.path / "profiles.hmm"
+
+
+@pytest.fixture
+def hmmpress(monkeypatch, tmp_path):
+    """Put a stand-in for hmmpress on the ``PATH`` that records each run."""
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+
+    script_path = bin_path / "hmmpress"
+    script_path.write_text(f'#!/bin/sh\necho "$1" >> {tmp_path / "presses.txt"}\ntouch "$1.h3m" "$1.h3i" "$1.h3f" "$1.h3p"\n')
+    script_path.chmod(0o755)
+
+    monkeypatch.setenv("PATH", f"{bin_path}:{os.environ['PATH']}")
+
+    return tmp_path / "presses.txt"
+
+
+@pytest.mark.parametrize("etag", [None, '"abc"'])
+async def test_load_pressed_profiles(etag, hmmpress, run_subprocess, tmp_path):
+    cache_path = tmp_path / "cache"
+
+    def create_provider(name: str, profiles: bytes) -> MockHMMsProvider:
+        path = tmp_path / name
+        path.mkdir()
+
+        return MockHMMsProvider(path, profiles, etag)
+
+    first = create_provider("first", b"HMMER3/f\n//\n")
+
+    path = await load_pressed_profiles(first, cache_path, run_subprocess)
+
+    assert path == cache_path / get_profiles_digest(first.path / "profiles.hmm")
+    assert sorted(child.name for child in path.iterdir()) == [
+        "profiles.hmm", "profiles.hmm.h3f", "profiles.hmm.h3i", "profiles.hmm.h3m", "profiles.hmm.h3p"
+    ]
+
+    # A second job reuses the pressed profiles. The profiles are only fetched again if the provider
+    # can't tell that they haven't changed.
+    second = create_provider("second", first.profiles)
+
+    assert await load_pressed_profiles(second, cache_path, run_subprocess) == path
+    assert second.downloads == (etag is None)
+    assert len(hmmpress.read_text().splitlines()) == 1
+
+    if etag:
+        assert json.loads((cache_path / "latest.json").read_text()) == {"digest": path.name, "etag": etag}
+
+    # Changed profiles are pressed again.
+    third = create_provider("third", b"HMMER3/f\nNAME vFam_1\n//\n")
+    third.etag = '"def"' if etag else None
+
+    assert await load_pressed_profiles(third, cache_path, run_subprocess) != path
+    assert len(hmmpress.read_text().splitlines()) == 2
+
+    assert not list(cache_path.glob("*.tmp"))
+
+
+DOMTBLOUT = """#                                                                            --- full sequence --- -------------- this domain -------------   hmm coord   ali coord   env coord
+# target name        accession   tlen query name           accession   qlen   E-value  score  bias   #  of  c-Evalue  i-Evalue  score  bias  from    to  from    to  from    to  acc description of target
+vFam_3               -            120 orf_1                -            200   1.2e-30  104.1   0.2   1   2   1.1e-20   3.4e-18   70.2   0.1     2   118    10   130     8   132 0.95 -
+vFam_3               -            120 orf_1                -            200   1.2e-30  104.1   0.2   2   2   2.5e-10   7.6e-08   35.0   0.0     5    60   140   195   138   198 0.90 -
+vFam_7               -             80 orf_2                -             90   4.0e-05   20.3   1.1   1   1   5.0e-06   4.0e-05   20.1   1.1     1    80     3    85     1    88 0.80 Some description
+#
+# Program:         hmmscan
+"""
+
+
+def test_split_fasta(tmp_path):
+    lengths = [500, 80, 400, 120, 300, 60, 90]
+
+    fasta_path = tmp_path / "orfs.fa"
+    fasta_path.write_text("".join(f">orf_{i}\n{'M' * length}\n" for i, length in enumerate(lengths)))
+
+    shard_paths, count = split_fasta(fasta_path, tmp_path / "shards", 3)
+
+    assert count == len(lengths)
+    assert len(shard_paths) == 3
+
+    shards = [shard_path.read_text() for shard_path in shard_paths]
+
+    # Every record is written to exactly one shard and records keep their order.
+    records = [record for shard in shards for record in shard.split(">")[1:]]
+    assert sorted(records) == sorted(f"orf_{i}\n{'M' * length}\n" for i, length in enumerate(lengths))
+
+    for shard in shards:
+        names = [int(record.split("\n")[0][4:]) for record in shard.split(">")[1:]]
+        assert names == sorted(names)
+
+    sizes = [len(shard) for shard in shards]
+    assert max(sizes) - min(sizes) < 100
+
+    assert len(split_fasta(fasta_path, tmp_path / "more", 20)[0]) == len(lengths)
+
+
+def test_parse_domtblout(tmp_path):
+    path = tmp_path / "hits.domtbl"
+    path.write_text(DOMTBLOUT)
+
+    hits = parse_domtblout(path, {3: "foo"})
+
+    assert [(hit.sequence, hit.cluster, hit.hmm_id, hit.domain) for hit in hits] == [
+        ("orf_1", 3, "foo", 1),
+        ("orf_1", 3, "foo", 2),
+        ("orf_2", 7, None, 1)
+    ]
+
+    assert hits[0] == HMMHit(
+        "orf_1", 3, "foo", 1.2e-30, 104.1, 0.2, 1, 2, 1.1e-20, 3.4e-18, 70.2, 0.1, 2, 118, 10, 130, 8, 132
+    )
+
+
+@pytest.mark.skipif(shutil.which("hmmscan") is None, reason="hmmscan is not installed.")
+async def test_search_hmms(profiles_path, run_subprocess, tmp_path):
+    work_path = tmp_path / "hmms"
+    work_path.mkdir()
+
+    shutil.copy(profiles_path, work_path / "profiles.hmm")
+
+    process = await run_subprocess(["hmmpress", str(work_path / "profiles.hmm")])
+    assert process.returncode == 0
+
+    fasta_path = tmp_path / "orfs.fa"
+    fasta_path.write_text(">orf_1\nMSTNPKPQRKTKRNTNRRPQDVKFPGG\n>orf_2\nMKVLAAGIVALLLAAGCSS\n")
+
+    hmm_list = HMMs([], work_path)
+
+    hits = await search_hmms(hmm_list, fasta_path, tmp_path / "search", run_subprocess, processes=2)
+
+    assert (tmp_path / "search" / "hits.domtbl").is_file()
+    assert all(hit.sequence in ("orf_1", "orf_2") for hit in hits)
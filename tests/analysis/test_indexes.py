@@ -1,3 +1,5 @@
+import asyncio
+import gzip
 from pathlib import Path
 from typing import Sequence
 
@@ -10,6 +12,8 @@ from virtool_workflow.analysis.indexes import indexes as indexes_fixture, Index
 from virtool_workflow.api.indexes import IndexProvider
 from virtool_workflow.execution.run_in_executor import run_in_executor, thread_pool_executor
 from virtool_workflow.execution.run_subprocess import run_subprocess
+from virtool_workflow.execution.threads import ThreadAllocator
+from virtool_workflow.storage.utils import FileFetcher
 from virtool_workflow.testing.fixtures import install_as_pytest_fixtures
 
 install_as_pytest_fixtures(globals(), run_in_executor, run_subprocess, thread_pool_executor)
@@ -30,7 +34,7 @@ async def indexes_api(http: aiohttp.ClientSession, jobs_api_url: str, work_path:
 
 @pytest.fixture
 async def indexes(indexes_api: IndexProvider, work_path, run_in_executor, run_subprocess):
-    return await indexes_fixture(indexes_api, work_path, 3, run_in_executor, run_subprocess)
+    return await indexes_fixture(indexes_api, work_path, 3, run_in_executor, run_subprocess, ThreadAllocator(3))
 
 
 async def test_indexes(indexes: Sequence[Index], work_path):
@@ -68,6 +72,15 @@ class TestGetBySequenceID:
             assert message in str(exc)
 
 
+async def test_get_sequence_table(indexes):
+    table = indexes[0].get_sequence_table()
+
+    position = table.get_position(b"7h6yaube")
+
+    assert table.lengths[position] == 1074
+    assert table.otu_ids[table.sequence_otus[position]] == "pffj4lst"
+
+
 async def test_write_isolate_fasta(work_path, indexes, otu_ids, analysis_files, file_regression):
     index = indexes[0]
 
@@ -97,3 +110,49 @@ async def test_build_index(work_path, indexes, otu_ids, analysis_files, file_reg
     ]:
         async with aiofiles.open(work_path / f"isolates_1.{extension}", "rb") as f:
             file_regression.check(await f.read(), binary=True, basename=extension)
+
+
+async def test_lazy_files(tmp_path, run_in_executor, run_subprocess):
+    downloaded = []
+
+    async def download(path: Path, *names):
+        downloaded.extend(names)
+
+        for name in names:
+            if name == "reference.fa.gz":
+                with gzip.open(path / name, "wt") as f:
+                    f.write(">foo\nACGT\n")
+            else:
+                (path / name).write_text(name)
+
+        return path
+
+    index = Index(
+        "foo",
+        {},
+        None,
+        True,
+        tmp_path,
+        run_in_executor,
+        run_subprocess,
+        _files=FileFetcher(download, tmp_path)
+    )
+
+    assert await index.get_bowtie_path() == tmp_path / "reference"
+    assert sorted(downloaded) == [
+        "reference.1.bt2",
+        "reference.2.bt2",
+        "reference.3.bt2",
+        "reference.4.bt2",
+        "reference.rev.1.bt2",
+        "reference.rev.2.bt2",
+    ]
+
+    downloaded.clear()
+
+    # The FASTA file is downloaded and decompressed once.
+    assert await asyncio.gather(index.get_fasta_path(), index.get_fasta_path()) == [index.fasta_path] * 2
+    assert await index.get_bowtie_path() == tmp_path / "reference"
+
+    assert downloaded == ["reference.fa.gz"]
+    assert index.fasta_path.read_text() == ">foo\nACGT\n"
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.orfs import (STANDARD_CODE,
+                                            encode_sequences,
+                                            find_orfs,
+                                            get_codon_table,
+                                            translate,
+                                            write_orfs)
+
+# ATG AAA TTT GGG TAA CCC and its reverse complement.
+FORWARD = b"ATGAAATTTGGGTAACCC"
+REVERSE = b"GGGTTACCCAAATTTCAT"
+
+
+def test_get_codon_table():
+    table = get_codon_table()
+
+    codes, _ = encode_sequences([b"TTTATGTAATGGNAA"])
+
+    assert translate(codes, table) == b"FM*WX"
+
+    # The vertebrate mitochondrial code reads TGA as tryptophan.
+    mitochondrial = STANDARD_CODE[:14] + "W" + STANDARD_CODE[15:]
+
+    assert translate(encode_sequences([b"TGA"])[0], get_codon_table(mitochondrial)) == b"W"
+
+    with pytest.raises(ValueError):
+        get_codon_table("FF")
+
+
+@pytest.mark.parametrize("sequence,strand,start,end", [(FORWARD, 1, 0, 12), (REVERSE, -1, 6, 18)])
+def test_find_orfs(sequence, strand, start, end):
+    codes, offsets = encode_sequences([b"ACGT", sequence])
+
+    orfs = find_orfs(codes, offsets, min_length=4)
+
+    assert orfs.sequences.tolist() == [1] * len(orfs)
+    assert orfs.lengths.min() >= 4
+
+    indexes = np.flatnonzero((orfs.strands == strand) & (orfs.frames == 0))
+
+    assert len(indexes) == 1
+    assert (orfs.starts[indexes].tolist(), orfs.ends[indexes].tolist()) == ([start], [end])
+    assert orfs.get_protein(indexes[0]) == "MKFG"
+
+
+def test_require_start():
+    codes, offsets = encode_sequences([b"AAAAAAATGTTTTAA"])
+
+    orfs = find_orfs(codes, offsets, min_length=2)
+    forward = orfs.strands == 1
+
+    assert [orfs.get_protein(i) for i in np.flatnonzero(forward)] == ["KKMF", "KKCF", "KNVL"]
+
+    orfs = find_orfs(codes, offsets, min_length=2, require_start=True)
+
+    assert [orfs.get_protein(i) for i in np.flatnonzero(orfs.strands == 1)] == ["MF"]
+    assert orfs.starts[orfs.strands == 1].tolist() == [6]
+
+
+def test_write_orfs(tmp_path):
+    fasta_path = tmp_path / "contigs.fa"
+    fasta_path.write_bytes(b">contig_1\n" + FORWARD + b"\n>contig_2 long\n" + FORWARD[:15] * 3 + b"\n>contig_3\nACGT\n")
+
+    count = write_orfs(fasta_path, tmp_path / "orfs.fa", min_length=4, batch_size=20)
+
+    lines = (tmp_path / "orfs.fa").read_text().splitlines()
+    headers = lines[::2]
+
+    assert len(headers) == count
+
+    # ORFs are numbered in position order for each sequence.
+    names = [header.split()[0] for header in headers]
+    assert names == sorted(names, key=lambda name: (name.split(".")[0], int(name.split(".")[1])))
+    assert not any(name.startswith(">contig_3") for name in names)
+
+    records = dict(zip(headers, lines[1::2]))
+
+    for name, start in [("contig_1", 0), ("contig_2", 0), ("contig_2", 15), ("contig_2", 30)]:
+        header = f"strand=+ frame=0 start={start} end={start + 12}"
+
+        matching, = [line for line in headers if line.startswith(f">{name}.") and line.endswith(header)]
+
+        assert records[matching] == "MKFG"
@@ -0,0 +1,101 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.packed import (PackedSequences,
+                                              get_packed_path,
+                                              load_packed_sequences,
+                                              pack_fasta)
+
+FASTA = b">foo description\nACGTAC\nGTNNRA\n>bar\nttgca\n>empty\n>baz\nACGTACGTAC\n"
+
+
+@pytest.fixture
+def fasta_path(tmp_path):
+    path = tmp_path / "subtraction.fa.gz"
+
+    with gzip.open(path, "wb") as f:
+        f.write(FASTA)
+
+    return path
+
+
+@pytest.fixture
+def packed(fasta_path):
+    return pack_fasta(fasta_path, get_packed_path(fasta_path))
+
+
+def test_pack_fasta(packed, fasta_path):
+    assert packed.names == ["foo", "bar", "empty", "baz"]
+    assert packed.lengths.tolist() == [12, 5, 0, 10]
+    assert packed.ambiguous.tolist() == [[8, 11]]
+
+    assert isinstance(packed.data, np.memmap)
+    assert packed.data.nbytes == 7
+
+    assert [packed.sequence(name) for name in packed.names] == ["ACGTACGTNNNA", "TTGCA", "", "ACGTACGTAC"]
+
+    assert get_packed_path(fasta_path) == fasta_path.parent / "subtraction.packed"
+
+
+@pytest.mark.parametrize("key,start,end,expected", [
+    ("foo", 5, 10, "CGTNN"),
+    (0, -3, None, "NNA"),
+    ("bar", 1, 3, "TG"),
+    (3, 3, 3, ""),
+])
+def test_slice(key, start, end, expected, packed):
+    assert packed.sequence(key, start, end) == expected
+
+
+def test_reverse_complement(packed):
+    assert packed.reverse_complement("foo") == "TNNNACGTACGT"
+    assert packed.reverse_complement("bar", 0, 3) == "CAA"
+
+
+def test_lookup_errors(packed):
+    with pytest.raises(KeyError):
+        packed.sequence("missing")
+
+    with pytest.raises(IndexError):
+        packed.sequence(4)
+
+
+@pytest.mark.parametrize("canonical", [True, False])
+def test_kmers(canonical, packed):
+    chunks = list(packed.kmers("foo", 3, canonical=canonical, chunk_size=4))
+
+    positions = np.concatenate([positions for positions, _ in chunks])
+    kmers = np.concatenate([kmers for _, kmers in chunks])
+
+    # Windows overlapping the ambiguous bases at 8-10 are skipped.
+    assert positions.tolist() == [0, 1, 2, 3, 4, 5]
+
+    # ACG, CGT, GTA, TAC, ACG, CGT
+    expected = [6, 27, 44, 49, 6, 27]
+
+    if canonical:
+        # CGT and ACG are reverse complements, as are GTA and TAC.
+        expected = [6, 6, 44, 44, 6, 6]
+
+    assert kmers.tolist() == expected
+
+
+@pytest.mark.parametrize("batch_size,expected", [(8, [[0], [1, 2], [3]]), (100, [[0, 1, 2, 3]])])
+def test_batches(batch_size, expected, packed):
+    batches = list(packed.batches(batch_size))
+
+    assert [list(range(first, first + len(offsets) - 1)) for first, _, offsets in batches] == expected
+
+    for first, codes, offsets in batches:
+        for index, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+            assert codes[start:end].tolist() == packed.codes(first + index).tolist()
+
+
+def test_load_packed_sequences(packed, fasta_path):
+    loaded = load_packed_sequences(fasta_path)
+
+    assert isinstance(loaded, PackedSequences)
+    assert loaded.names == packed.names
+    assert loaded.sequence("baz") == packed.sequence("baz")
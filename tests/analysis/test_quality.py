@@ -0,0 +1,158 @@
+import gzip
+
+import pytest
+
+from virtool_workflow.analysis.quality import (QualityAccumulator,
+                                               calculate_quality,
+                                               compute_quality,
+                                               compute_stream_quality,
+                                               make_base_groups,
+                                               merge_quality)
+
+RECORDS = [
+    ("GGCCA", "IIIII"),
+    ("GATTN", "IIII#"),
+    ("ACGT", "5555"),
+]
+
+
+def make_fastq(records) -> bytes:
+    return "".join(
+        f"@read_{i}\n{sequence}\n+\n{quality}\n" for i, (sequence, quality) in enumerate(records)
+    ).encode()
+
+
+@pytest.fixture
+def fastq_path(tmp_path):
+    path = tmp_path / "reads_1.fq.gz"
+
+    with gzip.open(path, "wb") as f:
+        f.write(make_fastq(RECORDS))
+
+    return path
+
+
+@pytest.mark.parametrize("compressed", [True, False])
+def test_compute_stream_quality(compressed, fastq_path, tmp_path):
+    if not compressed:
+        path = tmp_path / "reads_1.fq"
+        path.write_bytes(make_fastq(RECORDS))
+    else:
+        path = fastq_path
+
+    with open(path, "rb") as f:
+        assert compute_stream_quality(f) == compute_quality(fastq_path)
+
+
+def test_compute_quality(fastq_path):
+    quality = compute_quality(fastq_path)
+
+    assert quality["count"] == 3
+    assert quality["encoding"] == "Sanger / Illumina 1.9\n"
+    assert quality["length"] == [4, 5]
+
+    # 7 of 13 unambiguous bases are G or C.
+    assert quality["gc"] == 53.0
+
+    assert len(quality["bases"]) == 5
+
+    # Fewer than 100 reads so only the mean can be calculated.
+    assert quality["bases"][0] == [33] * 6
+    assert quality["bases"][4] == [21] * 6
+
+    assert quality["sequences"][20] == 1
+    assert quality["sequences"][32] == 1
+    assert quality["sequences"][40] == 1
+    assert sum(quality["sequences"]) == 3
+
+    assert quality["composition"][0] == [66, 33, 0, 0]
+    assert quality["composition"][4] == [0, 100, 0, 0]
+
+
+def test_split_blocks(fastq_path):
+    data = make_fastq(RECORDS)
+
+    accumulator = QualityAccumulator()
+
+    for i in range(0, len(data), 7):
+        accumulator.add(data[i:i + 7])
+
+    assert accumulator.result() == compute_quality(fastq_path)
+
+
+def test_update(fastq_path):
+    left = QualityAccumulator()
+    left.add(make_fastq(RECORDS[:1]))
+
+    right = QualityAccumulator()
+    right.add(make_fastq(RECORDS[1:]))
+
+    left.update(right)
+
+    assert left.result() == compute_quality(fastq_path)
+
+
+def test_incomplete_record():
+    accumulator = QualityAccumulator()
+    accumulator.add(b"@read_1\nACGT\n+\n")
+
+    with pytest.raises(ValueError):
+        accumulator.result()
+
+
+def test_missing_newline():
+    accumulator = QualityAccumulator()
+    accumulator.add(make_fastq(RECORDS).rstrip())
+
+    assert accumulator.result()["count"] == 3
+
+
+@pytest.mark.parametrize("length,expected", [
+    (4, [(1, 1), (2, 2), (3, 3), (4, 4)]),
+    (101, [(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7), (8, 8), (9, 9), (10, 11), (12, 13)]),
+    (151, [(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7), (8, 8), (9, 9), (10, 14), (15, 19)]),
+])
+def test_make_base_groups(length, expected):
+    groups = make_base_groups(length)
+
+    assert groups[:len(expected)] == expected
+    assert groups[-1][1] == length
+
+
+def test_merge_quality(fastq_path):
+    left = compute_quality(fastq_path)
+
+    right = {
+        **left,
+        "count": 2,
+        "length": [3, 4],
+        "gc": 50.0,
+        "bases": [[11] * 6] * 4,
+        "sequences": [1] * 50,
+        "composition": [[25, 25, 25, 25]] * 4
+    }
+
+    merged = merge_quality(left, right)
+
+    assert merged["count"] == 5
+    assert merged["length"] == [3, 5]
+    assert merged["gc"] == 51.5
+    assert merged["bases"][0] == [22.0] * 6
+    assert merged["bases"][4] == left["bases"][4]
+    assert merged["sequences"][20] == 2
+    assert merged["composition"][4] == left["composition"][4]
+
+
+async def test_calculate_quality(fastq_path, tmp_path):
+    right_path = tmp_path / "reads_2.fq.gz"
+
+    with gzip.open(right_path, "wb") as f:
+        f.write(make_fastq(RECORDS))
+
+    single = compute_quality(fastq_path)
+    paired = await calculate_quality((fastq_path, right_path))
+
+    assert paired["count"] == 6
+    assert paired["length"] == single["length"]
+    assert paired["gc"] == single["gc"]
+    assert paired["bases"] == single["bases"]
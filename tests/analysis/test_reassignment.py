@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.alignments import Alignments, SequenceTable
+from virtool_workflow.analysis.reassignment import build_read_matrix, reassign
+
+
+@pytest.fixture
+def table():
+    return SequenceTable.create(
+        {"seq_a": "otu_1", "seq_b": "otu_2", "seq_c": "otu_3"},
+        {"seq_a": 1000, "seq_b": 1000, "seq_c": 1000}
+    )
+
+
+def make_alignments(table, rows):
+    reads, sequences, scores = zip(*[
+        (read, sequence, score) for read, row in enumerate(rows) for sequence, score in row
+    ])
+
+    return Alignments(
+        table,
+        len(rows),
+        np.array(reads, dtype=np.int32),
+        np.array(sequences, dtype=np.int32),
+        np.zeros(len(reads), dtype=np.int32),
+        np.full(len(reads), 100, dtype=np.int32),
+        np.array(scores, dtype=np.int32)
+    )
+
+
+def test_build_read_matrix(table):
+    alignments = make_alignments(table, [
+        [(0, -5), (1, -5)],
+        # A lower scoring alignment to the same sequence is dropped.
+        [(1, -5), (0, -5), (0, -20)],
+        [(0, -5), (1, -6)],
+        [(2, 0)],
+        [(2, 0)],
+    ])
+
+    matrix = build_read_matrix(alignments)
+
+    likelihoods = matrix.likelihoods.tolist()
+
+    rows = {
+        tuple(zip(
+            matrix.sequences[start:end].tolist(),
+            matrix.scores[start:end].tolist(),
+            likelihoods[start:end]
+        )): weight for start, end, weight in zip(matrix.offsets[:-1], matrix.offsets[1:], matrix.weights)
+    }
+
+    assert rows == {
+        ((0, -5, 1.0), (1, -5, 1.0)): 2,
+        ((0, -5, 1.0), (1, -6, np.exp(-1))): 1,
+        ((2, 0, 1.0),): 2,
+    }
+
+    assert len(build_read_matrix(alignments, collapse=False)) == 5
+
+
+def test_reassign(table):
+    # seq_a has many unique reads. Reads shared equally with seq_b should go to seq_a.
+    alignments = make_alignments(table, [[(0, 0)]] * 90 + [[(1, 0)]] * 10 + [[(0, 0), (1, 0)]] * 50)
+
+    reassignment = reassign(build_read_matrix(alignments))
+
+    assert reassignment.iterations > 1
+    assert reassignment.pi.sum() == pytest.approx(1)
+    assert reassignment.pi[2] == 0
+
+    assert reassignment.pi[0] > 0.9
+    assert reassignment.counts.sum() == pytest.approx(150)
+    assert reassignment.counts[0] > 135
+
+    assert reassignment.best_hit_counts.tolist() == [115, 35, 0]
+    assert reassignment.reassigned_counts.tolist() == [140, 10, 0]
+
+
+def test_reassign_collapsed(table):
+    rows = [[(0, 0)]] * 30 + [[(1, 0)]] * 20 + [[(0, 0), (1, -2)]] * 40 + [[(1, 0), (2, 0)]] * 10
+
+    alignments = make_alignments(table, rows)
+
+    collapsed = reassign(build_read_matrix(alignments), epsilon=1e-12)
+    full = reassign(build_read_matrix(alignments, collapse=False), epsilon=1e-12)
+
+    assert np.allclose(collapsed.pi, full.pi)
+    assert np.allclose(collapsed.counts, full.counts)
+
+
+def test_priors(table):
+    alignments = make_alignments(table, [[(0, 0)]] * 10 + [[(1, 0), (2, 0)]] * 10)
+
+    matrix = build_read_matrix(alignments)
+
+    assert reassign(matrix, pi_prior=1.0).pi[1] > reassign(matrix).pi[1] / 2
+    assert reassign(matrix, max_iterations=1).iterations == 1
@@ -1,5 +1,15 @@
+import gzip
+
 from tests.api.mocks.mock_job_routes import TEST_JOB
 from tests.api.mocks.mock_sample_routes import TEST_SAMPLE_ID
+from tests.analysis.test_quality import RECORDS, make_fastq
+from tests.storage.test_streams import CHUNKS, generate_chunks
+from virtool_workflow.analysis.library_types import LibraryType
+from virtool_workflow.analysis.quality import calculate_quality
+from virtool_workflow.analysis.reads import calculate_sample_quality, open_read_paths
+from virtool_workflow.analysis.utils import make_read_paths
+from virtool_workflow.data_model.samples import Sample
+from virtool_workflow.storage.streams import StreamingDownload
 
 
 async def no_op(*args, **kwargs):
@@ -14,3 +24,49 @@ async def test_sample_has_read_path(runtime):
 
     assert sample.read_paths is not None
     assert sample.reads_path is not None
+
+
+async def test_open_read_paths(tmp_path, run_subprocess):
+    sample = Sample("foo", "Foo", "", "", "", LibraryType.other, True, {})
+    sample.read_downloads = [
+        StreamingDownload(path).start(generate_chunks()) for path in make_read_paths(tmp_path, True)
+    ]
+
+    async with open_read_paths(sample) as read_paths:
+        assert [path.name for path in read_paths] == ["reads_1.stream.fq.gz", "reads_2.stream.fq.gz"]
+
+        for read_path in read_paths:
+            await run_subprocess(["cp", str(read_path), str(read_path.with_suffix(".copy"))])
+
+            assert read_path.with_suffix(".copy").read_bytes() == b"".join(CHUNKS)
+
+    # The read paths are only set once the downloads are finished.
+    assert sample.read_paths is None
+    assert await sample.get_read_paths() == make_read_paths(tmp_path, True)
+
+    async with open_read_paths(sample) as read_paths:
+        assert read_paths == sample.read_paths
+
+
+async def test_calculate_sample_quality(tmp_path, run_in_executor):
+    data = gzip.compress(make_fastq(RECORDS * 100))
+
+    complete_path = tmp_path / "complete.fq.gz"
+    complete_path.write_bytes(data)
+
+    sample = Sample("foo", "Foo", "", "", "", LibraryType.other, True, {})
+
+    # The quality is calculated from the streams before the downloads finish.
+    chunks = [data[i:i + 100] for i in range(0, len(data), 100)]
+
+    sample.read_downloads = [
+        StreamingDownload(path).start(generate_chunks(chunks)) for path in make_read_paths(tmp_path, True)
+    ]
+
+    quality = await calculate_sample_quality(sample, run_in_executor)
+
+    assert quality == await calculate_quality((complete_path, complete_path))
+    assert quality["count"] == 600
+
+    # The complete files are used once the downloads are finished.
+    assert await calculate_sample_quality(sample, run_in_executor) == quality
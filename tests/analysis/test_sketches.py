@@ -0,0 +1,106 @@
+import gzip
+import json
+import random
+
+import numpy as np
+import pytest
+
+from virtool_workflow.analysis.packed import CODES
+from virtool_workflow.analysis.sketches import (OTUSketches,
+                                                hash_kmers,
+                                                screen_reads,
+                                                sketch_codes,
+                                                sketch_otus)
+
+
+def random_sequence(length: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+@pytest.fixture
+def sequences():
+    return {
+        "otu_a": random_sequence(5000, 1),
+        "otu_b": random_sequence(5000, 2),
+        "otu_c": random_sequence(5000, 3),
+    }
+
+
+@pytest.fixture
+def json_path(sequences, tmp_path):
+    path = tmp_path / "otus.json"
+
+    path.write_text(json.dumps([
+        {
+            "_id": otu_id,
+            "isolates": [
+                {"id": "isolate", "sequences": [{"_id": f"{otu_id}_1", "sequence": sequence}]}
+            ]
+        } for otu_id, sequence in sequences.items()
+    ]))
+
+    return path
+
+
+@pytest.fixture
+def read_path(sequences, tmp_path):
+    path = tmp_path / "reads_1.fq.gz"
+
+    # Reads cover all of otu_a and the first half of otu_b.
+    reads = [sequences["otu_a"][i:i + 100] for i in range(0, 4901, 50)]
+    reads += [sequences["otu_b"][i:i + 100] for i in range(0, 2401, 50)]
+
+    with gzip.open(path, "wt") as f:
+        for i, read in enumerate(reads):
+            f.write(f"@read_{i}\n{read}\n+\n{'I' * len(read)}\n")
+
+    return path
+
+
+def test_hash_kmers():
+    kmers = np.arange(1000, dtype=np.uint64)
+
+    hashes = hash_kmers(kmers)
+
+    assert len(np.unique(hashes)) == 1000
+    assert hashes.dtype == np.uint64
+
+
+def test_sketch_codes():
+    codes = CODES[np.frombuffer(random_sequence(1000, 4).encode(), dtype=np.uint8)]
+
+    full = sketch_codes(codes, 21, 1)
+    scaled = sketch_codes(codes, 21, 10)
+
+    assert len(full) == 980
+    assert set(scaled) <= set(full)
+    assert 50 < len(scaled) < 150
+
+
+def test_sketch_otus(json_path, tmp_path):
+    sketches = sketch_otus(json_path, k=21, scaled=5)
+
+    assert sketches.otu_ids == ["otu_a", "otu_b", "otu_c"]
+    assert sketches.offsets[-1] == len(sketches.hashes)
+    assert all(size > 0 for size in sketches.sizes)
+
+    sketches.save(tmp_path / "sketches.npz")
+
+    loaded = OTUSketches.load(tmp_path / "sketches.npz")
+
+    assert loaded.otu_ids == sketches.otu_ids
+    assert loaded.k == 21
+    assert loaded.scaled == 5
+    assert np.array_equal(loaded.hashes, sketches.hashes)
+
+
+async def test_screen_reads(json_path, read_path):
+    sketches = sketch_otus(json_path, k=21, scaled=5)
+
+    candidates = await screen_reads(sketches, (read_path,), processes=2)
+
+    assert [candidate.otu_id for candidate in candidates] == ["otu_a", "otu_b"]
+
+    assert candidates[0].containment == 1.0
+    assert 0.4 < candidates[1].containment < 0.6
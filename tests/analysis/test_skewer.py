@@ -5,8 +5,12 @@ from pathlib import Path
 import pytest
 
 from tests.api.mocks.mock_sample_routes import TEST_SAMPLE_ID
-from virtool_workflow.analysis.skewer import (calculate_trimming_min_length,
-                                              skewer)
+from virtool_workflow.analysis.skewer import (SHARD_BLOCK_RECORDS,
+                                              calculate_trimming_min_length,
+                                              run_sharded,
+                                              run_with_quality,
+                                              skewer,
+                                              split_fastq)
 from virtool_workflow.data_model import Job
 from virtool_workflow.runtime.providers import sample_provider
 
@@ -54,3 +58,136 @@ async def test_skewer(
         with gzip.open(result.left) as left:
             file_regression.check(right.read(), basename="right", binary=True)
             file_regression.check(left.read(), basename="left", binary=True)
+
+
+async def test_skewer_reuse(monkeypatch, tmpdir, run_in_executor):
+    path = Path(tmpdir)
+
+    monkeypatch.setattr(shutil, "which", lambda _: "/usr/bin/skewer")
+
+    commands = []
+
+    async def run_subprocess(command, **kwargs):
+        commands.append(command)
+
+        (path / "reads-trimmed.log").touch()
+        (path / "reads-trimmed.fastq.gz").touch()
+
+    run_skewer = skewer(min_length=20, number_of_processes=2)
+
+    for _ in range(2):
+        result = await run_skewer((path / "reads_1.fq.gz",), run_subprocess, run_in_executor)
+
+        assert result.command == commands[-1]
+
+    # The command is built for each call, so running the same function again doesn't repeat arguments.
+    assert commands[0] == commands[1]
+    assert commands[0].count("-t") == 1
+    assert commands[0][-3:] == [str(path / "reads_1.fq.gz"), "-o", "reads"]
+
+
+async def test_run_with_quality(tmpdir, run_subprocess):
+    path = Path(tmpdir)
+
+    # Stand in for Skewer by writing trimmed reads to its paired output files.
+    command = [
+        "sh", "-c",
+        "printf '@read_1\\nGGCC\\n+\\nIIII\\n' > reads-trimmed-pair1.fastq && "
+        "printf '@read_1\\nAATT\\n+\\nIIII\\n' > reads-trimmed-pair2.fastq"
+    ]
+
+    process, quality = await run_with_quality(command, None, path, 2, run_subprocess)
+
+    assert process.returncode == 0
+
+    assert quality["count"] == 2
+    assert quality["gc"] == 50.0
+    assert quality["length"] == [4, 4]
+
+    with gzip.open(path / "reads-trimmed-pair1.fastq.gz") as f:
+        assert f.read() == b"@read_1\nGGCC\n+\nIIII\n"
+
+    assert not (path / "reads-trimmed-pair1.fastq").exists()
+    assert not (path / "reads-trimmed-pair2.fastq").exists()
+
+
+async def test_run_with_quality_failure(tmpdir, run_subprocess):
+    path = Path(tmpdir)
+
+    with pytest.raises(RuntimeError):
+        await run_with_quality(["sh", "-c", "exit 1"], None, path, 1, run_subprocess)
+
+    assert not (path / "reads-trimmed.fastq").exists()
+
+
+def make_records(count: int, prefix: str) -> bytes:
+    return "".join(f"@{prefix}_{i}\nACGT\n+\nIIII\n" for i in range(count)).encode()
+
+
+def test_split_fastq(tmpdir):
+    path = Path(tmpdir)
+
+    for name, prefix in (("reads_1.fq.gz", "left"), ("reads_2.fq.gz", "right")):
+        with gzip.open(path / name, "wb") as f:
+            f.write(make_records(7, prefix))
+
+        split_fastq(path / name, [path / f"{prefix}_{i}.fastq" for i in range(2)], block_records=2)
+
+    names = [(path / f"left_{i}.fastq").read_text().splitlines()[::4] for i in range(2)]
+
+    assert names == [
+        ["@left_0", "@left_1", "@left_4", "@left_5"],
+        ["@left_2", "@left_3", "@left_6"]
+    ]
+
+    for i in range(2):
+        right = (path / f"right_{i}.fastq").read_text().splitlines()[::4]
+        assert [name.replace("left", "right") for name in names[i]] == right
+
+
+@pytest.mark.parametrize("with_quality", [True, False])
+async def test_run_sharded(with_quality, tmpdir, run_subprocess):
+    path = Path(tmpdir)
+    read_path = path / "reads_1.fq.gz"
+
+    # Enough records to put reads in every shard, so the shards are trimmed concurrently.
+    records = make_records(2 * SHARD_BLOCK_RECORDS + 5, "read")
+
+    with gzip.open(read_path, "wb") as f:
+        f.write(records)
+
+    # Stand in for Skewer by copying the shard to the trimmed output.
+    if with_quality:
+        command = ["sh", "-c", 'cat "$0" > reads-trimmed.fastq']
+    else:
+        command = ["sh", "-c", 'gzip -c "$0" > reads-trimmed.fastq.gz']
+
+    process, quality = await run_sharded(command, None, (read_path,), 3, with_quality, run_subprocess)
+
+    assert process.returncode == 0
+
+    with gzip.open(path / "reads-trimmed.fastq.gz") as f:
+        assert sorted(f.read().splitlines()) == sorted(records.splitlines())
+
+    if with_quality:
+        assert quality["count"] == 2 * SHARD_BLOCK_RECORDS + 5
+    else:
+        assert quality is None
+
+    assert not (path / "shards").exists()
+
+
+async def test_run_sharded_failure(tmpdir, run_subprocess):
+    path = Path(tmpdir)
+    read_path = path / "reads_1.fq.gz"
+
+    with gzip.open(read_path, "wb") as f:
+        f.write(make_records(2 * SHARD_BLOCK_RECORDS, "read"))
+
+    # Fail for the second shard only.
+    command = ["sh", "-c", 'case "$0" in */1/*) exit 1;; esac; cat "$0" > reads-trimmed.fastq']
+
+    with pytest.raises(RuntimeError):
+        await run_sharded(command, None, (read_path,), 2, True, run_subprocess)
+
+    assert not (path / "shards").exists()
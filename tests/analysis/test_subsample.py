@@ -0,0 +1,105 @@
+import gzip
+
+import pytest
+
+from virtool_workflow.analysis.fastq import read_fastq, read_paired_fastq
+from virtool_workflow.analysis.library_types import LibraryType
+from virtool_workflow.analysis.subsample import (Subsample,
+                                                 subsample,
+                                                 subsample_fastq,
+                                                 subsample_reads)
+from virtool_workflow.analysis.trimming import trimming_cache_key
+from virtool_workflow.data_model.samples import Sample
+
+
+def write_fastq(path, count: int, suffix: str):
+    with gzip.open(path, "wb") as f:
+        for i in range(count):
+            f.write(f"@read_{i}/{suffix}\nACGT\n+\nIIII\n".encode())
+
+
+@pytest.fixture
+def read_paths(tmp_path):
+    paths = (tmp_path / "reads_1.fq.gz", tmp_path / "reads_2.fq.gz")
+
+    for suffix, path in enumerate(paths, 1):
+        write_fastq(path, 1000, str(suffix))
+
+    return paths
+
+
+def get_names(path):
+    return [bytes(record.name) for record in read_fastq(path)]
+
+
+@pytest.mark.parametrize("kwargs,count", [
+    ({"n": 100}, 100),
+    ({"n": 5000}, 1000),
+    ({"fraction": 1.0}, 1000),
+])
+def test_subsample_fastq(kwargs, count, read_paths, tmp_path):
+    target_path = tmp_path / "subsample.fq.gz"
+
+    assert subsample_fastq(read_paths[0], target_path, Subsample(**kwargs), compresslevel=1) == 1000
+
+    names = get_names(target_path)
+
+    assert len(names) == count
+    assert len(set(names)) == count
+    assert names == sorted(names, key=lambda name: int(name[5:-2]))
+
+
+def test_subsample_fraction(read_paths, tmp_path):
+    target_path = tmp_path / "subsample.fq.gz"
+
+    subsample_fastq(read_paths[0], target_path, Subsample(fraction=0.2, seed=1))
+
+    assert 120 < len(get_names(target_path)) < 280
+
+
+@pytest.mark.parametrize("kwargs", [{"n": 150}, {"fraction": 0.1}])
+async def test_subsample_reads(kwargs, read_paths, tmp_path):
+    output_paths = await subsample_reads(read_paths, tmp_path / "subsample", seed=3, **kwargs)
+
+    assert [path.name for path in output_paths] == ["reads_1.fq.gz", "reads_2.fq.gz"]
+
+    pairs = list(read_paired_fastq(*output_paths))
+
+    assert pairs
+    assert all(bytes(left.name)[:-2] == bytes(right.name)[:-2] for left, right in pairs)
+
+    rerun_paths = await subsample_reads(read_paths, tmp_path / "rerun", seed=3, **kwargs)
+
+    assert get_names(rerun_paths[0]) == get_names(output_paths[0])
+
+
+async def test_subsample_reads_unequal(read_paths):
+    write_fastq(read_paths[1], 999, "2")
+
+    with pytest.raises(ValueError):
+        await subsample_reads(read_paths, read_paths[0].parent / "subsample", n=10)
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"n": 10, "fraction": 0.5}, {"n": 0}, {"fraction": 1.5}])
+def test_invalid_subsample(kwargs):
+    with pytest.raises(ValueError):
+        Subsample(**kwargs)
+
+
+@pytest.mark.parametrize("preview,expected", [
+    (0.0, None),
+    (0.25, Subsample(fraction=0.25, seed=7)),
+    (1000, Subsample(n=1000, seed=7)),
+])
+def test_subsample_fixture(preview, expected):
+    assert subsample(preview, 7) == expected
+
+
+def test_trimming_cache_key():
+    sample = Sample("foo", "Foo", "", "", "", LibraryType.other, False, {"length": [20, 150]})
+
+    key = trimming_cache_key(sample, {"min_length": 20}, None)
+
+    assert trimming_cache_key(sample, {"min_length": 20}, Subsample(n=1000)) != key
+    assert trimming_cache_key(sample, {"min_length": 20}, Subsample(n=1000, seed=1)) != \
+        trimming_cache_key(sample, {"min_length": 20}, Subsample(n=1000))
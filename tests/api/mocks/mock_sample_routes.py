@@ -175,8 +175,10 @@ async def finalize_cache(request):
 
     _json = await request.json()
 
-    quality = _json["quality"]
-    TEST_CACHE["quality"] = quality
+    # Only the quality is stored in the cache document.
+    if "quality" in _json:
+        TEST_CACHE["quality"] = _json["quality"]
+
     TEST_CACHE["ready"] = True
 
     return json_response(TEST_CACHE)
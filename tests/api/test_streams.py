@@ -0,0 +1,51 @@
+import pytest
+
+from tests.storage.test_streams import CHUNKS
+from virtool_workflow.api.errors import NotFound
+from virtool_workflow.api.streams import iter_chunks
+
+
+class MockContent:
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def iter_chunked(self, _):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class MockResponse:
+    content_type = "application/octet-stream"
+
+    def __init__(self, chunks, status: int):
+        self.content = MockContent(chunks)
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def text(self):
+        return "Not found"
+
+
+class MockHttp:
+
+    def __init__(self, status: int = 200):
+        self.status = status
+
+    def get(self, _):
+        return MockResponse(CHUNKS, self.status)
+
+
+async def test_iter_chunks():
+    assert [chunk async for chunk in iter_chunks(MockHttp(), "/reads_1.fq.gz")] == CHUNKS
+
+
+async def test_iter_chunks_not_found():
+    with pytest.raises(NotFound):
+        async for _ in iter_chunks(MockHttp(404), "/reads_1.fq.gz"):
+            pass
@@ -1,7 +1,9 @@
+import json
 from pathlib import Path
 
 from tests.api.mocks.mock_sample_routes import TEST_CACHE, TEST_SAMPLE_ID
-from virtool_workflow.api.caches import RemoteReadsCacheWriter
+from virtool_workflow.abc.caches.analysis_caches import AlignmentCache
+from virtool_workflow.api.caches import RemoteCacheWriter, RemoteReadsCacheWriter
 
 
 async def test_api_caching(tmpdir, http, jobs_api_url, run_in_executor):
@@ -37,3 +39,33 @@ async def test_api_caching(tmpdir, http, jobs_api_url, run_in_executor):
     assert (cache.path / "reads_2.fq.gz").exists()
 
     assert TEST_CACHE["ready"] is True
+
+
+async def test_alignment_caching(tmpdir, http, jobs_api_url, run_in_executor):
+    tmpdir = Path(tmpdir)
+    cache_dir = tmpdir / "cache"
+    cache_dir.mkdir()
+
+    writer = RemoteCacheWriter[AlignmentCache](TEST_CACHE["key"],
+                                               cache_dir,
+                                               TEST_SAMPLE_ID,
+                                               http,
+                                               jobs_api_url,
+                                               run_in_executor)
+
+    alignments = tmpdir / "alignments.npz"
+    alignments.touch()
+
+    async with writer:
+        writer.index_id = "foo"
+        writer.parameters = {"-k": 10}
+        await writer.upload(alignments, "unknown")
+
+    assert writer.cache.index_id == "foo"
+    assert (writer.cache.path / "alignments.npz").exists()
+
+    assert TEST_CACHE["ready"] is True
+
+    # Attributes the API doesn't store are kept in a cache artifact.
+    assert "index_id" not in TEST_CACHE
+    assert json.loads((cache_dir / "metadata.json").read_text()) == {"index_id": "foo", "parameters": {"-k": 10}}
@@ -0,0 +1,22 @@
+from virtool_workflow.caching.keys import alignment_cache_key, depleted_reads_cache_key
+
+
+def test_alignment_cache_key():
+    key = alignment_cache_key("reads", "index", ["foo", "bar"], {"-k": 10})
+
+    assert len(key) == 64
+
+    assert alignment_cache_key("reads", "index", ["bar", "foo"], {"-k": 10}) == key
+
+    assert alignment_cache_key("other", "index", ["foo", "bar"], {"-k": 10}) != key
+    assert alignment_cache_key("reads", "other", ["foo", "bar"], {"-k": 10}) != key
+    assert alignment_cache_key("reads", "index", ["foo"], {"-k": 10}) != key
+    assert alignment_cache_key("reads", "index", ["foo", "bar"], {"-k": 5}) != key
+
+
+def test_depleted_reads_cache_key():
+    key = depleted_reads_cache_key("reads", ["foo"])
+
+    assert depleted_reads_cache_key("reads", ["foo"], {}) == key
+    assert depleted_reads_cache_key("reads", ["foo"], {"min_host_fraction": 0.9}) != key
+    assert alignment_cache_key("reads", None, ["foo"]) != key
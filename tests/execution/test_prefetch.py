@@ -0,0 +1,41 @@
+from virtool_workflow import Workflow
+from virtool_workflow.data_model import Job
+from virtool_workflow.execution.prefetch import get_prefetch_fixtures, prefetch_inputs
+from virtool_workflow.fixtures import FixtureGroup, FixtureScope
+
+
+def test_get_prefetch_fixtures():
+    job = Job("foo", {"sample_id": "bar", "index_id": "baz"})
+
+    assert get_prefetch_fixtures(job, {"sample", "indexes", "hmms", "work_path"}) == ["sample", "hmms"]
+
+    job = Job("foo", {"index_id": "baz"})
+
+    assert get_prefetch_fixtures(job, {"sample", "indexes", "hmms"}) == ["hmms"]
+
+
+async def test_prefetch_inputs():
+    job = Job("foo", {"sample_id": "bar"})
+
+    providers = FixtureGroup()
+
+    @providers.fixture
+    def sample(job):
+        return job.args["sample_id"]
+
+    @providers.fixture
+    def indexes():
+        raise ValueError("Indexes should not be prefetched")
+
+    workflow = Workflow()
+
+    @workflow.step
+    def step(sample, indexes):
+        pass
+
+    async with FixtureScope(providers, job=job) as scope:
+        futures = prefetch_inputs(scope, workflow, job)
+
+        assert len(futures) == 1
+        assert await futures[0] == "bar"
+        assert scope["sample"] == "bar"
@@ -0,0 +1,14 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from virtool_workflow.execution.run_in_executor import run_in_executor
+
+
+async def test_run_in_executor_does_not_block():
+    execute = run_in_executor(ThreadPoolExecutor())
+
+    # The barrier is only passed if both functions are running in the executor at the same time.
+    barrier = threading.Barrier(2, timeout=5)
+
+    assert await asyncio.gather(execute(barrier.wait), execute(barrier.wait)) in ([0, 1], [1, 0])
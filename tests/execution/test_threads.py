@@ -0,0 +1,53 @@
+import pytest
+
+from virtool_workflow.data_model import Job
+from virtool_workflow.execution.threads import (ThreadAllocator,
+                                                allocate_threads,
+                                                thread_allocator)
+
+
+def test_allocate():
+    allocator = ThreadAllocator(8)
+
+    with allocator.allocate() as first:
+        assert first == 8
+
+        with allocator.allocate() as second:
+            assert second == 4
+
+            with allocator.allocate(demand=2) as third:
+                assert third == 2
+                assert allocator.active == 4
+
+    assert allocator.active == 0
+
+
+@pytest.mark.parametrize("maximum,expected", [(None, 6), (2, 2), (0, 1)])
+def test_allocate_maximum(maximum, expected):
+    with ThreadAllocator(6).allocate(maximum) as threads:
+        assert threads == expected
+
+
+def test_allocate_minimum():
+    allocator = ThreadAllocator(2)
+
+    with allocator.allocate(demand=5) as threads:
+        assert threads == 1
+
+
+@pytest.mark.parametrize("allocator,threads,expected", [
+    (None, None, 1),
+    (None, 3, 3),
+    (ThreadAllocator(4), 3, 3),
+    (ThreadAllocator(4), None, 4),
+])
+def test_allocate_threads(allocator, threads, expected):
+    with allocate_threads(allocator, threads) as allocated:
+        assert allocated == expected
+
+
+@pytest.mark.parametrize("job_proc,proc,expected", [(4, 2, 2), (2, 8, 2)])
+def test_thread_allocator(job_proc, proc, expected):
+    job = Job("test_job", {}, proc=job_proc)
+
+    assert thread_allocator(job, proc).threads == expected
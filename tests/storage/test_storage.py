@@ -1,6 +1,10 @@
+import asyncio
 from pathlib import Path
 
+import pytest
+
 from virtool_workflow.storage.paths import context_directory
+from virtool_workflow.storage.utils import FileFetcher
 
 
 def test_context_directory():
@@ -14,3 +18,39 @@ def test_context_directory():
     assert not Path("foobar").exists()
     assert not Path("foobar/cat").exists()
 
+
+
+async def test_file_fetcher(tmp_path):
+    downloads = []
+
+    async def download(path: Path, *names):
+        downloads.extend(names)
+
+        await asyncio.sleep(0.01)
+
+        if "bad" in names:
+            raise ValueError("Download failed")
+
+        for name in names:
+            (path / name).write_text(name)
+
+        return path
+
+    fetcher = FileFetcher(download, tmp_path)
+
+    # Concurrent requests for the same file share one download.
+    await asyncio.gather(fetcher.fetch("a", "b"), fetcher.fetch("b"), fetcher.fetch("a"))
+
+    assert sorted(downloads) == ["a", "b"]
+    assert (tmp_path / "a").read_text() == "a"
+
+    assert await fetcher.fetch("a", "c") == tmp_path
+    assert sorted(downloads) == ["a", "b", "c"]
+
+    # Failed downloads are retried the next time the file is requested.
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await fetcher.fetch("bad")
+
+    assert downloads.count("bad") == 2
+    assert set(fetcher.names) == {"a", "b", "c"}
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from virtool_workflow.storage.streams import StreamingDownload
+
+CHUNKS = [bytes([i]) * 1000 for i in range(10)]
+
+
+async def generate_chunks(chunks=CHUNKS, fail: bool = False):
+    for chunk in chunks:
+        await asyncio.sleep(0.01)
+        yield chunk
+
+    if fail:
+        raise ConnectionError("Connection lost")
+
+
+def read_all(download: StreamingDownload):
+    with download.open() as f:
+        first = f.read(1000)
+        complete = download.complete
+
+        return first + f.read(), complete
+
+
+async def test_open(tmp_path):
+    download = StreamingDownload(tmp_path / "reads_1.fq.gz").start(generate_chunks())
+
+    data, complete = await asyncio.get_running_loop().run_in_executor(None, read_all, download)
+
+    # Reading started before the download was complete.
+    assert data == b"".join(CHUNKS)
+    assert complete is False
+
+    assert await download.wait() == tmp_path / "reads_1.fq.gz"
+    assert download.path.read_bytes() == data
+
+
+async def test_fifo(tmp_path, run_subprocess):
+    download = StreamingDownload(tmp_path / "reads_1.fq.gz").start(generate_chunks())
+
+    async with download.fifo(tmp_path / "stream.fq.gz") as fifo_path:
+        await run_subprocess(["cp", str(fifo_path), str(tmp_path / "copy")])
+
+    assert (tmp_path / "copy").read_bytes() == b"".join(CHUNKS)
+    assert not (tmp_path / "stream.fq.gz").exists()
+
+    # The pipe is cleaned up if it is never opened.
+    async with download.fifo(tmp_path / "stream.fq.gz"):
+        pass
+
+    assert not (tmp_path / "stream.fq.gz").exists()
+
+
+async def test_failure(tmp_path):
+    download = StreamingDownload(tmp_path / "reads_1.fq.gz").start(generate_chunks(fail=True))
+
+    with pytest.raises(IOError):
+        await asyncio.get_running_loop().run_in_executor(None, read_all, download)
+
+    with pytest.raises(ConnectionError):
+        await download.wait()
+
+    assert download.done and not download.complete
+
+
+async def test_from_path(tmp_path):
+    path = tmp_path / "reads_1.fq.gz"
+    path.write_bytes(b"".join(CHUNKS))
+
+    download = StreamingDownload.from_path(path)
+
+    assert download.complete
+    assert await download.wait() == path
+    assert read_all(download) == (b"".join(CHUNKS), True)
@@ -0,0 +1,35 @@
+import gzip
+
+import pytest
+
+from virtool_workflow.analysis.subtractions import calculate_composition, count_nucleotides
+from virtool_workflow.data_model import NucleotideComposition
+
+FASTA = b">chr1 ACGT in the header\nACGTac\ngtNNRY\n>chr2\n\n>chr3\nAAAA\nTTTT"
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 5, 1024])
+def test_count_nucleotides(block_size, tmp_path):
+    fasta_path = tmp_path / "subtraction.fa.gz"
+
+    with gzip.open(fasta_path, "wb") as f:
+        f.write(FASTA)
+
+    composition, count = count_nucleotides(fasta_path, block_size)
+
+    assert count == 3
+    assert composition == NucleotideComposition(a=6 / 20, c=2 / 20, g=2 / 20, t=6 / 20, n=4 / 20)
+
+
+async def test_calculate_composition(tmp_path):
+    fasta_path = tmp_path / "subtraction.fa"
+    fasta_path.write_bytes(FASTA)
+
+    assert await calculate_composition(fasta_path) == count_nucleotides(fasta_path)
+
+
+def test_empty(tmp_path):
+    fasta_path = tmp_path / "subtraction.fa"
+    fasta_path.write_bytes(b"")
+
+    assert count_nucleotides(fasta_path) == (NucleotideComposition(), 0)
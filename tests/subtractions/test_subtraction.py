@@ -1,9 +1,12 @@
+import asyncio
 from pathlib import Path
 
 from tests.api.mocks.mock_subtraction_routes import TEST_SUBTRACTION_ID
-from virtool_workflow.analysis.subtractions import subtractions
+from virtool_workflow.abc.data_providers import AbstractSubtractionProvider
+from virtool_workflow.analysis.subtractions import SubtractionDownloads, subtractions
 from virtool_workflow.api.subtractions import SubtractionProvider
-from virtool_workflow.data_model import Subtraction
+from virtool_workflow.data_model import NucleotideComposition, Subtraction
+from virtool_workflow.storage.utils import FileFetcher
 
 
 async def test_subtractions(http, jobs_api_url: str, tmpdir):
@@ -13,3 +16,85 @@ async def test_subtractions(http, jobs_api_url: str, tmpdir):
 
     for subtraction in _subtractions:
         assert isinstance(subtraction, Subtraction)
+
+
+class MockSubtractionProvider(AbstractSubtractionProvider):
+
+    def __init__(self, subtraction_id: str, delay: float, events: list):
+        self.subtraction_id = subtraction_id
+        self.delay = delay
+        self.events = events
+        self.fetcher = FileFetcher(self.download, Path("foo"))
+
+    async def get(self) -> Subtraction:
+        return Subtraction(
+            self.subtraction_id,
+            self.subtraction_id,
+            "",
+            1,
+            NucleotideComposition(),
+            Path("foo"),
+            self.fetcher.fetch
+        )
+
+    async def download(self, target_path: Path = None, *names):
+        self.events.append(f"start {self.subtraction_id} {' '.join(names)}")
+        await asyncio.sleep(self.delay)
+        self.events.append(f"end {self.subtraction_id} {' '.join(names)}")
+
+    async def finalize(self, gc):
+        ...
+
+    async def delete(self):
+        ...
+
+    async def upload(self, path: Path):
+        ...
+
+
+async def test_subtraction_downloads():
+    events = []
+
+    providers = [
+        MockSubtractionProvider("slow", 0.2, events),
+        MockSubtractionProvider("fast", 0.01, events)
+    ]
+
+    downloads = SubtractionDownloads(providers)
+
+    # Subtractions are yielded as they become ready and all downloads start at once.
+    assert [subtraction.id async for subtraction in downloads] == ["fast", "slow"]
+    assert all(event.startswith("start") for event in events[:14])
+    assert events[-1].startswith("end slow")
+
+    # The fixture keeps the order of the providers.
+    assert [subtraction.id for subtraction in await subtractions(providers)] == ["slow", "fast"]
+
+
+async def test_subtractions_are_lazy():
+    events = []
+
+    providers = [MockSubtractionProvider("foo", 0.01, events)]
+
+    subtraction, = await subtractions(providers)
+
+    assert events == []
+
+    assert await subtraction.get_bowtie2_index_path() == Path("foo/subtraction")
+
+    assert sorted(event for event in events if event.startswith("start")) == [
+        "start foo subtraction.1.bt2",
+        "start foo subtraction.2.bt2",
+        "start foo subtraction.3.bt2",
+        "start foo subtraction.4.bt2",
+        "start foo subtraction.rev.1.bt2",
+        "start foo subtraction.rev.2.bt2",
+    ]
+
+    events.clear()
+
+    # Files are only downloaded once, even for subtractions fetched separately.
+    assert await (await providers[0].get()).get_bowtie2_index_path() == Path("foo/subtraction")
+    assert await subtraction.get_fasta_path() == Path("foo/subtraction.fa.gz")
+
+    assert events == ["start foo subtraction.fa.gz", "end foo subtraction.fa.gz"]
@@ -1,4 +1,11 @@
-from virtool_workflow.fixtures import workflow_scope, fixture
+import asyncio
+import inspect
+
+import pytest
+
+from virtool_workflow.fixtures import workflow_scope, fixture, FixtureGroup, FixtureScope
+from virtool_workflow.fixtures.errors import FixtureBindingError
+from virtool_workflow.fixtures.signatures import get_parameters
 from virtool_workflow import hooks
 
 
@@ -27,3 +34,191 @@ async def test_generator_fixture_finishes():
         return
 
     assert False
+
+
+async def test_prefetch():
+    instantiations = []
+
+    providers = FixtureGroup()
+
+    @providers.fixture
+    async def slow(fast):
+        instantiations.append("slow")
+        await asyncio.sleep(0.01)
+        return fast + 1
+
+    @providers.fixture
+    def fast():
+        return 1
+
+    def step(slow, unknown):
+        pass
+
+    async with FixtureScope(providers) as scope:
+        assert scope.get_dependencies(step) == {"slow", "fast", "unknown"}
+
+        futures = scope.prefetch("slow")
+
+        # The running instantiation is awaited instead of starting another.
+        assert await scope.get_or_instantiate("slow") == 2
+        assert await futures[0] == 2
+        assert instantiations == ["slow"]
+
+
+async def test_recursive_fixture():
+    providers = FixtureGroup()
+
+    @providers.fixture
+    def first(second):
+        return second
+
+    @providers.fixture
+    def second(first):
+        return first
+
+    async with FixtureScope(providers) as scope:
+        with pytest.raises(FixtureBindingError) as error:
+            await scope.get_or_instantiate("first")
+
+        assert isinstance(error.value.__cause__.__cause__, RecursionError)
+
+
+async def test_recursive_fixtures_bound_concurrently():
+    providers = FixtureGroup()
+
+    @providers.fixture
+    async def first(second):
+        return second
+
+    @providers.fixture
+    async def second(first):
+        return first
+
+    async with FixtureScope(providers) as scope:
+        # Each fixture is instantiated in its own branch, so the cycle spans two instantiations.
+        with pytest.raises(FixtureBindingError) as error:
+            await asyncio.wait_for(scope.bind(lambda first, second: None), 1)
+
+        cause = error.value
+
+        while cause.__cause__ is not None:
+            cause = cause.__cause__
+
+        assert isinstance(cause, RecursionError)
+
+
+async def test_bind_instantiates_concurrently():
+    events = []
+
+    providers = FixtureGroup()
+
+    @providers.fixture
+    def shared():
+        events.append("shared")
+        yield "shared"
+        events.append("shared finished")
+
+    @providers.fixture
+    async def first(shared):
+        events.append("first started")
+        await asyncio.sleep(0.01)
+        events.append("first")
+        yield shared
+        events.append("first finished")
+
+    @providers.fixture
+    async def second(shared):
+        events.append("second started")
+        await asyncio.sleep(0.02)
+        events.append("second")
+        return shared
+
+    async with FixtureScope(providers) as scope:
+        bound = await scope.bind(lambda first, second: (first, second))
+
+        assert await bound() == ("shared", "shared")
+
+    assert events == [
+        "shared",
+        "first started",
+        "second started",
+        "first",
+        "second",
+        "first finished",
+        "shared finished"
+    ]
+
+
+async def test_bind_error():
+    providers = FixtureGroup()
+
+    @providers.fixture
+    async def slow():
+        await asyncio.sleep(1)
+
+    @providers.fixture
+    def broken():
+        raise ValueError()
+
+    async with FixtureScope(providers) as scope:
+        with pytest.raises(FixtureBindingError) as error:
+            await scope.bind(lambda slow, broken: None)
+
+        assert isinstance(error.value.__cause__, ValueError)
+
+
+async def test_fixture_lookup_follows_changes():
+    first, second = FixtureGroup(), FixtureGroup()
+
+    second["name"] = lambda: "second"
+
+    async with FixtureScope(first, second) as scope:
+        assert scope._get_fixture_from_providers("name")() == "second"
+
+        # Groups are indexed by name, but lookups still see fixtures added later.
+        first["name"] = lambda: "first"
+        assert scope._get_fixture_from_providers("name")() == "first"
+
+        scope.override("name", lambda: "override")
+        assert scope._get_fixture_from_providers("name")() == "override"
+
+        scope.add_provider(lambda name, _: (lambda: "provider") if name == "other" else None)
+        assert scope._get_fixture_from_providers("other")() == "provider"
+
+
+def test_get_parameters():
+    def func(a, b):
+        pass
+
+    assert get_parameters(func) == ("a", "b")
+
+    # The cached parameters are used once a function has been inspected.
+    func.__signature__ = inspect.Signature()
+    assert get_parameters(func) == ("a", "b")
+
+
+async def test_failed_prefetch(tmp_path):
+    attempts = []
+
+    providers = FixtureGroup()
+
+    @providers.fixture
+    async def download(work_path):
+        # Like the sample fixture, a second attempt would fail differently.
+        (work_path / "reads").mkdir()
+        attempts.append(1)
+        raise ConnectionError("Connection lost")
+
+    async with FixtureScope(providers, work_path=tmp_path) as scope:
+        futures = scope.prefetch("download")
+
+        with pytest.raises(ConnectionError):
+            await futures[0]
+
+        for _ in range(2):
+            with pytest.raises(FixtureBindingError) as error:
+                await scope.bind(lambda download: None)
+
+            assert isinstance(error.value.__cause__, ConnectionError)
+
+    assert attempts == [1]
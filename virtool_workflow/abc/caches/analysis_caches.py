@@ -6,3 +6,23 @@ from virtool_workflow.abc.caches.cache import Cache
 @dataclass
 class ReadsCache(Cache):
     quality: dict
+
+
+@dataclass
+class AlignmentCache(Cache):
+    """Cached alignments of sample reads against a reference index."""
+    index_id: str
+    """The ID of the index the reads were aligned against."""
+    parameters: dict
+    """The parameters the alignments were made with."""
+
+
+@dataclass
+class DepletedReadsCache(Cache):
+    """Cached sample reads with host reads removed."""
+    subtraction_ids: list
+    """The IDs of the subtractions host reads were removed for."""
+    count: int
+    """The number of reads before host reads were removed."""
+    depleted: int
+    """The number of host reads that were removed."""
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from virtool_workflow.data_model import HMM
 
@@ -8,6 +8,10 @@ from virtool_workflow.data_model import HMM
 class AbstractHMMsProvider(ABC):
     path: Path
 
+    #: An identifier for the version of ``profiles.hmm`` last returned by :meth:`get_profiles`, if the
+    #: provider supports conditional requests.
+    profiles_etag: Optional[str] = None
+
     @abstractmethod
     async def get(self, hmm_id: str):
         """Get the HMM annotation with the given ID."""
@@ -19,6 +23,11 @@ class AbstractHMMsProvider(ABC):
         ...
 
     @abstractmethod
-    async def get_profiles(self) -> Path:
-        """Get the profiles.hmm file."""
+    async def get_profiles(self, etag: Optional[str] = None) -> Optional[Path]:
+        """
+        Get the profiles.hmm file.
+
+        Returns ``None`` without fetching the file if ``etag`` matches the current version.
+
+        """
         ...
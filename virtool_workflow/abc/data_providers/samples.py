@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from virtool_workflow.analysis.utils import ReadPaths
 from virtool_workflow.data_model import Sample
 from virtool_workflow.data_model.files import VirtoolFileFormat
+from virtool_workflow.storage.streams import StreamingDownload
 
 
 class AbstractSampleProvider(ABC):
@@ -39,6 +40,21 @@ class AbstractSampleProvider(ABC):
         """
         ...
 
+    async def stream_reads(self, target_path: Path, paired: bool = None) -> List[StreamingDownload]:
+        """
+        Start downloading reads for the current sample so they can be read before the downloads finish.
+
+        Providers that can't stream reads download them completely before returning.
+
+        :param target_path: The path where the file(s) will be downloaded.
+        :param paired: Indicates that the sample is paired. If not provided then the sample
+            will be fetched again via `.get()`.
+        :return: A :class:`.StreamingDownload` for each read file.
+        """
+        read_paths = await self.download_reads(target_path, paired)
+
+        return [StreamingDownload.from_path(path) for path in read_paths]
+
     @abstractmethod
     async def download_artifact(self, filename: str, target_path: Path):
         """
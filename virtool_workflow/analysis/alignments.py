@@ -0,0 +1,493 @@
+"""
+Parse and aggregate Bowtie2 SAM output as it is written.
+
+SAM data is split into large blocks of complete lines. Only the fields needed to aggregate alignments
+are parsed, using vectorized operations over each block. Alignments are stored as compact arrays keyed by
+the position of each sequence and OTU in a :class:`.SequenceTable`, so no per-alignment Python objects are
+created.
+
+"""
+import asyncio
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from virtool_workflow.analysis.fastq import BLOCK_SIZE
+from virtool_workflow.execution.run_subprocess import RunSubprocess
+
+#: The SAM flag bit for unmapped reads.
+UNMAPPED = 0x4
+
+#: The SAM flag bits marking lines that are not the first line for a read or pair.
+NOT_FIRST = 0x80 | 0x100 | 0x800
+
+#: CIGAR operations that consume reference bases.
+REFERENCE_OPERATIONS = np.zeros(256, dtype=bool)
+REFERENCE_OPERATIONS[list(b"MDN=X")] = True
+
+_TAB = ord("\t")
+_NEWLINE = ord("\n")
+
+
+@dataclass
+class SequenceTable:
+    """Maps the sequences in a reference index to array positions."""
+    #: The ID of the sequence at each position.
+    sequence_ids: List[str]
+    #: The ID of the OTU at each position.
+    otu_ids: List[str]
+    #: The position of the OTU for each sequence.
+    sequence_otus: np.ndarray
+    #: The length of each sequence.
+    lengths: np.ndarray
+    _positions: Dict[bytes, int] = field(default=None, init=False, repr=False)
+
+    def __len__(self):
+        return len(self.sequence_ids)
+
+    @classmethod
+    def create(cls, sequence_otu_map: Dict[str, str], sequence_lengths: Dict[str, int]) -> "SequenceTable":
+        """
+        Create a table from mappings of sequence IDs to OTU IDs and sequence lengths.
+
+        :param sequence_otu_map: the OTU ID for each sequence ID
+        :param sequence_lengths: the length of each sequence keyed by sequence ID
+        :return: the table
+
+        """
+        sequence_ids = list(sequence_otu_map)
+
+        otu_positions = {}
+
+        for otu_id in sequence_otu_map.values():
+            otu_positions.setdefault(otu_id, len(otu_positions))
+
+        return cls(
+            sequence_ids,
+            list(otu_positions),
+            np.array([otu_positions[otu_id] for otu_id in sequence_otu_map.values()], dtype=np.int32),
+            np.array([sequence_lengths[sequence_id] for sequence_id in sequence_ids], dtype=np.int64)
+        )
+
+    def get_position(self, sequence_id: bytes) -> int:
+        """
+        Get the position of a sequence in the table.
+
+        :param sequence_id: the encoded sequence ID
+        :return: the position of the sequence
+        :raises ValueError: when the sequence is not in the table
+
+        """
+        if self._positions is None:
+            self._positions = {
+                sequence_id.encode(): position for position, sequence_id in enumerate(self.sequence_ids)
+            }
+
+        try:
+            return self._positions[sequence_id]
+        except KeyError:
+            raise ValueError(f"The sequence_id {sequence_id.decode()} does not exist in the index")
+
+
+@dataclass
+class Alignments:
+    """
+    Aggregated alignments for a sample.
+
+    Each alignment is a mapped SAM line. Reads are numbered in the order they appear in the SAM data. For
+    paired data, both mates of a pair share a read number.
+
+    """
+    #: The sequences alignments are positioned against.
+    table: SequenceTable
+    #: The total number of reads, including those that did not align.
+    read_count: int
+    #: The read number for each alignment.
+    reads: np.ndarray
+    #: The sequence position for each alignment.
+    sequences: np.ndarray
+    #: The 0-based start of each alignment on its sequence.
+    positions: np.ndarray
+    #: The number of reference bases covered by each alignment.
+    spans: np.ndarray
+    #: The ``AS:i`` alignment score for each alignment, or 0 if it has none.
+    scores: np.ndarray
+
+    def __len__(self):
+        return len(self.reads)
+
+    @classmethod
+    def load(cls, path: Path, table: SequenceTable) -> "Alignments":
+        """
+        Load alignments written by :meth:`.save`.
+
+        :param path: the path to the alignments file
+        :param table: the sequences in the index the reads were aligned against
+        :return: the alignments
+
+        """
+        with np.load(path) as data:
+            if data["sequence_count"] != len(table):
+                raise ValueError("Alignments were made against a different sequence table")
+
+            return cls(
+                table,
+                int(data["read_count"]),
+                data["reads"],
+                data["sequences"],
+                data["positions"],
+                data["spans"],
+                data["scores"]
+            )
+
+    def save(self, path: Path):
+        """
+        Write the alignments to a compressed file, eg. for upload to an alignments cache.
+
+        :param path: the path to the alignments file
+
+        """
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                sequence_count=len(self.table),
+                read_count=self.read_count,
+                reads=self.reads,
+                sequences=self.sequences,
+                positions=self.positions,
+                spans=self.spans,
+                scores=self.scores
+            )
+
+    @property
+    def sequence_counts(self) -> np.ndarray:
+        """The number of alignments to each sequence."""
+        return np.bincount(self.sequences, minlength=len(self.table))
+
+    @property
+    def otu_counts(self) -> np.ndarray:
+        """The number of reads aligned to each OTU."""
+        otus = self.table.sequence_otus[self.sequences].astype(np.int64)
+
+        pairs = np.unique(self.reads.astype(np.int64) * len(self.table.otu_ids) + otus)
+
+        return np.bincount(pairs % len(self.table.otu_ids), minlength=len(self.table.otu_ids))
+
+    def get_read_groups(self, multimapping: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Group the distinct sequences aligned to by each read.
+
+        :param multimapping: only return reads that align to more than one sequence
+        :return: the read numbers, the offsets of each read's group followed by the total size of the
+            groups, and the sequence positions in all groups
+
+        """
+        pairs = np.unique(self.reads.astype(np.int64) * len(self.table) + self.sequences)
+
+        reads = pairs // len(self.table)
+        sequences = (pairs % len(self.table)).astype(np.int32)
+
+        read_ids, starts, sizes = np.unique(reads, return_index=True, return_counts=True)
+
+        if multimapping:
+            selected = sizes > 1
+
+            read_ids, starts, sizes = read_ids[selected], starts[selected], sizes[selected]
+            sequences = sequences[_expand(starts, sizes)]
+
+        return read_ids, np.concatenate(([0], np.cumsum(sizes))).astype(np.int64), sequences
+
+
+def _expand(starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """Get the indexes covered by runs with the given starts and sizes."""
+    if len(sizes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    offsets = np.cumsum(sizes) - sizes
+
+    return np.repeat(starts - offsets, sizes) + np.arange(sizes.sum())
+
+
+def _parse_integers(view: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Parse the optionally signed decimal integers in the given byte ranges."""
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    negative = view[starts] == ord("-")
+    starts = starts + negative
+
+    widths = ends - starts
+    columns = np.arange(max(int(widths.max()), 1))
+
+    digits = view[np.minimum(starts[:, None] + columns, len(view) - 1)].astype(np.int64) - ord("0")
+
+    exponents = widths[:, None] - 1 - columns
+    digits[exponents < 0] = 0
+
+    values = (digits * 10 ** np.maximum(exponents, 0)).sum(axis=1)
+
+    return np.where(negative, -values, values)
+
+
+def _gather(view: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Gather the given byte ranges into the rows of a 2D array padded with zeros."""
+    widths = ends - starts
+    columns = np.arange(max(int(widths.max()), 1))
+
+    gathered = view[np.minimum(starts[:, None] + columns, len(view) - 1)]
+    gathered[columns >= widths[:, None]] = 0
+
+    return gathered
+
+
+def _parse_cigar_spans(view: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Get the number of reference bases consumed by each CIGAR string in the given byte ranges."""
+    spans = np.zeros(len(starts), dtype=np.int64)
+    numbers = np.zeros(len(starts), dtype=np.int64)
+
+    # CIGAR strings are short, so they are scanned a column at a time across all lines.
+    for column in _gather(view, starts, ends).T.astype(np.int64):
+        digits = (column >= ord("0")) & (column <= ord("9"))
+
+        numbers = np.where(digits, numbers * 10 + column - ord("0"), numbers)
+        spans += np.where(REFERENCE_OPERATIONS[column], numbers, 0)
+        numbers[~digits] = 0
+
+    return spans
+
+
+class AlignmentAccumulator:
+    """
+    Aggregates a stream of SAM data.
+
+    Data can be added in blocks of any size using :meth:`.add`. Lines split across blocks are carried
+    over to the next block. Header lines are skipped.
+
+    """
+
+    def __init__(self, table: SequenceTable):
+        self.table = table
+        self.read_count = 0
+
+        self._reads = []
+        self._sequences = []
+        self._positions = []
+        self._spans = []
+        self._scores = []
+
+        self._remainder = b""
+
+    def add(self, data: bytes):
+        """
+        Add a block of SAM data.
+
+        :param data: uncompressed SAM data
+
+        """
+        data = self._remainder + data
+
+        end = data.rfind(b"\n") + 1
+
+        self._remainder = data[end:]
+
+        if end:
+            self._add_lines(data[:end])
+
+    def flush(self):
+        """
+        Add any data remaining from a SAM stream that doesn't end with a newline.
+
+        """
+        if self._remainder.strip():
+            self._add_lines(self._remainder + b"\n")
+
+        self._remainder = b""
+
+    def _add_lines(self, data: bytes):
+        view = np.frombuffer(data, dtype=np.uint8)
+
+        newlines = np.flatnonzero(view == _NEWLINE)
+        line_starts = np.concatenate(([0], newlines[:-1] + 1))
+
+        line_starts = line_starts[(view[line_starts] != ord("@")) & (line_starts < newlines)]
+
+        if len(line_starts) == 0:
+            return
+
+        tabs = np.flatnonzero(view == _TAB)
+
+        # The index of the first tab on each line. Every line has at least 11 fields.
+        first = np.searchsorted(tabs, line_starts)
+
+        if first[-1] + 10 > len(tabs) or (tabs[first + 9] > newlines[np.searchsorted(newlines, line_starts)]).any():
+            raise ValueError("SAM line has fewer than 11 fields")
+
+        flags = _parse_integers(view, tabs[first] + 1, tabs[first + 1])
+
+        new_reads = (flags & NOT_FIRST) == 0
+
+        # The first line in a block may belong to a read from the previous block.
+        read_numbers = self.read_count + np.cumsum(new_reads) - 1
+
+        self.read_count += int(new_reads.sum())
+
+        mapped = (flags & UNMAPPED) == 0
+
+        if not mapped.any():
+            return
+
+        first = first[mapped]
+        line_ends = newlines[np.searchsorted(newlines, line_starts[mapped])]
+
+        self._reads.append(read_numbers[mapped].astype(np.int32))
+        self._sequences.append(self._get_sequences(view, tabs[first + 1] + 1, tabs[first + 2]))
+        self._positions.append((_parse_integers(view, tabs[first + 2] + 1, tabs[first + 3]) - 1).astype(np.int32))
+        self._spans.append(_parse_cigar_spans(view, tabs[first + 4] + 1, tabs[first + 5]).astype(np.int32))
+        self._scores.append(self._get_scores(view, tabs, first + 10, line_ends))
+
+    def _get_sequences(self, view: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Look up the sequence positions for the reference names in the given byte ranges."""
+        names = _gather(view, starts, ends)
+
+        # Only the distinct names in the block are looked up.
+        unique, inverse = np.unique(names.view(f"S{names.shape[1]}").ravel(), return_inverse=True)
+
+        positions = np.array([self.table.get_position(name) for name in unique.tolist()], dtype=np.int32)
+
+        return positions[inverse]
+
+    @staticmethod
+    def _get_scores(view: np.ndarray, tabs: np.ndarray, optional: np.ndarray, line_ends: np.ndarray) -> np.ndarray:
+        """Parse the ``AS:i`` tag on each line. ``optional`` indexes the tab before each line's optional fields."""
+        tags = tabs[tabs < len(view) - 6]
+        tags = tags[
+            (view[tags + 1] == ord("A")) &
+            (view[tags + 2] == ord("S")) &
+            (view[tags + 3] == ord(":")) &
+            (view[tags + 4] == ord("i")) &
+            (view[tags + 5] == ord(":"))
+        ]
+
+        scores = np.zeros(len(optional), dtype=np.int32)
+
+        if len(tags) == 0:
+            return scores
+
+        # Lines with exactly 11 fields have no optional fields.
+        optional_starts = np.minimum(
+            np.where(optional < len(tabs), tabs[np.minimum(optional, len(tabs) - 1)], len(view)),
+            line_ends
+        )
+
+        found = np.searchsorted(tags, optional_starts)
+
+        has_score = found < len(tags)
+        has_score[has_score] = tags[found[has_score]] < line_ends[has_score]
+
+        starts = tags[found[has_score]] + 6
+
+        next_tabs = np.searchsorted(tabs, starts)
+        ends = np.where(next_tabs < len(tabs), tabs[np.minimum(next_tabs, len(tabs) - 1)], len(view))
+
+        scores[has_score] = _parse_integers(view, starts, np.minimum(ends, line_ends[has_score]))
+
+        return scores
+
+    def result(self) -> Alignments:
+        """
+        Get the aggregated alignments.
+
+        :return: the alignments
+
+        """
+        def concatenate(arrays: List[np.ndarray]) -> np.ndarray:
+            return np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32)
+
+        return Alignments(
+            self.table,
+            self.read_count,
+            concatenate(self._reads),
+            concatenate(self._sequences),
+            concatenate(self._positions),
+            concatenate(self._spans),
+            concatenate(self._scores)
+        )
+
+
+def parse_sam(path: Path, table: SequenceTable, block_size: int = BLOCK_SIZE) -> Alignments:
+    """
+    Aggregate the alignments in a SAM file or named pipe.
+
+    :param path: the path to the SAM file
+    :param table: the sequences in the index the reads were aligned against
+    :param block_size: the number of bytes to read at a time
+    :return: the alignments
+
+    """
+    accumulator = AlignmentAccumulator(table)
+
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(block_size), b""):
+            accumulator.add(data)
+
+    accumulator.flush()
+
+    return accumulator.result()
+
+
+async def run_bowtie2(
+        command: List[str],
+        table: SequenceTable,
+        path: Path,
+        run_subprocess: RunSubprocess,
+        env: Optional[dict] = None
+) -> Alignments:
+    """
+    Run Bowtie2 and aggregate its alignments as they are written.
+
+    Bowtie2 writes its SAM output to a named pipe in ``path``, which is read in large blocks and parsed in
+    a thread. The SAM output is never written to disk. The command should not include ``-S``.
+
+    :param command: the Bowtie2 command
+    :param table: the sequences in the index being aligned against
+    :param path: the directory to create the named pipe in
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :param env: the environment for the Bowtie2 process
+    :return: the alignments
+    :raises RuntimeError: when Bowtie2 exits with a non-zero code
+
+    """
+    loop = asyncio.get_running_loop()
+
+    fifo_path = path / "alignments.sam"
+    os.mkfifo(fifo_path)
+
+    parsing = asyncio.ensure_future(loop.run_in_executor(None, parse_sam, fifo_path, table))
+
+    # Hold a write end of the pipe open until Bowtie2 exits so the parser sees end-of-file even if
+    # Bowtie2 fails before opening it.
+    holder = os.open(fifo_path, os.O_RDWR)
+
+    try:
+        process = await run_subprocess([*command, "-S", str(fifo_path)], env=env, wait=False)
+        bowtie2_exit = asyncio.ensure_future(process.wait())
+
+        # The parser can only finish before Bowtie2 if it fails.
+        await asyncio.wait([bowtie2_exit, parsing], return_when=asyncio.FIRST_COMPLETED)
+
+        if not bowtie2_exit.done():
+            process.terminate()
+            await bowtie2_exit
+    finally:
+        os.close(holder)
+        fifo_path.unlink()
+
+    alignments = await parsing
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Bowtie2 exited with code {process.returncode}")
+
+    return alignments
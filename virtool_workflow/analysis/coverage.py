@@ -0,0 +1,170 @@
+"""
+Calculate per-sequence coverage from aggregated alignments.
+
+Alignment intervals are accumulated into a single difference array that only has room for the sequences
+that received alignments. Depth for every covered sequence is then found with one cumulative sum.
+
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from virtool_workflow.analysis.alignments import Alignments, SequenceTable
+
+SequenceKey = Union[int, str]
+
+
+@dataclass
+class Coverage:
+    """
+    Depth of coverage for the sequences in a :class:`.SequenceTable` that received alignments.
+
+    The depth arrays for all covered sequences are stored back-to-back in :attr:`depth`.
+
+    """
+    #: The sequences alignments were positioned against.
+    table: SequenceTable
+    #: The table positions of the covered sequences in ascending order.
+    sequences: np.ndarray
+    #: The start of each covered sequence in :attr:`depth` followed by the total length.
+    offsets: np.ndarray
+    #: The depth at every position of the covered sequences.
+    depth: np.ndarray
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def __contains__(self, key: SequenceKey):
+        try:
+            self._get_index(key)
+        except (KeyError, ValueError):
+            return False
+
+        return True
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """The length of each covered sequence."""
+        return np.diff(self.offsets)
+
+    @property
+    def breadth(self) -> np.ndarray:
+        """The fraction of each covered sequence that has a depth of at least one."""
+        return self._reduce(self.depth > 0) / np.maximum(self.lengths, 1)
+
+    @property
+    def mean_depth(self) -> np.ndarray:
+        """The mean depth of each covered sequence."""
+        return self._reduce(self.depth) / np.maximum(self.lengths, 1)
+
+    def _reduce(self, values: np.ndarray) -> np.ndarray:
+        sums = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+
+        return sums[self.offsets[1:]] - sums[self.offsets[:-1]]
+
+    def _get_index(self, key: SequenceKey) -> int:
+        position = key if isinstance(key, (int, np.integer)) else self.table.get_position(key.encode())
+
+        index = int(np.searchsorted(self.sequences, position))
+
+        if index == len(self.sequences) or self.sequences[index] != position:
+            raise KeyError(f"Sequence {key} has no coverage")
+
+        return index
+
+    def get_depth(self, key: SequenceKey) -> np.ndarray:
+        """
+        Get the depth at each position of a sequence.
+
+        :param key: the sequence ID or table position
+        :return: the depth array
+        :raises KeyError: when the sequence has no coverage
+
+        """
+        index = self._get_index(key)
+
+        return self.depth[self.offsets[index]:self.offsets[index + 1]]
+
+    def get_run_lengths(self, key: SequenceKey) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run-length encode the depth of a sequence.
+
+        :param key: the sequence ID or table position
+        :return: the start of each run of equal depth and the depth of each run
+        :raises KeyError: when the sequence has no coverage
+
+        """
+        depth = self.get_depth(key)
+
+        starts = np.flatnonzero(np.concatenate(([len(depth) > 0], depth[1:] != depth[:-1])))
+
+        return starts, depth[starts]
+
+    def get_coordinates(self, key: SequenceKey) -> List[Tuple[int, int]]:
+        """
+        Get the compressed coverage of a sequence as ``(position, depth)`` coordinates for upload.
+
+        The first and last positions of every run of equal depth are included, so the coverage can be
+        plotted exactly as a line through the coordinates.
+
+        :param key: the sequence ID or table position
+        :return: the coordinates in order of position
+        :raises KeyError: when the sequence has no coverage
+
+        """
+        depth = self.get_depth(key)
+
+        if len(depth) == 0:
+            return []
+
+        starts, values = self.get_run_lengths(key)
+        ends = np.append(starts[1:], len(depth)) - 1
+
+        coordinates = np.stack((starts, values, ends, values), axis=1).reshape(-1, 2)
+
+        # Runs of a single base have the same start and end.
+        keep = np.ones(len(coordinates), dtype=bool)
+        keep[1::2] = starts != ends
+
+        coordinates = coordinates[keep]
+
+        return list(zip(coordinates[:, 0].tolist(), coordinates[:, 1].tolist()))
+
+
+def calculate_coverage(alignments: Alignments, selected: Optional[np.ndarray] = None) -> Coverage:
+    """
+    Calculate the coverage of each sequence that received alignments.
+
+    Memory is only allocated for the sequences that received alignments.
+
+    :param alignments: the aggregated alignments
+    :param selected: a boolean array that is ``True`` for each alignment to include. All alignments are
+        included by default
+    :return: the coverage
+
+    """
+    sequences = alignments.sequences
+    positions = alignments.positions.astype(np.int64)
+    spans = alignments.spans.astype(np.int64)
+
+    if selected is not None:
+        sequences, positions, spans = sequences[selected], positions[selected], spans[selected]
+
+    covered = np.unique(sequences)
+    lengths = alignments.table.lengths[covered].astype(np.int64)
+
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+    indexes = np.searchsorted(covered, sequences)
+
+    # Alignments are clipped to their sequence. Every interval adds one at its start and subtracts one at
+    # its end within the same sequence, so a single cumulative sum gives the depth for every sequence.
+    starts = offsets[indexes] + np.clip(positions, 0, lengths[indexes])
+    ends = offsets[indexes] + np.clip(positions + spans, 0, lengths[indexes])
+
+    total = int(offsets[-1]) + 1
+
+    difference = np.bincount(starts, minlength=total) - np.bincount(ends, minlength=total)
+
+    return Coverage(alignments.table, covered, offsets, np.cumsum(difference[:-1]).astype(np.int32))
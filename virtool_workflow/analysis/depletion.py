@@ -0,0 +1,402 @@
+"""
+Remove host reads before alignment using k-mer Bloom filters built from subtraction sequences.
+
+A Bloom filter containing the canonical k-mers of each subtraction is built once and persisted in the
+subtraction directory. Reads are streamed through the filters in worker processes, which share the
+memory-mapped filters. Reads whose k-mers are almost all found in a filter are confidently host and are
+dropped. All other reads, including those too short to judge, are kept so they can still be aligned
+against the subtraction with Bowtie2.
+
+"""
+import asyncio
+import gzip
+import json
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from virtool_workflow.analysis.fastq import read_fastq_blocks, split_fastq_block
+from virtool_workflow.analysis.packed import encode_kmers, get_fastq_codes, load_packed_sequences
+from virtool_workflow.analysis.sketches import hash_kmers
+from virtool_workflow.analysis.utils import ReadPaths, make_read_paths
+from virtool_workflow.data_model import Subtraction
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
+
+#: The default k-mer size.
+K = 31
+
+#: The default number of filter bits for each k-mer in the subtraction.
+BITS_PER_KMER = 8
+
+#: The default number of bits set for each k-mer.
+HASHES = 4
+
+#: The default fraction of a read's k-mers that must be found in a filter for it to be dropped as host.
+MIN_HOST_FRACTION = 0.8
+
+#: Used to derive the second hash for each k-mer.
+_SEED = np.uint64(0x9e3779b97f4a7c15)
+
+
+class BloomFilter:
+    """
+    A Bloom filter of encoded k-mers.
+
+    Bit positions are derived from a single 64-bit hash for each k-mer using double hashing. The filter
+    size is always a power of two so positions can be found with a mask.
+
+    """
+
+    def __init__(self, bits: np.ndarray, k: int, hashes: int):
+        #: The filter bits, packed eight to a byte.
+        self.bits = bits
+        #: The k-mer size.
+        self.k = k
+        #: The number of bits set for each k-mer.
+        self.hashes = hashes
+
+    @classmethod
+    def create(cls, kmer_count: int, k: int = K, bits_per_kmer: int = BITS_PER_KMER, hashes: int = HASHES):
+        """
+        Create an empty filter with room for ``kmer_count`` k-mers.
+
+        :param kmer_count: the expected number of k-mers
+        :param k: the k-mer size
+        :param bits_per_kmer: the number of bits for each expected k-mer
+        :param hashes: the number of bits set for each k-mer
+        :return: the empty filter
+
+        """
+        size = 1 << max(6, int(kmer_count * bits_per_kmer - 1).bit_length())
+
+        return cls(np.zeros(size // 8, dtype=np.uint8), k, hashes)
+
+    @property
+    def size(self) -> int:
+        """The number of bits in the filter."""
+        return len(self.bits) * 8
+
+    def _get_positions(self, kmers: np.ndarray) -> np.ndarray:
+        first = hash_kmers(kmers)
+        second = hash_kmers(first ^ _SEED) | np.uint64(1)
+
+        steps = np.arange(self.hashes, dtype=np.uint64)[:, None]
+
+        return (first + steps * second) & np.uint64(self.size - 1)
+
+    def add(self, kmers: np.ndarray):
+        """
+        Add encoded k-mers to the filter.
+
+        :param kmers: a ``uint64`` array of encoded k-mers
+
+        """
+        positions = np.unique(self._get_positions(kmers))
+
+        indexes = positions >> np.uint64(3)
+        masks = (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8)
+
+        # Combine the masks for positions in the same byte. The positions are sorted, so each byte is a run.
+        starts = np.flatnonzero(np.concatenate(([True], indexes[1:] != indexes[:-1])))
+
+        self.bits[indexes[starts]] |= np.bitwise_or.reduceat(masks, starts) if len(starts) else masks
+
+    def contains(self, kmers: np.ndarray) -> np.ndarray:
+        """
+        Check which encoded k-mers are in the filter.
+
+        :param kmers: a ``uint64`` array of encoded k-mers
+        :return: a boolean array that is ``True`` for k-mers that are probably in the filter
+
+        """
+        positions = self._get_positions(kmers)
+
+        found = self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)
+
+        return (found & 1).all(axis=0)
+
+    @classmethod
+    def load(cls, path: Path) -> "BloomFilter":
+        """
+        Memory-map a filter written by :meth:`.save`.
+
+        :param path: the path to the filter directory
+        :return: the filter
+
+        """
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+
+        return cls(np.memmap(path / "bits.bin", dtype=np.uint8, mode="r"), meta["k"], meta["hashes"])
+
+    def save(self, path: Path):
+        """
+        Write the filter to a directory so it can be memory-mapped with :meth:`.load`.
+
+        :param path: the path to the filter directory
+
+        """
+        path.mkdir(parents=True, exist_ok=True)
+
+        np.asarray(self.bits).tofile(path / "bits.bin")
+
+        with open(path / "meta.json", "w") as f:
+            json.dump({"k": self.k, "hashes": self.hashes, "size": self.size}, f)
+
+
+def build_bloom_filter(
+        fasta_path: Path,
+        path: Path,
+        k: int = K,
+        bits_per_kmer: int = BITS_PER_KMER,
+        hashes: int = HASHES
+) -> BloomFilter:
+    """
+    Build a Bloom filter of the canonical k-mers in a FASTA file and write it to ``path``.
+
+    The sequences are packed with :func:`.load_packed_sequences` first if they have not been already. The
+    filter is written to a temporary directory and moved into place when complete.
+
+    :param fasta_path: the path to the FASTA file
+    :param path: the path to the filter directory
+    :param k: the k-mer size
+    :param bits_per_kmer: the number of filter bits for each k-mer in the sequences
+    :param hashes: the number of bits set for each k-mer
+    :return: the memory-mapped filter
+
+    """
+    packed = load_packed_sequences(fasta_path)
+
+    bloom_filter = BloomFilter.create(int(packed.offsets[-1]), k, bits_per_kmer, hashes)
+
+    for index in range(len(packed)):
+        for _, kmers in packed.kmers(index, k, canonical=True):
+            bloom_filter.add(kmers)
+
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    bloom_filter.save(temporary_path)
+
+    try:
+        temporary_path.rename(path)
+    except OSError:
+        # Another process built the same filter first.
+        shutil.rmtree(temporary_path)
+
+    return BloomFilter.load(path)
+
+
+def get_bloom_path(subtraction: Subtraction, k: int = K) -> Path:
+    """
+    Get the path to the persisted Bloom filter for a subtraction.
+
+    eg. ``<work_path>/subtractions/<id>/subtraction.k31.bloom``
+
+    :param subtraction: the subtraction
+    :param k: the k-mer size
+    :return: the path to the filter directory
+
+    """
+    return subtraction.path / f"subtraction.k{k}.bloom"
+
+
+async def load_bloom_filter(subtraction: Subtraction, k: int = K) -> BloomFilter:
+    """
+    Get the Bloom filter for a subtraction, building it if it has not been persisted.
+
+    The subtraction FASTA file is only downloaded if the filter needs to be built.
+
+    :param subtraction: the subtraction
+    :param k: the k-mer size
+    :return: the memory-mapped filter
+
+    """
+    path = get_bloom_path(subtraction, k)
+
+    loop = asyncio.get_running_loop()
+
+    if path.is_dir():
+        return await loop.run_in_executor(None, BloomFilter.load, path)
+
+    return await loop.run_in_executor(None, build_bloom_filter, await subtraction.get_fasta_path(), path, k)
+
+
+#: The filters being searched in a worker process.
+_bloom_filters: List[BloomFilter] = []
+_min_host_fraction: float = MIN_HOST_FRACTION
+
+
+def _initialize_worker(bloom_paths: List[Path], min_host_fraction: float):
+    global _bloom_filters, _min_host_fraction
+
+    _bloom_filters = [BloomFilter.load(path) for path in bloom_paths]
+    _min_host_fraction = min_host_fraction
+
+
+def _classify_block(data: bytes) -> np.ndarray:
+    """Find the records in a block of FASTQ data that are confidently host."""
+    block, _ = split_fastq_block(data)
+
+    codes = get_fastq_codes(block)
+
+    host = np.zeros(len(block), dtype=bool)
+
+    for k in sorted({bloom_filter.k for bloom_filter in _bloom_filters}):
+        positions, kmers = encode_kmers(codes, k, canonical=True)
+
+        found = np.zeros(len(kmers), dtype=bool)
+
+        for bloom_filter in _bloom_filters:
+            if bloom_filter.k == k:
+                found |= bloom_filter.contains(kmers)
+
+        records = np.searchsorted(block.record_starts, positions, side="right") - 1
+
+        totals = np.bincount(records, minlength=len(block))
+        hits = np.bincount(records, weights=found, minlength=len(block))
+
+        host |= (totals > 0) & (hits >= _min_host_fraction * totals)
+
+    return host
+
+
+def classify_fastq(
+        bloom_paths: List[Path],
+        path: Path,
+        min_host_fraction: float = MIN_HOST_FRACTION,
+        processes: int = 1
+) -> np.ndarray:
+    """
+    Find the records in a FASTQ file that are confidently host.
+
+    The file is read in blocks. The blocks are classified in ``processes`` worker processes.
+
+    :param bloom_paths: the paths to the Bloom filters to search
+    :param path: the path to the FASTQ file
+    :param min_host_fraction: the fraction of a read's k-mers that must be in a filter for it to be host
+    :param processes: the number of worker processes
+    :return: a boolean array that is ``True`` for each host record
+
+    """
+    host = [np.zeros(0, dtype=bool)]
+
+    with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_initialize_worker,
+            initargs=(bloom_paths, min_host_fraction)
+    ) as executor:
+        pending = deque()
+
+        for block in read_fastq_blocks(path):
+            # Limit the number of blocks held in memory.
+            if len(pending) >= processes * 2:
+                host.append(pending.popleft().result())
+
+            pending.append(executor.submit(_classify_block, block.data))
+
+        host.extend(future.result() for future in pending)
+
+    return np.concatenate(host)
+
+
+def write_depleted_fastq(path: Path, target_path: Path, keep: np.ndarray, compresslevel: int = 6) -> int:
+    """
+    Write the kept records in a FASTQ file to a gzip-compressed FASTQ file.
+
+    :param path: the path to the FASTQ file
+    :param target_path: the path to write the kept records to
+    :param keep: a boolean array that is ``True`` for each record to keep
+    :param compresslevel: the gzip compression level
+    :return: the number of records written
+
+    """
+    count = 0
+
+    with gzip.open(target_path, "wb", compresslevel=compresslevel) as target:
+        for block in read_fastq_blocks(path):
+            selected = keep[count:count + len(block)]
+
+            target.write(block.select(selected))
+
+            count += len(block)
+
+    return int(keep.sum())
+
+
+@dataclass
+class Depletion:
+    """The result of removing host reads from a sample."""
+    #: The paths to the FASTQ files containing the kept reads.
+    read_paths: ReadPaths
+    #: The number of reads, or pairs, before depletion.
+    count: int
+    #: The number of reads, or pairs, that were removed as host.
+    depleted: int
+
+
+async def deplete_reads(
+        subtractions: Iterable[Subtraction],
+        read_paths: ReadPaths,
+        path: Path,
+        min_host_fraction: float = MIN_HOST_FRACTION,
+        k: int = K,
+        processes: Optional[int] = None,
+        thread_allocator: Optional[ThreadAllocator] = None
+) -> Depletion:
+    """
+    Remove reads that are confidently host from a sample.
+
+    Bloom filters are built for any subtractions that do not have one. For paired data, a pair is only
+    removed if both reads are host. The kept reads are written to ``path`` as ``reads_1.fq.gz`` and, if
+    the data is paired, ``reads_2.fq.gz``. They should still be aligned against the subtractions, since
+    reads that do not pass the threshold may be host.
+
+    If ``processes`` is not given, worker processes are allocated using the ``thread_allocator``.
+
+    :param subtractions: the subtractions to remove reads for
+    :param read_paths: the paths to the FASTQ files for the sample
+    :param path: the directory to write the kept reads to
+    :param min_host_fraction: the fraction of a read's k-mers that must be in a filter for it to be host
+    :param k: the k-mer size
+    :param processes: the number of worker processes to classify reads in
+    :param thread_allocator: the running workflow's ``thread_allocator``
+    :return: the depletion result
+    :raises ValueError: when paired read files contain different numbers of records
+
+    """
+    bloom_paths = []
+
+    for subtraction in subtractions:
+        await load_bloom_filter(subtraction, k)
+        bloom_paths.append(get_bloom_path(subtraction, k))
+
+    loop = asyncio.get_running_loop()
+
+    with allocate_threads(thread_allocator, processes) as processes:
+        host = [
+            await loop.run_in_executor(None, classify_fastq, bloom_paths, read_path, min_host_fraction, processes)
+            for read_path in read_paths
+        ]
+
+    if len({len(mask) for mask in host}) > 1:
+        raise ValueError("Paired FASTQ files contain different numbers of records")
+
+    keep = ~np.logical_and.reduce(host)
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    output_paths = make_read_paths(path, len(read_paths) == 2)
+
+    with ProcessPoolExecutor(max_workers=len(read_paths)) as executor:
+        await asyncio.gather(*[
+            loop.run_in_executor(executor, write_depleted_fastq, read_path, output_path, keep)
+            for read_path, output_path in zip(read_paths, output_paths)
+        ])
+
+    return Depletion(output_paths, len(keep), int(len(keep) - keep.sum()))
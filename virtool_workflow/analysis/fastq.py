@@ -0,0 +1,350 @@
+"""
+Stream FASTQ records from plain or gzip-compressed files.
+
+Files are decompressed in large blocks. Record boundaries in each block are found with vectorized
+operations, so the per-record cost of iteration is little more than slicing the block.
+
+If `ISA-L <https://github.com/pycompression/python-isal>`_ is installed, it is used to decompress
+gzip-compressed files. Otherwise, the standard library :mod:`gzip` module is used.
+
+"""
+import gzip
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import zip_longest
+from pathlib import Path
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+#: The number of decompressed bytes that are processed at a time.
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class FastqRecord(NamedTuple):
+    """
+    A FASTQ record.
+
+    Fields are :class:`memoryview` slices of the block the record was read from. Convert them with
+    :func:`bytes` if they need to be retained after iteration; holding a slice keeps its whole block
+    in memory.
+
+    """
+    #: The record header without the leading ``@``.
+    name: memoryview
+    #: The nucleotide sequence.
+    sequence: memoryview
+    #: The quality string.
+    quality: memoryview
+
+
+@dataclass
+class FastqBatch:
+    """The sequences and qualities of a batch of FASTQ records as numpy arrays."""
+    #: The length of each record.
+    lengths: np.ndarray
+    #: The sequence bytes as a two-dimensional ``uint8`` array padded with zeros to the longest record.
+    sequences: np.ndarray
+    #: The quality bytes as a two-dimensional ``uint8`` array padded with zeros to the longest record.
+    qualities: np.ndarray
+
+    def __len__(self):
+        return len(self.lengths)
+
+
+@dataclass
+class FastqBlock:
+    """
+    A block of FASTQ data containing only complete records.
+
+    Create blocks with :func:`.split_fastq_block` to make sure the records are valid.
+
+    """
+    #: The FASTQ data.
+    data: bytes
+    #: The offsets of the newline characters in :attr:`data`. There are four per record.
+    newlines: np.ndarray
+
+    def __len__(self):
+        return len(self.newlines) // 4
+
+    @cached_property
+    def view(self) -> np.ndarray:
+        """The data as a ``uint8`` array that shares memory with :attr:`data`."""
+        return np.frombuffer(self.data, dtype=np.uint8)
+
+    @cached_property
+    def record_starts(self) -> np.ndarray:
+        """The offset of the ``@`` character beginning each record."""
+        return np.concatenate(([0], self.newlines[3:-1:4] + 1))
+
+    @property
+    def record_ends(self) -> np.ndarray:
+        """The offset after the final newline of each record."""
+        return self.newlines[3::4] + 1
+
+    @property
+    def sequence_starts(self) -> np.ndarray:
+        """The offset of the first base of each record."""
+        return self.newlines[0::4] + 1
+
+    @property
+    def quality_starts(self) -> np.ndarray:
+        """The offset of the first quality character of each record."""
+        return self.newlines[2::4] + 1
+
+    @cached_property
+    def lengths(self) -> np.ndarray:
+        """The length of each record."""
+        return self.newlines[1::4] - self.sequence_starts
+
+    def records(self) -> Iterator[FastqRecord]:
+        """
+        Iterate through the records in the block.
+
+        :return: an iterator of :class:`.FastqRecord` objects
+
+        """
+        data = memoryview(self.data)
+
+        starts = (self.record_starts + 1).tolist()
+        headers = self.newlines[0::4].tolist()
+        sequences = self.newlines[1::4].tolist()
+        qualities = self.newlines[3::4].tolist()
+
+        for start, header, sequence, quality in zip(starts, headers, sequences, qualities):
+            yield FastqRecord(
+                data[start:header],
+                data[header + 1:sequence],
+                data[quality - sequence + header + 1:quality]
+            )
+
+    def select(self, selected: np.ndarray) -> bytes:
+        """
+        Get the data for the selected records in the block.
+
+        :param selected: a boolean array that is ``True`` for each record to keep
+        :return: the FASTQ data for the selected records
+
+        """
+        return self.view[np.repeat(selected, self.record_ends - self.record_starts)].tobytes()
+
+    def batch(self) -> FastqBatch:
+        """
+        Get the sequences and qualities of all records in the block as numpy arrays.
+
+        :return: a :class:`.FastqBatch` for the records in the block
+
+        """
+        lengths = self.lengths
+
+        width = int(lengths.max()) if len(lengths) else 0
+
+        view = self.view
+
+        # Make sure a full-width window can be taken at the start of the final quality string.
+        if len(view) < int(self.quality_starts[-1]) + width:
+            view = np.concatenate((view, np.zeros(width, dtype=np.uint8)))
+
+        # Each row is a view of ``width`` bytes beginning at an offset in the block.
+        windows = np.lib.stride_tricks.sliding_window_view(view, max(width, 1))[:, :width]
+
+        padding = np.arange(width) >= lengths[:, None]
+
+        def gather(starts: np.ndarray) -> np.ndarray:
+            rows = windows[starts]
+            rows[padding] = 0
+
+            return rows
+
+        return FastqBatch(lengths, gather(self.sequence_starts), gather(self.quality_starts))
+
+
+def split_fastq_block(data: bytes) -> Tuple[Optional[FastqBlock], bytes]:
+    """
+    Split FASTQ data into a block of complete records and any incomplete record that follows them.
+
+    :param data: FASTQ data beginning at the start of a record
+    :return: a block of complete records, or ``None`` if there are none, and the remaining data
+    :raises ValueError: when a record is malformed
+
+    """
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+
+    complete = len(newlines) // 4 * 4
+
+    if complete == 0:
+        return None, data
+
+    end = int(newlines[complete - 1]) + 1
+
+    block = FastqBlock(data[:end], newlines[:complete])
+
+    if np.any(block.view[block.record_starts] != ord("@")):
+        raise ValueError("FASTQ record does not start with '@'")
+
+    if not np.array_equal(block.lengths, block.newlines[3::4] - block.quality_starts):
+        raise ValueError("FASTQ record has sequence and quality strings of different lengths")
+
+    return block, data[end:]
+
+
+def flush_fastq_block(remainder: bytes) -> Optional[FastqBlock]:
+    """
+    Get the final record from data remaining at the end of a FASTQ stream.
+
+    The final record is allowed to be missing its trailing newline.
+
+    :param remainder: the remaining data returned by :func:`.split_fastq_block`
+    :return: a block containing the final record or ``None`` if there is no remaining record
+    :raises ValueError: when the data ends with an incomplete record
+
+    """
+    if not remainder.strip():
+        return None
+
+    block, remainder = split_fastq_block(remainder + b"\n")
+
+    if remainder.strip():
+        raise ValueError("FASTQ data ends with an incomplete record")
+
+    return block
+
+
+def open_decompressed(path: Path) -> BinaryIO:
+    """
+    Open a plain or gzip-compressed file for reading in binary mode.
+
+    Gzip-compressed files are detected and decompressed transparently. This can be used for any file
+    format, such as FASTA.
+
+    :param path: the path to the file
+    :return: a binary file object
+
+    """
+    with open(path, "rb") as f:
+        magic = f.read(2)
+
+    if magic == b"\x1f\x8b":
+        if igzip is not None:
+            return igzip.open(path, "rb")
+
+        return gzip.open(path, "rb")
+
+    return open(path, "rb")
+
+
+def open_fastq(path: Path) -> BinaryIO:
+    """
+    Open a FASTQ file for reading in binary mode.
+
+    Gzip-compressed files are detected and decompressed transparently. See :func:`.open_decompressed`.
+
+    :param path: the path to the FASTQ file
+    :return: a binary file object
+
+    """
+    return open_decompressed(path)
+
+
+def decompress_fastq_stream(f: BinaryIO) -> BinaryIO:
+    """
+    Wrap a buffered binary stream of FASTQ data so that it is decompressed transparently if it is
+    gzip-compressed.
+
+    Unlike :func:`.open_fastq`, the stream is only read sequentially, so it can be a pipe or a file that is
+    still being written. The caller is responsible for closing ``f``.
+
+    :param f: a buffered binary stream supporting ``peek``
+    :return: a binary file object
+
+    """
+    if f.peek(2)[:2] == b"\x1f\x8b":
+        if igzip is not None:
+            return igzip.IGzipFile(fileobj=f, mode="rb")
+
+        return gzip.GzipFile(fileobj=f, mode="rb")
+
+    return f
+
+
+def read_fastq_blocks(path: Path, block_size: int = BLOCK_SIZE) -> Iterator[FastqBlock]:
+    """
+    Read a FASTQ file as blocks of complete records.
+
+    :param path: the path to the FASTQ file
+    :param block_size: the number of decompressed bytes to read at a time
+    :return: an iterator of :class:`.FastqBlock` objects
+    :raises ValueError: when the file contains a malformed record
+
+    """
+    remainder = b""
+
+    with open_fastq(path) as f:
+        for data in iter(lambda: f.read(block_size), b""):
+            block, remainder = split_fastq_block(remainder + data)
+
+            if block is not None:
+                yield block
+
+    block = flush_fastq_block(remainder)
+
+    if block is not None:
+        yield block
+
+
+def read_fastq(path: Path, block_size: int = BLOCK_SIZE) -> Iterator[FastqRecord]:
+    """
+    Iterate through the records in a FASTQ file.
+
+    :param path: the path to the FASTQ file
+    :param block_size: the number of decompressed bytes to read at a time
+    :return: an iterator of :class:`.FastqRecord` objects
+
+    """
+    for block in read_fastq_blocks(path, block_size):
+        yield from block.records()
+
+
+def read_paired_fastq(
+        left_path: Path,
+        right_path: Path,
+        block_size: int = BLOCK_SIZE
+) -> Iterator[Tuple[FastqRecord, FastqRecord]]:
+    """
+    Iterate through the records of a pair of FASTQ files in lockstep.
+
+    :param left_path: the path to the FASTQ file for the left reads
+    :param right_path: the path to the FASTQ file for the right reads
+    :param block_size: the number of decompressed bytes to read at a time
+    :return: an iterator of ``(left, right)`` record tuples
+    :raises ValueError: when the files contain different numbers of records
+
+    """
+    pairs = zip_longest(read_fastq(left_path, block_size), read_fastq(right_path, block_size))
+
+    for left, right in pairs:
+        if left is None or right is None:
+            raise ValueError("Paired FASTQ files contain different numbers of records")
+
+        yield left, right
+
+
+def read_fastq_batches(path: Path, block_size: int = BLOCK_SIZE) -> Iterator[FastqBatch]:
+    """
+    Read a FASTQ file as batches of sequence and quality arrays.
+
+    Each batch contains the records from one decompressed block.
+
+    :param path: the path to the FASTQ file
+    :param block_size: the number of decompressed bytes to read at a time
+    :return: an iterator of :class:`.FastqBatch` objects
+
+    """
+    for block in read_fastq_blocks(path, block_size):
+        yield block.batch()
@@ -1,8 +1,13 @@
+import asyncio
 import os
 import shutil
+from functools import partial, reduce
 from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
+from virtool_workflow.analysis.quality import merge_quality
 from virtool_workflow.analysis.utils import ReadPaths
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
 
 
 def handle_base_quality_nan(split_line: list) -> list:
@@ -31,155 +36,159 @@ def handle_base_quality_nan(split_line: list) -> list:
     raise ValueError(f"Could not parse base quality values '{joined}'")
 
 
-def parse_fastqc(fastqc_path: Path, sample_path: Path, prefix="fastqc_") -> dict:
+def _parse_basic_statistics(lines: List[str], fastqc: dict):
+    for line in lines:
+        measure, value = line.split("\t", 1)
+
+        if measure == "Total Sequences":
+            fastqc["count"] = int(value)
+
+        # Read encoding (eg. Illumina 1.9). The line terminator is retained.
+        elif measure == "Encoding":
+            fastqc["encoding"] = value
+
+        elif measure == "Sequence length":
+            split_length = [int(s) for s in value.split("-")]
+            fastqc["length"] = [split_length[0], split_length[-1]]
+
+        elif measure == "%GC":
+            fastqc["gc"] = float(value)
+
+
+def _parse_per_base(flag: str, lines: List[str], fastqc: dict):
+    fastqc[flag] = [None] * fastqc["length"][1]
+
+    for line in lines:
+        # Split line around whitespace.
+        split = line.rstrip().split()
+
+        try:
+            values = [int(value.split(".")[0]) for value in split[1:]]
+        except ValueError:
+            values = handle_base_quality_nan(split)
+
+        # Convert the position field to a range of one or more positions.
+        pos = [int(x) for x in split[0].split("-")]
+
+        for i in range(pos[0], pos[-1] + 1):
+            fastqc[flag][i - 1] = values
+
+
+def _parse_per_sequence_quality(lines: List[str], fastqc: dict):
+    fastqc["sequences"] = [0] * 50
+
+    for line in lines:
+        quality, count = line.rstrip().split()
+        fastqc["sequences"][int(quality)] += int(count.split(".")[0])
+
+
+#: Parsers for the FastQC modules that are included in the quality document, keyed by module name.
+MODULE_PARSERS: Dict[str, Callable[[List[str], dict], None]] = {
+    "Basic Statistics": _parse_basic_statistics,
+    "Per base sequence quality": partial(_parse_per_base, "bases"),
+    "Per sequence quality scores": _parse_per_sequence_quality,
+    "Per base sequence content": partial(_parse_per_base, "composition"),
+}
+
+
+def parse_fastqc_data(path: Path) -> dict:
     """
-    Parse the FastQC results at `fastqc_path`.
+    Parse a single FastQC text data file.
 
-    All FastQC data except the textual data file are removed. The `prefix` will be prepended to the data file name.
+    Lines are collected for each module in the file. When the end of a module is reached, its lines are
+    passed to the matching parser in :data:`MODULE_PARSERS`. Other modules are skipped.
 
-    :param fastqc_path: the FastQC output data path
-    :param sample_path: the FastQC text output file will be moved here
-    :param prefix: a prefix to prepend to the retained FastQC data file
+    :param path: the path to the ``fastqc_data.txt`` file
     :return: a dict containing a representation of the parsed FastQC data
 
     """
-    # Get the text data files from the FastQC output
+    fastqc = {
+        "count": 0
+    }
+
+    parser = None
+    lines = []
+
+    with open(path, "r") as handle:
+        for line in handle:
+            if line.startswith(">>END_MODULE"):
+                if parser:
+                    parser(lines, fastqc)
+
+                parser = None
+
+            elif line.startswith(">>"):
+                parser = MODULE_PARSERS.get(line[2:].split("\t")[0])
+                lines = []
+
+            elif parser and not line.startswith("#"):
+                lines.append(line)
+
+    return fastqc
+
+
+def move_fastqc_data(fastqc_path: Path, sample_path: Path, prefix="fastqc_") -> List[Path]:
+    """
+    Move the FastQC text data files to ``sample_path`` and remove all other FastQC output.
+
+    :param fastqc_path: the FastQC output data path
+    :param sample_path: the FastQC text output files will be moved here
+    :param prefix: a prefix to prepend to the retained FastQC data files
+    :return: the paths to the retained data files in read order
+
+    """
+    paths = []
+
     for name in os.listdir(fastqc_path):
         if "reads" in name and "." not in name:
             suffix = name.split("_")[1]
-            shutil.move(
+            paths.append(Path(shutil.move(
                 os.path.join(fastqc_path, name, "fastqc_data.txt"),
                 os.path.join(sample_path, f"{prefix}{suffix}.txt")
-            )
+            )))
 
     # Dispose of the rest of the data files.
     shutil.rmtree(fastqc_path)
 
-    fastqc = {
-        "count": 0
-    }
+    return sorted(paths)
 
-    # Parse data file(s)
-    for suffix in [1, 2]:
-        path = os.path.join(sample_path, f"{prefix}{suffix}.txt")
 
-        try:
-            handle = open(path, "r")
-        except IOError:
-            if suffix == 2:
-                continue
-            else:
-                raise
+def parse_fastqc(fastqc_path: Path, sample_path: Path, prefix="fastqc_") -> dict:
+    """
+    Parse the FastQC results at `fastqc_path`.
 
-        flag = None
+    All FastQC data except the textual data file are removed. The `prefix` will be prepended to the data file name.
 
-        for line in handle:
-            # Turn off flag if the end of a module is encountered
-            if flag is not None and "END_MODULE" in line:
-                flag = None
-
-            # Total sequences
-            elif "Total Sequences" in line:
-                fastqc["count"] += int(line.split("\t")[1])
-
-            # Read encoding (eg. Illumina 1.9)
-            elif "encoding" not in fastqc and "Encoding" in line:
-                fastqc["encoding"] = line.split("\t")[1]
-
-            # Length
-            elif "Sequence length" in line:
-                split_length = [int(s) for s in line.split("\t")[1].split('-')]
-
-                if suffix == 1:
-                    if len(split_length) == 2:
-                        fastqc["length"] = split_length
-                    else:
-                        fastqc["length"] = [split_length[0], split_length[0]]
-                else:
-                    fastqc_min_length, fastqc_max_length = fastqc["length"]
-
-                    if len(split_length) == 2:
-                        fastqc["length"] = [
-                            min(fastqc_min_length, split_length[0]),
-                            max(fastqc_max_length, split_length[1])
-                        ]
-                    else:
-                        fastqc["length"] = [
-                            min(fastqc_min_length, split_length[0]),
-                            max(fastqc_max_length, split_length[0])
-                        ]
-
-            # GC-content
-            elif "%GC" in line and "#" not in line:
-                gc = float(line.split("\t")[1])
-
-                if suffix == 1:
-                    fastqc["gc"] = gc
-                else:
-                    fastqc["gc"] = (fastqc["gc"] + gc) / 2
-
-            # The statements below handle the beginning of multi-line FastQC sections. They set the flag
-            # value to the found section and allow it to be further parsed.
-            elif "Per base sequence quality" in line:
-                flag = "bases"
-                if suffix == 1:
-                    fastqc[flag] = [None] * fastqc["length"][1]
-
-            elif "Per sequence quality scores" in line:
-                flag = "sequences"
-                if suffix == 1:
-                    fastqc[flag] = [0] * 50
-
-            elif "Per base sequence content" in line:
-                flag = "composition"
-                if suffix == 1:
-                    fastqc[flag] = [None] * fastqc["length"][1]
-
-            # The statements below handle the parsing of lines when the flag has been set for a multi-line
-            # section. This ends when the 'END_MODULE' line is encountered and the flag is reset to none
-            elif flag in ["composition", "bases"] and "#" not in line:
-                # Split line around whitespace.
-                split = line.rstrip().split()
-
-                # Convert all fields except first to 2-decimal floats.
-                try:
-                    values = [round(int(value.split(".")[0]), 1) for value in split[1:]]
-
-                except ValueError as err:
-                    if "NaN" in str(err):
-                        values = handle_base_quality_nan(split)
-
-                # Convert to position field to a one- or two-member tuple.
-                pos = [int(x) for x in split[0].split('-')]
-
-                if len(pos) > 1:
-                    pos = range(pos[0], pos[1] + 1)
-                else:
-                    pos = [pos[0]]
-
-                if suffix == 1:
-                    for i in pos:
-                        fastqc[flag][i - 1] = values
-                else:
-                    for i in pos:
-                        fastqc[flag][i - 1] = [(_1 + _2) / 2 for _1, _2 in zip(values, fastqc[flag][i - 1])]
-
-            elif flag == "sequences" and "#" not in line:
-                line = line.rstrip().split()
-
-                quality = int(line[0])
-
-                fastqc["sequences"][quality] += int(line[1].split(".")[0])
+    :param fastqc_path: the FastQC output data path
+    :param sample_path: the FastQC text output file will be moved here
+    :param prefix: a prefix to prepend to the retained FastQC data file
+    :return: a dict containing a representation of the parsed FastQC data
 
-    return fastqc
+    """
+    paths = move_fastqc_data(fastqc_path, sample_path, prefix)
+
+    if not paths:
+        raise FileNotFoundError(f"No FastQC data found in {fastqc_path}")
+
+    return reduce(merge_quality, [parse_fastqc_data(path) for path in paths])
 
 
-def fastqc(work_path: Path, run_subprocess):
+def fastqc(
+        work_path: Path,
+        run_subprocess,
+        proc: Optional[int] = None,
+        thread_allocator: Optional[ThreadAllocator] = None
+):
     """
     Returns a function that can run FastQC given a ``work_path`` and ``run_subprocess`` callable.
 
+    If ``proc`` is not given, threads are allocated using the ``thread_allocator``. FastQC can't use more
+    threads than there are input files.
+
     :param work_path: the running workflow's ``work_path``
     :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :param proc: the number of processes FastQC can use
+    :param thread_allocator: the running workflow's ``thread_allocator``
     :return: a function that can run FastQC
 
     """
@@ -190,18 +199,28 @@ def fastqc(work_path: Path, run_subprocess):
 
     async def run_fastqc(input_paths: ReadPaths):
         """Run fastqc on the input path and return the parsed result."""
-        command = [
-            "fastqc",
-            "-f", "fastq",
-            "-o", str(fastqc_path),
-            "--extract",
-            *[str(path) for path in input_paths]
-        ]
+        with allocate_threads(thread_allocator, proc, maximum=len(input_paths)) as threads:
+            command = [
+                "fastqc",
+                "-f", "fastq",
+                "-o", str(fastqc_path),
+                "-t", str(max(1, min(threads, len(input_paths)))),
+                "--extract",
+                *[str(path) for path in input_paths]
+            ]
+
+            await run_subprocess(command)
+
+        loop = asyncio.get_running_loop()
+
+        paths = await loop.run_in_executor(None, move_fastqc_data, fastqc_path, output_path)
 
-        await run_subprocess(command)
+        results = await asyncio.gather(*[
+            loop.run_in_executor(None, parse_fastqc_data, path) for path in paths
+        ])
 
-        return parse_fastqc(fastqc_path, output_path)
+        return reduce(merge_quality, results)
 
     run_fastqc.output_path = output_path
 
-    return run_fastqc
\ No newline at end of file
+    return run_fastqc
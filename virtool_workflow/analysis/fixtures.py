@@ -1,5 +1,5 @@
 from virtool_workflow.analysis.sample import sample
-from virtool_workflow.analysis.subtractions import subtractions
+from virtool_workflow.analysis.subtractions import subtraction_downloads, subtractions
 from virtool_workflow.analysis.hmms import hmms
 from virtool_workflow.analysis.analysis import analysis
 from virtool_workflow.analysis.indexes import indexes
@@ -7,6 +7,7 @@ from virtool_workflow.analysis.indexes import indexes
 __all__ = [
     "sample",
     "subtractions",
+    "subtraction_downloads",
     "hmms",
     "analysis",
     "indexes",
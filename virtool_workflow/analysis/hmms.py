@@ -1,32 +1,244 @@
 """
 A class and fixture for accessing Virtool HMM data for use in analysis workflows.
 
+Pressed profiles can be cached in a directory shared by the jobs on a host. Cached profiles are keyed by the
+SHA-256 digest of ``profiles.hmm``, so ``hmmpress`` is only run when the profiles change.
+
+Protein sequences can be searched against the HMM profiles with :func:`.search_hmms`, which splits the
+sequences into balanced shards and runs a HMMER process for each shard concurrently.
+
 """
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import tempfile
 from collections import UserList
+from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
 from shutil import which
-from typing import Iterable, Dict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
 
 from virtool_workflow.abc.data_providers.hmms import AbstractHMMsProvider
 from virtool_workflow.data_model import HMM
 from virtool_workflow.execution.run_subprocess import RunSubprocess
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
 from virtool_workflow.fixtures import fixture
 
 
+class HMMAnnotations:
+    """
+    A columnar table of HMM annotations with prebuilt lookups.
+
+    Scalar attributes are stored as arrays with one element per HMM. Names, families, and genera are interned
+    in :attr:`strings`. Families and genera are stored in CSR form: the families of the HMM at position ``i``
+    are ``families[family_offsets[i]:family_offsets[i + 1]]``.
+
+    The member count for each family is in ``family_counts``. Genera are stored the same way in ``genus_offsets``,
+    ``genera``, and ``genus_counts``.
+
+    Use :meth:`.get_positions` to join arrays of cluster IDs from HMMER hits to the table.
+
+    """
+
+    def __init__(self, hmms: Iterable[HMM]):
+        hmms = list(hmms)
+
+        #: The interned names, families, and genera.
+        self.strings: List[str] = []
+
+        self._string_codes: Dict[str, int] = {}
+
+        #: The Virtool annotation ID of each HMM.
+        self.ids = np.array([hmm.id for hmm in hmms], dtype=object)
+        #: The cluster ID of each HMM.
+        self.clusters = np.array([hmm.cluster for hmm in hmms], dtype=np.int64)
+        #: The number of sequences in each HMM's cluster.
+        self.counts = np.array([hmm.count for hmm in hmms], dtype=np.int64)
+        #: Whether each HMM is hidden.
+        self.hidden = np.array([hmm.hidden for hmm in hmms], dtype=bool)
+        #: The length of each HMM.
+        self.lengths = np.array([hmm.length for hmm in hmms], dtype=np.int64)
+        #: The mean entropy of each HMM.
+        self.mean_entropies = np.array([hmm.mean_entropy for hmm in hmms], dtype=np.float64)
+        #: The total entropy of each HMM.
+        self.total_entropies = np.array([hmm.total_entropy for hmm in hmms], dtype=np.float64)
+        #: The codes in :attr:`strings` for the names of each HMM.
+        self.names: List[Tuple[int, ...]] = [self._intern_all(hmm.names) for hmm in hmms]
+
+        self.family_offsets, self.families, self.family_counts = self._build_counts(hmm.families for hmm in hmms)
+        self.genus_offsets, self.genera, self.genus_counts = self._build_counts(hmm.genera for hmm in hmms)
+
+        order = np.argsort(self.clusters, kind="stable")
+
+        self._sorted_clusters = self.clusters[order]
+        self._cluster_order = order
+
+        self._id_positions: Dict[str, int] = {hmm_id: position for position, hmm_id in enumerate(self.ids)}
+
+        family_rows = np.repeat(np.arange(len(hmms)), np.diff(self.family_offsets))
+        family_order = np.argsort(self.families, kind="stable")
+        boundaries = np.flatnonzero(np.diff(self.families[family_order])) + 1
+
+        self._family_positions: Dict[str, np.ndarray] = {
+            self.strings[self.families[group[0]]]: family_rows[group]
+            for group in np.split(family_order, boundaries) if len(group)
+        }
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def _intern(self, value: str) -> int:
+        try:
+            return self._string_codes[value]
+        except KeyError:
+            self._string_codes[value] = len(self.strings)
+            self.strings.append(value)
+
+            return self._string_codes[value]
+
+    def _intern_all(self, values: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._intern(value) for value in values)
+
+    def _build_counts(self, mappings: Iterable[Dict[str, int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        sizes = []
+        codes = []
+        counts = []
+
+        for mapping in mappings:
+            sizes.append(len(mapping))
+            codes.extend(self._intern_all(mapping))
+            counts.extend(mapping.values())
+
+        return (
+            np.concatenate(([0], np.cumsum(sizes, dtype=np.int64))).astype(np.int64),
+            np.array(codes, dtype=np.int32),
+            np.array(counts, dtype=np.int64)
+        )
+
+    def get_positions(self, clusters: np.ndarray) -> np.ndarray:
+        """
+        Get the table positions of the HMMs with the given cluster IDs.
+
+        :param clusters: an array of cluster IDs
+        :return: the position of each cluster, or ``-1`` for clusters that are not in the table
+
+        """
+        clusters = np.asarray(clusters, dtype=np.int64)
+
+        if len(self) == 0:
+            return np.full(clusters.shape, -1, dtype=np.int64)
+
+        indexes = np.minimum(np.searchsorted(self._sorted_clusters, clusters), len(self) - 1)
+
+        return np.where(self._sorted_clusters[indexes] == clusters, self._cluster_order[indexes], -1)
+
+    def get_ids(self, clusters: np.ndarray) -> np.ndarray:
+        """
+        Get the Virtool annotation IDs of the HMMs with the given cluster IDs.
+
+        :param clusters: an array of cluster IDs
+        :return: an object array of annotation IDs, with ``None`` for clusters that are not in the table
+
+        """
+        positions = self.get_positions(clusters)
+
+        return np.where(positions >= 0, self.ids[np.maximum(positions, 0)] if len(self) else None, None)
+
+    def get_position(self, hmm_id: str) -> int:
+        """
+        Get the table position of an HMM.
+
+        :param hmm_id: the Virtool annotation ID
+        :return: the position
+        :raises KeyError: when no HMM has the ID
+
+        """
+        try:
+            return self._id_positions[hmm_id]
+        except KeyError:
+            raise KeyError(f"No HMM with ID {hmm_id}")
+
+    def get_family_positions(self, family: str) -> np.ndarray:
+        """
+        Get the table positions of the HMMs with members in a virus family.
+
+        :param family: the family name
+        :return: the positions in ascending order
+
+        """
+        return self._family_positions.get(family, np.zeros(0, dtype=np.int64))
+
+    def get_names(self, position: int) -> Tuple[str, ...]:
+        """
+        Get the names of the HMM at a table position.
+
+        :param position: the table position
+        :return: the names
+
+        """
+        return tuple(self.strings[code] for code in self.names[position])
+
+    def get_families(self, position: int) -> Dict[str, int]:
+        """
+        Get the member counts for each virus family of the HMM at a table position.
+
+        :param position: the table position
+        :return: the counts keyed by family
+
+        """
+        return self._get_counts(position, self.family_offsets, self.families, self.family_counts)
+
+    def get_genera(self, position: int) -> Dict[str, int]:
+        """
+        Get the member counts for each virus genus of the HMM at a table position.
+
+        :param position: the table position
+        :return: the counts keyed by genus
+
+        """
+        return self._get_counts(position, self.genus_offsets, self.genera, self.genus_counts)
+
+    def _get_counts(self, position: int, offsets: np.ndarray, codes: np.ndarray, counts: np.ndarray):
+        start, end = offsets[position], offsets[position + 1]
+
+        return {self.strings[code]: count for code, count in zip(codes[start:end].tolist(), counts[start:end].tolist())}
+
+
 class HMMs(UserList):
     """
     A class that exposes:
 
     1. A :class:`dict` the links `HMMER <http://hmmer.org/>`_ cluster IDs to Virtool annotation IDs.
     2. The path to the HMM profiles file.
+    3. A columnar :class:`.HMMAnnotations` table for vectorized lookups.
 
     """
-    def __init__(self, hmms: Iterable[HMM], path: Path):
-        #: The path to the ``profiles.hmm`` file in the ``work_path`` of the running workflow.
+    def __init__(self, hmms: Iterable[HMM], path: Path, annotations: Optional[HMMAnnotations] = None):
+        #: The path to the directory containing ``profiles.hmm`` and the files created by ``hmmpress``.
         self.path: Path = path
         super(HMMs, self).__init__(hmms)
 
+        self._annotations = annotations
+
+    @property
+    def annotations(self) -> HMMAnnotations:
+        """
+        The HMMs as a columnar :class:`.HMMAnnotations` table.
+
+        The ``hmms`` fixture builds the table in a thread. It is built on first access otherwise.
+
+        """
+        if self._annotations is None:
+            self._annotations = HMMAnnotations(self)
+
+        return self._annotations
+
     @cached_property
     def cluster_annotation_map(self) -> Dict[int, str]:
         """
@@ -37,28 +249,395 @@ class HMMs(UserList):
         return {hmm.cluster: hmm.id for hmm in self}
 
 
+def get_profiles_digest(path: Path) -> str:
+    """
+    Get the SHA-256 digest of a ``profiles.hmm`` file.
+
+    :param path: the path to the file
+    :return: the hex digest
+
+    """
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+async def press_profiles(
+        path: Path,
+        run_subprocess: RunSubprocess,
+        thread_allocator: Optional[ThreadAllocator] = None
+):
+    """
+    Run ``hmmpress`` to create the binary files HMMER needs next to a ``profiles.hmm`` file.
+
+    :param path: the path to the ``profiles.hmm`` file
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :param thread_allocator: the running workflow's ``thread_allocator``
+    :raises RuntimeError: when hmmpress is not installed or fails
+
+    """
+    if which("hmmpress") is None:
+        raise RuntimeError("hmmpress is not installed.")
+
+    # hmmpress is single-threaded, but it still counts towards the tools sharing the job's threads.
+    with allocate_threads(thread_allocator, maximum=1):
+        process = await run_subprocess(["hmmpress", str(path)], wait=True)
+
+    if process.returncode != 0:
+        raise RuntimeError("hmmpress command failed")
+
+
+async def load_pressed_profiles(
+        hmms_provider: AbstractHMMsProvider,
+        cache_path: Path,
+        run_subprocess: RunSubprocess,
+        thread_allocator: Optional[ThreadAllocator] = None
+) -> Path:
+    """
+    Get pressed HMM profiles from a cache shared by the jobs on a host.
+
+    The version of the last profiles fetched is recorded in ``latest.json``. If the provider reports that
+    the profiles have not changed since, they are not fetched again. Otherwise, the profiles are fetched
+    and only pressed if no profiles with the same digest are cached.
+
+    Profiles are pressed in a temporary directory that is renamed into place, so jobs starting at the same
+    time never see partially pressed profiles. If two jobs press the same profiles, the first to finish
+    is kept.
+
+    :param hmms_provider: the provider for HMM data
+    :param cache_path: the directory to cache pressed profiles in
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :param thread_allocator: the running workflow's ``thread_allocator``
+    :return: the path to the directory containing the pressed profiles
+
+    """
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    latest_path = cache_path / "latest.json"
+
+    try:
+        latest = json.loads(latest_path.read_text())
+    except (FileNotFoundError, ValueError):
+        latest = {}
+
+    etag = latest["etag"] if latest and (cache_path / latest["digest"]).is_dir() else None
+
+    profiles_path = await hmms_provider.get_profiles(etag)
+
+    if profiles_path is None:
+        return cache_path / latest["digest"]
+
+    loop = asyncio.get_running_loop()
+
+    digest = await loop.run_in_executor(None, get_profiles_digest, profiles_path)
+
+    pressed_path = cache_path / digest
+
+    if not pressed_path.is_dir():
+        temporary_path = Path(tempfile.mkdtemp(prefix=f"{digest}.", suffix=".tmp", dir=cache_path))
+
+        try:
+            await loop.run_in_executor(None, shutil.copyfile, profiles_path, temporary_path / "profiles.hmm")
+            await press_profiles(temporary_path / "profiles.hmm", run_subprocess, thread_allocator)
+
+            try:
+                temporary_path.rename(pressed_path)
+            except OSError:
+                # Another job pressed the same profiles first.
+                shutil.rmtree(temporary_path)
+        except Exception:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            raise
+
+    if hmms_provider.profiles_etag:
+        with tempfile.NamedTemporaryFile(
+                "w", prefix="latest.", suffix=".tmp", dir=cache_path, delete=False
+        ) as f:
+            json.dump({"digest": digest, "etag": hmms_provider.profiles_etag}, f)
+
+        os.replace(f.name, latest_path)
+
+    return pressed_path
+
+
 @fixture
-async def hmms(hmms_provider: AbstractHMMsProvider, work_path: Path, run_subprocess: RunSubprocess):
+async def hmms(
+        hmms_provider: AbstractHMMsProvider,
+        work_path: Path,
+        run_subprocess: RunSubprocess,
+        thread_allocator: ThreadAllocator,
+        cache_path: Optional[Path] = None
+):
     """
     A fixture for accessing HMM data.
 
     The ``*.hmm`` file is copied from the data directory and ``hmmpress`` is run to create all the HMM files.
+    If a ``cache_path`` is configured, pressed profiles are reused from the ``hmms`` directory in it with
+    :func:`.load_pressed_profiles`.
 
     Returns an :class:`.HMMs` object containing the path to the HMM profile file and a `dict` that maps HMM cluster numbers to
-    database IDs.
+    database IDs. The columnar :class:`.HMMAnnotations` table is built in a thread.
 
     :raises: :class:`RuntimeError`: hmmpress is not installed
     :raises: :class:`RuntimeError`: hmmpress command failed
 
     """
-    await hmms_provider.get_profiles()
+    if cache_path is None:
+        await hmms_provider.get_profiles()
+        await press_profiles(hmms_provider.path / "profiles.hmm", run_subprocess, thread_allocator)
 
-    if which("hmmpress") is None:
-        raise RuntimeError("hmmpress is not installed.")
+        path = hmms_provider.path
+    else:
+        path = await load_pressed_profiles(hmms_provider, cache_path / "hmms", run_subprocess, thread_allocator)
 
-    process = await run_subprocess(["hmmpress", str(hmms_provider.path/"profiles.hmm")], wait=True)
+    hmm_list = await hmms_provider.hmm_list()
 
-    if process.returncode != 0:
-        raise RuntimeError("hmmpress command failed")
+    annotations = await asyncio.get_running_loop().run_in_executor(None, HMMAnnotations, hmm_list)
+
+    return HMMs(hmm_list, path, annotations)
+
+
+@dataclass(frozen=True)
+class HMMHit:
+    """
+    A domain hit from the ``--domtblout`` output of ``hmmscan`` or ``hmmsearch``.
+
+    Coordinates are one-based and inclusive, as reported by HMMER.
+
+    """
+    #: The name of the protein sequence.
+    sequence: str
+    #: The cluster ID of the HMM.
+    cluster: int
+    #: The Virtool annotation ID of the HMM. ``None`` if the cluster is not in the HMM list.
+    hmm_id: Optional[str]
+    #: The E-value of the full sequence.
+    full_e: float
+    #: The bit score of the full sequence.
+    full_score: float
+    #: The bias of the full sequence score.
+    full_bias: float
+    #: The number of this domain among the domains found for the sequence and HMM.
+    domain: int
+    #: The number of domains found for the sequence and HMM.
+    domains: int
+    #: The conditional E-value of the domain.
+    c_e: float
+    #: The independent E-value of the domain.
+    i_e: float
+    #: The bit score of the domain.
+    score: float
+    #: The bias of the domain score.
+    bias: float
+    #: The start of the alignment in the HMM.
+    hmm_start: int
+    #: The end of the alignment in the HMM.
+    hmm_end: int
+    #: The start of the alignment in the sequence.
+    ali_start: int
+    #: The end of the alignment in the sequence.
+    ali_end: int
+    #: The start of the domain envelope in the sequence.
+    env_start: int
+    #: The end of the domain envelope in the sequence.
+    env_end: int
+
+
+def split_fasta(path: Path, target_path: Path, count: int) -> Tuple[List[Path], int]:
+    """
+    Split a FASTA file into at most ``count`` shards with similar numbers of residues.
+
+    Each record is assigned to the shard with the fewest residues, starting with the longest record.
+    Records keep their original order within each shard. Empty shards are not written.
+
+    :param path: the path to the FASTA file
+    :param target_path: the directory to write the shards to
+    :param count: the maximum number of shards
+    :return: the paths to the shards and the number of records
+
+    """
+    data = path.read_bytes()
+    view = np.frombuffer(data, dtype=np.uint8)
+
+    starts = np.flatnonzero(view == ord(">"))
+    starts = starts[(starts == 0) | (view[starts - 1] == ord("\n"))]
+
+    ends = np.append(starts[1:], len(data))
+
+    # Header and sequence sizes are both included. They are close enough to the residue count for
+    # balancing and avoid scanning the records for line breaks.
+    sizes = ends - starts
+
+    shards = np.zeros(len(starts), dtype=np.int64)
+    heap = [(0, shard) for shard in range(max(1, min(count, len(starts))))]
+
+    for record in np.argsort(-sizes, kind="stable").tolist():
+        load, shard = heapq.heappop(heap)
+        shards[record] = shard
+        heapq.heappush(heap, (load + int(sizes[record]), shard))
+
+    target_path.mkdir(parents=True, exist_ok=True)
+
+    shard_paths = []
+
+    for shard in range(len(heap)):
+        records = np.flatnonzero(shards == shard)
+
+        if len(records) == 0:
+            continue
+
+        shard_path = target_path / f"shard_{shard}.fa"
+
+        with open(shard_path, "wb") as f:
+            for start, end in zip(starts[records].tolist(), ends[records].tolist()):
+                f.write(data[start:end])
+
+        shard_paths.append(shard_path)
+
+    return shard_paths, len(starts)
+
+
+def get_cluster(name: str) -> int:
+    """
+    Get the cluster ID from the name of a Virtool HMM profile (eg. ``vFam_1234``).
+
+    :param name: the profile name
+    :return: the cluster ID
+
+    """
+    return int(name.rsplit("_", 1)[1])
+
+
+def parse_domtblout(path: Path, cluster_annotation_map: Dict[int, str], program: str = "hmmscan") -> List[HMMHit]:
+    """
+    Parse the ``--domtblout`` output of ``hmmscan`` or ``hmmsearch``.
+
+    The target is the HMM for ``hmmscan`` and the protein sequence for ``hmmsearch``.
+
+    :param path: the path to the output
+    :param cluster_annotation_map: maps HMM cluster IDs to Virtool annotation IDs
+    :param program: the program that wrote the output
+    :return: the hits
+
+    """
+    hits = []
+
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+
+            fields = line.split(maxsplit=22)
+
+            if len(fields) < 22:
+                continue
+
+            if program == "hmmscan":
+                profile, sequence = fields[0], fields[3]
+            else:
+                sequence, profile = fields[0], fields[3]
+
+            cluster = get_cluster(profile)
+
+            hits.append(HMMHit(
+                sequence,
+                cluster,
+                cluster_annotation_map.get(cluster),
+                float(fields[6]),
+                float(fields[7]),
+                float(fields[8]),
+                int(fields[9]),
+                int(fields[10]),
+                float(fields[11]),
+                float(fields[12]),
+                float(fields[13]),
+                float(fields[14]),
+                *[int(field) for field in fields[15:21]]
+            ))
+
+    return hits
+
+
+async def search_hmms(
+        hmms: HMMs,
+        fasta_path: Path,
+        path: Path,
+        run_subprocess: RunSubprocess,
+        program: str = "hmmscan",
+        e_value: Optional[float] = None,
+        processes: Optional[int] = None,
+        thread_allocator: Optional[ThreadAllocator] = None
+) -> List[HMMHit]:
+    """
+    Search protein sequences against the HMM profiles.
+
+    The sequences are split into one shard for each available process and a single-threaded HMMER process
+    is run for each shard concurrently. The ``--domtblout`` outputs are merged into ``hits.domtbl`` in
+    ``path`` and parsed.
+
+    E-values for ``hmmscan`` are unaffected by sharding. For ``hmmsearch``, the total number of sequences is
+    passed with ``-Z``, so full-sequence E-values match those of a single search. A single search scales domain
+    independent E-values by the number of sequences that pass the reporting thresholds, which a shard can't
+    know. The total number of sequences is passed with ``--domZ`` instead, so domain E-values don't depend on
+    the number of shards but are more conservative than those of a single search.
+
+    If ``processes`` is not given, processes are allocated using the ``thread_allocator``.
+
+    :param hmms: the HMMs from the ``hmms`` fixture
+    :param fasta_path: the path to the protein FASTA file
+    :param path: the directory to write the shards and outputs to
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :param program: ``hmmscan`` or ``hmmsearch``
+    :param e_value: the E-value reporting threshold for sequences and domains
+    :param processes: the number of HMMER processes to run
+    :param thread_allocator: the running workflow's ``thread_allocator``
+    :return: the hits joined to their Virtool annotation IDs
+    :raises ValueError: when the program is not ``hmmscan`` or ``hmmsearch``
+    :raises RuntimeError: when the program is not installed or a HMMER process fails
+
+    """
+    if program not in ("hmmscan", "hmmsearch"):
+        raise ValueError(f"Unsupported HMMER program: {program}")
+
+    if which(program) is None:
+        raise RuntimeError(f"{program} is not installed.")
+
+    loop = asyncio.get_running_loop()
+
+    profiles_path = hmms.path / "profiles.hmm"
+    output_path = path / "hits.domtbl"
+
+    with allocate_threads(thread_allocator, processes) as processes:
+        shard_paths, count = await loop.run_in_executor(None, split_fasta, fasta_path, path / "shards", processes)
+
+        async def run_shard(shard_path: Path) -> Path:
+            domtblout_path = shard_path.with_suffix(".domtbl")
+
+            command = [program, "--cpu", "1", "--noali", "-o", "/dev/null", "--domtblout", str(domtblout_path)]
+
+            if e_value is not None:
+                command += ["-E", str(e_value), "--domE", str(e_value)]
+
+            if program == "hmmscan":
+                command += [str(profiles_path), str(shard_path)]
+            else:
+                command += ["-Z", str(count), "--domZ", str(count), str(profiles_path), str(shard_path)]
+
+            process = await run_subprocess(command, wait=True)
+
+            if process.returncode != 0:
+                raise RuntimeError(f"{program} command failed")
+
+            return domtblout_path
+
+        domtblout_paths = await asyncio.gather(*[run_shard(shard_path) for shard_path in shard_paths])
+
+    with open(output_path, "wb") as output:
+        for domtblout_path in domtblout_paths:
+            output.write(domtblout_path.read_bytes())
 
-    return HMMs(await hmms_provider.hmm_list(), hmms_provider.path)
+    return await loop.run_in_executor(None, parse_domtblout, output_path, hmms.cluster_annotation_map, program)
@@ -1,5 +1,7 @@
+import asyncio
 import gzip
 import json
+import os
 import shutil
 from dataclasses import dataclass
 from pathlib import Path
@@ -11,9 +13,13 @@ from virtool_core.utils import decompress_file, compress_file
 from virtool_workflow import data_model
 from virtool_workflow import fixture
 from virtool_workflow.abc.data_providers.indexes import AbstractIndexProvider
+from virtool_workflow.analysis.alignments import SequenceTable
+from virtool_workflow.analysis.packed import PackedSequences, load_packed_sequences
 from virtool_workflow.execution.run_in_executor import FunctionExecutor
 from virtool_workflow.execution.run_subprocess import RunSubprocess
-from virtool_workflow.data_model.files import VirtoolFileFormat
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
+from virtool_workflow.data_model.files import BOWTIE2_SUFFIXES, VirtoolFileFormat
+from virtool_workflow.storage.utils import FileFetcher
 
 
 async def not_implemented(*args):
@@ -30,12 +36,16 @@ class Index(data_model.Index):
 
     1. Access index data when creating an analysis workflow.
 
-       Downloads and provides access to the index JSON, Bowtie2, and FASTA at:
-           - :attr:`.bowtie_path`
+       Downloads the index JSON and provides access to the Bowtie2 index and FASTA using:
+           - :meth:`.get_bowtie_path`
+           - :meth:`.get_fasta_path`
+
+       The Bowtie2 and FASTA files are only downloaded the first time they are requested.
 
        Allows lookup of key index values using
            - :meth:`.get_otu_id_by_sequence_id`
            - :meth:`.get_sequence_length`
+           - :meth:`.get_sequence_table`
 
     """
     path: Path
@@ -44,17 +54,31 @@ class Index(data_model.Index):
     upload: Callable[[Path, VirtoolFileFormat],
                      Awaitable[None]] = not_implemented
     finalize: Callable[[], Awaitable[None]] = not_implemented
+    _thread_allocator: Optional[ThreadAllocator] = None
     _sequence_lengths: Optional[Dict[str, int]] = None
     _sequence_otu_map: Optional[Dict[str, str]] = None
+    _sequence_table: Optional[SequenceTable] = None
+    _files: Optional[FileFetcher] = None
+    _fasta: Optional[asyncio.Future] = None
 
     @property
     def bowtie_path(self) -> Path:
         """
         The path to the Bowtie2 index prefix for the Virtool index.
 
+        The index files may not have been downloaded yet. Use :meth:`.get_bowtie_path` to make sure they are present.
+
         """
         return self.path / "reference"
 
+    @property
+    def compressed_fasta_path(self) -> Path:
+        """
+        The path to the gzip-compressed FASTA file for the reference index in the workflow's work directory.
+
+        """
+        return self.path / "reference.fa.gz"
+
     @property
     def compressed_json_path(self) -> Path:
         """
@@ -68,6 +92,8 @@ class Index(data_model.Index):
         """
         The path to the complete FASTA file for the reference index in the workflow's work directory.
 
+        The file may not have been downloaded yet. Use :meth:`.get_fasta_path` to make sure it is present.
+
         """
         return self.path / "ref.fa"
 
@@ -79,6 +105,51 @@ class Index(data_model.Index):
         """
         return self.path / "otus.json"
 
+    async def get_bowtie_path(self) -> Path:
+        """
+        Download the Bowtie2 index files if they have not been downloaded.
+
+        The FASTA file is not downloaded.
+
+        :return: the path to the Bowtie2 index prefix
+
+        """
+        if self._files is not None:
+            await self._files.fetch(*[f"{self.bowtie_path.name}.{suffix}" for suffix in BOWTIE2_SUFFIXES])
+
+        return self.bowtie_path
+
+    async def get_fasta_path(self) -> Path:
+        """
+        Download the FASTA file if it has not been downloaded and decompress it to :attr:`.fasta_path`.
+
+        The Bowtie2 index files are not downloaded.
+
+        :return: the path to the decompressed FASTA file
+
+        """
+        if self._fasta is None:
+            self._fasta = asyncio.ensure_future(self._prepare_fasta())
+
+        await asyncio.shield(self._fasta)
+
+        return self.fasta_path
+
+    async def _prepare_fasta(self):
+        try:
+            if self._files is not None:
+                await self._files.fetch(self.compressed_fasta_path.name)
+
+            if not self.fasta_path.is_file():
+                temp_path = self.fasta_path.with_name(f"{self.fasta_path.name}.{os.getpid()}")
+
+                await self._run_in_executor(decompress_file, self.compressed_fasta_path, temp_path)
+
+                temp_path.rename(self.fasta_path)
+        except BaseException:
+            self._fasta = None
+            raise
+
     async def decompress_json(self, processes: int):
         """
         Decompress the gzipped JSON file stored in the reference index directory. This data will be used to generate
@@ -119,6 +190,18 @@ class Index(data_model.Index):
         self._sequence_lengths = sequence_lengths
         self._sequence_otu_map = sequence_otu_map
 
+    async def load_packed_sequences(self) -> PackedSequences:
+        """
+        Get the sequences in :attr:`.fasta_path` as memory-mapped :class:`.PackedSequences`.
+
+        The FASTA file is downloaded if needed. The sequences are packed the first time this is called and
+        persisted in the index directory.
+
+        :return: the packed sequences
+
+        """
+        return await self._run_in_executor(load_packed_sequences, await self.get_fasta_path())
+
     def get_otu_id_by_sequence_id(self, sequence_id: str) -> str:
         """
         Return the OTU ID associated with the given ``sequence_id``.
@@ -145,6 +228,20 @@ class Index(data_model.Index):
         except KeyError:
             raise ValueError("The sequence_id does not exist in the index")
 
+    def get_sequence_table(self) -> SequenceTable:
+        """
+        Get a :class:`.SequenceTable` that maps the index's sequences and OTUs to array positions.
+
+        Used to aggregate alignments against the index into arrays.
+
+        :return: the sequence table
+
+        """
+        if self._sequence_table is None:
+            self._sequence_table = SequenceTable.create(self._sequence_otu_map, self._sequence_lengths)
+
+        return self._sequence_table
+
     async def write_isolate_fasta(
             self, otu_ids: List[str], path: Path, processes: int = 1,
     ) -> Dict[str, int]:
@@ -177,11 +274,13 @@ class Index(data_model.Index):
         return lengths
 
     async def build_isolate_index(
-            self, otu_ids: List[str], path: Path, processes: int
+            self, otu_ids: List[str], path: Path, processes: Optional[int] = None
     ) -> Tuple[Path, Dict[str, int]]:
         """
         Generate a FASTA file and Bowtie2 index for all of the isolates of the OTUs specified by ``otu_ids``.
 
+        If ``processes`` is not given, threads are allocated using the workflow's ``thread_allocator``.
+
         :param otu_ids: the list of OTU IDs for which to generate and index
         :param path: the path to the reference index directory
         :param processes: how many processes are available for external program calls
@@ -191,17 +290,18 @@ class Index(data_model.Index):
         """
         fasta_path = Path(f"{path}.fa")
 
-        lengths = await self.write_isolate_fasta(otu_ids, fasta_path, processes)
+        with allocate_threads(self._thread_allocator, processes) as threads:
+            lengths = await self.write_isolate_fasta(otu_ids, fasta_path, threads)
 
-        command = [
-            "bowtie2-build",
-            "--threads",
-            str(processes),
-            str(fasta_path),
-            str(path),
-        ]
+            command = [
+                "bowtie2-build",
+                "--threads",
+                str(threads),
+                str(fasta_path),
+                str(path),
+            ]
 
-        await self._run_subprocess(command, wait=True)
+            await self._run_subprocess(command, wait=True)
 
         return fasta_path, lengths
 
@@ -213,15 +313,25 @@ async def indexes(
         proc: int,
         run_in_executor: FunctionExecutor,
         run_subprocess: RunSubprocess,
+        thread_allocator: ThreadAllocator,
 ) -> List[Index]:
-    """A workflow fixture that lists all reference indexes required for the workflow as :class:`.Index` objects."""
+    """
+    A workflow fixture that lists all reference indexes required for the workflow as :class:`.Index` objects.
+
+    Only the index JSON is downloaded up front. The Bowtie2 and FASTA files of a ready index are downloaded when
+    they are first requested with :meth:`.Index.get_bowtie_path` or :meth:`.Index.get_fasta_path`.
+
+    """
     index_ = await index_provider
 
     index_work_path = work_path / "indexes" / index_.id
     index_work_path.mkdir(parents=True, exist_ok=True)
 
+    files = FileFetcher(index_provider.download, index_work_path)
+
+    await files.fetch("otus.json.gz")
+
     if index_.ready:
-        await index_provider.download(index_work_path)
         index = Index(
             id=index_.id,
             manifest=index_.manifest,
@@ -229,10 +339,11 @@ async def indexes(
             path=index_work_path,
             ready=index_.ready,
             _run_in_executor=run_in_executor,
-            _run_subprocess=run_subprocess
+            _run_subprocess=run_subprocess,
+            _thread_allocator=thread_allocator,
+            _files=files
         )
     else:
-        await index_provider.download(index_work_path, "otus.json.gz")
         index = Index(
             id=index_.id,
             manifest=index_.manifest,
@@ -242,7 +353,8 @@ async def indexes(
             upload=index_provider.upload,
             finalize=index_provider.finalize,
             _run_in_executor=run_in_executor,
-            _run_subprocess=run_subprocess
+            _run_subprocess=run_subprocess,
+            _thread_allocator=thread_allocator
         )
 
     await index.decompress_json(proc)
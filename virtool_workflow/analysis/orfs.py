@@ -0,0 +1,327 @@
+"""
+Find open reading frames (ORFs) in nucleotide sequences and translate them for searching with HMMER.
+
+Codons are translated by looking up their two-bit encoded value in a codon table, so all six frames of a
+batch of sequences are translated with a handful of vectorized operations. ORFs are found as the runs of
+codons between stop codons, or the ends of a sequence, as in the NuVs workflow.
+
+Use :func:`.write_orfs` to stream the ORFs in a FASTA file of contigs to a protein FASTA file that can be
+passed to :func:`.search_hmms`.
+
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from virtool_workflow.analysis.packed import CODES, KMER_CHUNK_SIZE, load_packed_sequences
+
+#: The standard genetic code (NCBI translation table 1) for codons in ``TCAG`` order.
+STANDARD_CODE = "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"
+
+#: The default minimum ORF length in amino acids.
+MIN_LENGTH = 100
+
+#: The default number of bases in each batch of sequences translated at once.
+BATCH_SIZE = KMER_CHUNK_SIZE
+
+#: The index in a codon table for codons that contain an ambiguous base.
+AMBIGUOUS = 64
+
+_STOP = ord("*")
+
+
+def get_codon_table(code: str = STANDARD_CODE) -> np.ndarray:
+    """
+    Create a table that maps encoded codons to amino acids.
+
+    Codons are encoded as ``16 * first + 4 * second + third`` using the base codes from
+    :mod:`virtool_workflow.analysis.packed`. Codons containing an ambiguous base map to ``X``.
+
+    :param code: the amino acids for the 64 codons in ``TCAG`` order, as published by NCBI
+    :return: a ``uint8`` array of 65 amino acid characters
+
+    """
+    if len(code) != 64:
+        raise ValueError("A genetic code must have 64 amino acids")
+
+    tcag = [3, 1, 0, 2]
+
+    table = np.full(AMBIGUOUS + 1, ord("X"), dtype=np.uint8)
+
+    for index, amino_acid in enumerate(code.encode()):
+        table[16 * tcag[index // 16] + 4 * tcag[index // 4 % 4] + tcag[index % 4]] = amino_acid
+
+    return table
+
+
+#: The codon table for the standard genetic code.
+STANDARD_TABLE = get_codon_table()
+
+
+def encode_sequences(sequences: Iterable[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode nucleotide sequences as a single array of base codes.
+
+    :param sequences: the sequences
+    :return: the base codes and the start of each sequence followed by the total length
+
+    """
+    sequences = list(sequences)
+
+    offsets = np.concatenate(([0], np.cumsum([len(sequence) for sequence in sequences]))).astype(np.int64)
+
+    return CODES[np.frombuffer(b"".join(sequences), dtype=np.uint8)], offsets
+
+
+def translate(codes: np.ndarray, table: np.ndarray = STANDARD_TABLE) -> bytes:
+    """
+    Translate an array of base codes in the first frame.
+
+    Trailing bases that do not make a complete codon are ignored.
+
+    :param codes: the base codes
+    :param table: the codon table
+    :return: the amino acids
+
+    """
+    return table[_encode_codons(codes, np.arange(len(codes) // 3, dtype=np.int64) * 3)].tobytes()
+
+
+def _encode_codons(codes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Get the codon table index for the codons starting at ``positions``."""
+    first, second, third = (codes[positions + shift].astype(np.int64) for shift in range(3))
+
+    encoded = 16 * first + 4 * second + third
+
+    encoded[(first > 3) | (second > 3) | (third > 3)] = AMBIGUOUS
+
+    return encoded
+
+
+@dataclass
+class ORFs:
+    """
+    ORFs found in a collection of sequences.
+
+    Coordinates are zero-based and half-open on the forward strand of the source sequence. They cover the
+    translated codons and exclude any terminal stop codon.
+
+    """
+    #: The position of the source sequence for each ORF.
+    sequences: np.ndarray
+    #: The strand of each ORF, ``1`` for forward and ``-1`` for reverse.
+    strands: np.ndarray
+    #: The frame of each ORF on its strand.
+    frames: np.ndarray
+    #: The start of each ORF in its source sequence.
+    starts: np.ndarray
+    #: The end of each ORF in its source sequence.
+    ends: np.ndarray
+    #: The start of each protein in :attr:`proteins` followed by the total length.
+    offsets: np.ndarray
+    #: The translated proteins back-to-back.
+    proteins: bytes
+
+    def __len__(self):
+        return len(self.sequences)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """The length of each protein in amino acids."""
+        return np.diff(self.offsets)
+
+    def get_protein(self, index: int) -> str:
+        """
+        Get the protein sequence of an ORF.
+
+        :param index: the position of the ORF
+        :return: the protein sequence
+
+        """
+        return self.proteins[self.offsets[index]:self.offsets[index + 1]].decode()
+
+
+def _find_frame_orfs(
+        aa: np.ndarray,
+        codon_starts: np.ndarray,
+        min_length: int,
+        require_start: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the ORFs in the translation of one frame of a batch of sequences.
+
+    :param aa: the amino acids for every codon in the batch
+    :param codon_starts: the first codon of each sequence in ``aa`` followed by the total number of codons
+    :return: the first and last-plus-one codon of each ORF
+
+    """
+    stops = np.flatnonzero(aa == _STOP)
+
+    # Every ORF starts at the beginning of a sequence or after a stop and ends at the next stop or the end
+    # of the sequence. Both sets of boundaries interleave, so sorting pairs them up.
+    starts = np.sort(np.concatenate((codon_starts[:-1], stops + 1)))
+    ends = np.sort(np.concatenate((codon_starts[1:], stops)))
+
+    if require_start:
+        methionines = np.flatnonzero(aa == ord("M"))
+
+        # Appending a sentinel past the end means ORFs without a methionine get a negative length.
+        methionines = np.append(methionines, len(aa))
+
+        starts = methionines[np.searchsorted(methionines, starts)]
+
+    keep = ends - starts >= max(min_length, 1)
+
+    return starts[keep], ends[keep]
+
+
+def find_orfs(
+        codes: np.ndarray,
+        offsets: np.ndarray,
+        min_length: int = MIN_LENGTH,
+        require_start: bool = False,
+        table: np.ndarray = STANDARD_TABLE
+) -> ORFs:
+    """
+    Find the ORFs in all six frames of a batch of sequences.
+
+    ORFs are runs of at least ``min_length`` codons that do not contain a stop codon. They are bounded by
+    stop codons or the ends of the sequence, so partial ORFs at the ends of contigs are included. If
+    ``require_start`` is set, ORFs are trimmed to start at their first methionine.
+
+    :param codes: the base codes for the sequences back-to-back
+    :param offsets: the start of each sequence in ``codes`` followed by the total length
+    :param min_length: the minimum ORF length in amino acids
+    :param require_start: only report ORFs from their first start codon
+    :param table: the codon table from :func:`.get_codon_table`
+    :return: the ORFs grouped by strand and frame
+
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+
+    # Reverse complementing the whole batch reverses the order of the sequences.
+    reverse_codes = np.where(codes < 4, 3 - codes, 4).astype(np.uint8)[::-1]
+    reverse_offsets = offsets[-1] - offsets[::-1]
+
+    results = []
+    proteins = []
+
+    for strand, strand_codes, strand_offsets in ((1, codes, offsets), (-1, reverse_codes, reverse_offsets)):
+        strand_lengths = np.diff(strand_offsets)
+
+        for frame in range(3):
+            counts = np.maximum(strand_lengths - frame, 0) // 3
+            codon_starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+            codon_sequences = np.repeat(np.arange(len(counts)), counts)
+
+            # The position of each codon within its own sequence.
+            positions = frame + 3 * (np.arange(codon_starts[-1]) - codon_starts[codon_sequences])
+
+            aa = table[_encode_codons(strand_codes, strand_offsets[codon_sequences] + positions)]
+
+            starts, ends = _find_frame_orfs(aa, codon_starts, min_length, require_start)
+
+            sequences = codon_sequences[starts]
+
+            nucleotide_starts = positions[starts]
+            nucleotide_ends = positions[ends - 1] + 3
+
+            if strand == -1:
+                sequences = len(lengths) - 1 - sequences
+                nucleotide_starts, nucleotide_ends = (
+                    lengths[sequences] - nucleotide_ends,
+                    lengths[sequences] - nucleotide_starts
+                )
+
+            # An ORF can end where the next one starts, so the boundaries are added separately.
+            selected = np.zeros(len(aa) + 1, dtype=np.int8)
+            selected[starts] += 1
+            selected[ends] -= 1
+
+            proteins.append(aa[np.cumsum(selected[:-1]) > 0])
+
+            results.append((
+                sequences,
+                np.full(len(starts), strand, dtype=np.int8),
+                np.full(len(starts), frame, dtype=np.int8),
+                nucleotide_starts,
+                nucleotide_ends,
+                ends - starts
+            ))
+
+    columns = [np.concatenate(column) for column in zip(*results)]
+
+    return ORFs(
+        *columns[:5],
+        np.concatenate(([0], np.cumsum(columns[5]))).astype(np.int64),
+        np.concatenate(proteins).tobytes()
+    )
+
+
+def write_orfs(
+        fasta_path: Path,
+        output_path: Path,
+        min_length: int = MIN_LENGTH,
+        require_start: bool = False,
+        table: np.ndarray = STANDARD_TABLE,
+        packed_path: Optional[Path] = None,
+        batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Find the ORFs in a FASTA file of nucleotide sequences and write their proteins to a FASTA file.
+
+    The sequences are packed with :func:`.load_packed_sequences` and translated in batches, so only one
+    batch of ORFs is held in memory at a time. Each protein is named ``<sequence>.<number>``, with ORFs
+    numbered from zero for each sequence. The strand, frame, and coordinates of the ORF are written to the
+    header description.
+
+    :param fasta_path: the path to the nucleotide FASTA file
+    :param output_path: the path to write the protein FASTA file to
+    :param min_length: the minimum ORF length in amino acids
+    :param require_start: only report ORFs from their first start codon
+    :param table: the codon table from :func:`.get_codon_table`
+    :param packed_path: the path to the packed sequence store. Defaults to :func:`.get_packed_path`
+    :param batch_size: the number of bases translated at a time
+    :return: the number of ORFs written
+
+    """
+    packed = load_packed_sequences(fasta_path, packed_path)
+
+    count = 0
+
+    with open(output_path, "wb") as f:
+        for first, codes, offsets in packed.batches(batch_size):
+            orfs = find_orfs(codes, offsets, min_length, require_start, table)
+
+            # Group the ORFs for each sequence together in position order.
+            order = np.lexsort((orfs.starts, orfs.sequences))
+
+            sequences = orfs.sequences[order]
+            numbers = np.arange(len(order)) - np.searchsorted(sequences, sequences)
+
+            rows = zip(
+                sequences.tolist(),
+                numbers.tolist(),
+                orfs.strands[order].tolist(),
+                orfs.frames[order].tolist(),
+                orfs.starts[order].tolist(),
+                orfs.ends[order].tolist(),
+                orfs.offsets[order].tolist(),
+                orfs.offsets[order + 1].tolist()
+            )
+
+            for sequence, number, strand, frame, start, end, protein_start, protein_end in rows:
+                f.write(
+                    f">{packed.names[first + sequence]}.{number} strand={'+' if strand == 1 else '-'} "
+                    f"frame={frame} start={start} end={end}\n".encode()
+                )
+                f.write(orfs.proteins[protein_start:protein_end])
+                f.write(b"\n")
+
+            count += len(orfs)
+
+    return count
@@ -0,0 +1,508 @@
+"""
+A compact, memory-mapped store for nucleotide sequences.
+
+Bases are packed at four per byte. Sequences are stored back-to-back and located using an offset table.
+Runs of ambiguous bases are stored separately as intervals, so the store for a typical reference or host
+genome is about a quarter of the size of its FASTA file.
+
+Ambiguous bases of any kind are reported as ``N``.
+
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from virtool_workflow.analysis.fastq import BLOCK_SIZE, FastqBlock, open_decompressed
+
+#: The characters for each base code. Code 4 marks an ambiguous base.
+ALPHABET = np.frombuffer(b"ACGTN", dtype=np.uint8)
+
+#: Maps FASTA sequence bytes to base codes.
+CODES = np.full(256, 4, dtype=np.uint8)
+
+for _code, _bases in enumerate((b"Aa", b"Cc", b"Gg", b"TtUu")):
+    CODES[list(_bases)] = _code
+
+#: The bit offset of each base within a packed byte.
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+#: The number of bases unpacked at a time when iterating through k-mers.
+KMER_CHUNK_SIZE = 1024 * 1024
+
+#: Bytes that are ignored in FASTA sequence lines.
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[list(b" \t\r\n")] = True
+
+SequenceKey = Union[int, str]
+
+
+class _PackedWriter:
+    """Writes a stream of base codes to a file at four bases per byte."""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "wb")
+        self.count = 0
+        self.ambiguous: List[List[int]] = []
+        self._remainder = np.zeros(0, dtype=np.uint8)
+
+    def write(self, codes: np.ndarray):
+        ambiguous = codes == 4
+
+        if ambiguous.any():
+            # Find the boundaries of runs of ambiguous bases.
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], ambiguous.view(np.int8), [0]))))
+
+            for start, end in (edges.reshape(-1, 2) + self.count).tolist():
+                if self.ambiguous and self.ambiguous[-1][1] == start:
+                    self.ambiguous[-1][1] = end
+                else:
+                    self.ambiguous.append([start, end])
+
+        self.count += len(codes)
+
+        codes = np.concatenate((self._remainder, codes & 3))
+
+        complete = len(codes) // 4 * 4
+
+        self._pack(codes[:complete])
+        self._remainder = codes[complete:]
+
+    def _pack(self, codes: np.ndarray):
+        packed = np.bitwise_or.reduce(codes.reshape(-1, 4) << SHIFTS, axis=1).astype(np.uint8)
+        self.file.write(packed.tobytes())
+
+    def close(self):
+        if len(self._remainder):
+            self._pack(np.pad(self._remainder, (0, 4 - len(self._remainder))))
+
+        self.file.close()
+
+
+class PackedSequences:
+    """
+    A collection of nucleotide sequences packed at two bits per base.
+
+    Sequences can be looked up by their position in the source FASTA file or by name. Slices are unpacked
+    from only the bytes they cover.
+
+    Use :func:`.pack_fasta` to create a store and :meth:`.load` to memory-map an existing one.
+
+    """
+
+    def __init__(self, names: List[str], offsets: np.ndarray, data: np.ndarray, ambiguous: np.ndarray):
+        #: The sequence names in FASTA order.
+        self.names = names
+        #: The start of each sequence in the packed data followed by the total number of bases.
+        self.offsets = offsets
+        #: The packed bases.
+        self.data = data
+        #: The ``[start, end)`` intervals of ambiguous bases in the packed data.
+        self.ambiguous = ambiguous
+
+        self._indexes: Dict[str, int] = {name: index for index, name in enumerate(names)}
+
+    @classmethod
+    def load(cls, path: Path) -> "PackedSequences":
+        """
+        Memory-map a packed sequence store written by :func:`.pack_fasta`.
+
+        :param path: the path to the store directory
+        :return: the packed sequences
+
+        """
+        with open(path / "names.json") as f:
+            names = json.load(f)
+
+        if (path / "sequences.bin").stat().st_size:
+            data = np.memmap(path / "sequences.bin", dtype=np.uint8, mode="r")
+        else:
+            data = np.zeros(0, dtype=np.uint8)
+
+        return cls(
+            names,
+            np.load(path / "offsets.npy", mmap_mode="r"),
+            data,
+            np.load(path / "ambiguous.npy")
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name: str):
+        return name in self._indexes
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """The length of each sequence."""
+        return np.diff(self.offsets)
+
+    def get_index(self, key: SequenceKey) -> int:
+        """
+        Get the position of a sequence in the store.
+
+        :param key: the name or position of the sequence
+        :return: the position of the sequence
+
+        """
+        if isinstance(key, str):
+            try:
+                return self._indexes[key]
+            except KeyError:
+                raise KeyError(f"No sequence named {key}")
+
+        if not -len(self) <= key < len(self):
+            raise IndexError(f"Sequence index {key} out of range")
+
+        return key % len(self)
+
+    def get_length(self, key: SequenceKey) -> int:
+        """
+        Get the length of a sequence.
+
+        :param key: the name or position of the sequence
+        :return: the length of the sequence
+
+        """
+        index = self.get_index(key)
+        return int(self.offsets[index + 1] - self.offsets[index])
+
+    def _get_range(self, key: SequenceKey, start: int, end: Optional[int]) -> Tuple[int, int]:
+        index = self.get_index(key)
+
+        length = int(self.offsets[index + 1] - self.offsets[index])
+
+        start, end, _ = slice(start, end).indices(length)
+
+        offset = int(self.offsets[index])
+
+        return offset + start, offset + max(start, end)
+
+    def _unpack(self, start: int, end: int) -> np.ndarray:
+        """Unpack the base codes in the global interval ``[start, end)``."""
+        packed = np.asarray(self.data[start // 4:(end + 3) // 4])
+
+        codes = ((packed[:, None] >> SHIFTS) & 3).ravel()[start % 4:start % 4 + end - start]
+
+        first = np.searchsorted(self.ambiguous[:, 1], start, side="right")
+        last = np.searchsorted(self.ambiguous[:, 0], end, side="left")
+
+        for ambiguous_start, ambiguous_end in self.ambiguous[first:last].tolist():
+            codes[max(ambiguous_start, start) - start:min(ambiguous_end, end) - start] = 4
+
+        return codes
+
+    def codes(self, key: SequenceKey, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """
+        Get a slice of a sequence as an array of base codes.
+
+        Bases are coded ``A=0``, ``C=1``, ``G=2``, ``T=3`` and ambiguous bases are coded ``4``.
+
+        :param key: the name or position of the sequence
+        :param start: the start of the slice
+        :param end: the end of the slice
+        :return: a ``uint8`` array of base codes
+
+        """
+        return self._unpack(*self._get_range(key, start, end))
+
+    def sequence(self, key: SequenceKey, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Get a slice of a sequence as a string.
+
+        :param key: the name or position of the sequence
+        :param start: the start of the slice
+        :param end: the end of the slice
+        :return: the sequence
+
+        """
+        return ALPHABET[self.codes(key, start, end)].tobytes().decode()
+
+    def reverse_complement(self, key: SequenceKey, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Get the reverse complement of a slice of a sequence.
+
+        The slice is taken from the forward strand before it is reverse complemented.
+
+        :param key: the name or position of the sequence
+        :param start: the start of the slice
+        :param end: the end of the slice
+        :return: the reverse complement of the sequence
+
+        """
+        return ALPHABET[_complement(self.codes(key, start, end)[::-1])].tobytes().decode()
+
+    def kmers(
+            self,
+            key: SequenceKey,
+            k: int,
+            canonical: bool = False,
+            chunk_size: int = KMER_CHUNK_SIZE
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Iterate through the k-mers in a sequence.
+
+        Each k-mer is encoded as an integer with two bits per base, the first base in the most significant
+        position. K-mers containing ambiguous bases are skipped. The sequence is unpacked
+        ``chunk_size`` bases at a time.
+
+        :param key: the name or position of the sequence
+        :param k: the k-mer size, at most 32
+        :param canonical: use the lesser of each k-mer and its reverse complement
+        :param chunk_size: the number of k-mers to yield at a time
+        :return: an iterator of ``(positions, kmers)`` array tuples
+
+        """
+        if not 0 < k <= 32:
+            raise ValueError("k must be between 1 and 32")
+
+        start, end = self._get_range(key, 0, None)
+        offset = start
+
+        while start + k <= end:
+            chunk_end = min(end, start + chunk_size + k - 1)
+
+            yield encode_kmers(self._unpack(start, chunk_end), k, canonical, start - offset)
+
+            start = chunk_end - k + 1
+
+    def batches(self, batch_size: int = KMER_CHUNK_SIZE) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        Iterate through the sequences in batches of whole sequences with about ``batch_size`` bases each.
+
+        Sequences longer than ``batch_size`` are yielded in a batch of their own. The codes for a batch are
+        unpacked in a single operation because the sequences are stored back-to-back.
+
+        :param batch_size: the target number of bases in each batch
+        :return: an iterator of ``(first, codes, offsets)`` tuples where ``first`` is the position of the
+            first sequence in the batch and ``offsets`` locates each sequence in ``codes``
+
+        """
+        first = 0
+
+        while first < len(self):
+            last = int(np.searchsorted(self.offsets, self.offsets[first] + batch_size, side="right")) - 1
+            last = min(max(last, first + 1), len(self))
+
+            offsets = np.asarray(self.offsets[first:last + 1]) - self.offsets[first]
+
+            yield first, self._unpack(int(self.offsets[first]), int(self.offsets[last])), offsets
+
+            first = last
+
+    def save(self, path: Path):
+        """
+        Write the store to a directory so it can be memory-mapped with :meth:`.load`.
+
+        :param path: the path to the store directory
+
+        """
+        path.mkdir(parents=True, exist_ok=True)
+
+        np.asarray(self.data).tofile(path / "sequences.bin")
+        np.save(path / "offsets.npy", np.asarray(self.offsets))
+        np.save(path / "ambiguous.npy", np.asarray(self.ambiguous))
+
+        with open(path / "names.json", "w") as f:
+            json.dump(self.names, f)
+
+
+def _complement(codes: np.ndarray) -> np.ndarray:
+    return np.where(codes < 4, 3 - codes, 4).astype(np.uint8)
+
+
+def encode_kmers(
+        codes: np.ndarray,
+        k: int,
+        canonical: bool = False,
+        offset: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode the k-mers in an array of base codes as integers.
+
+    See :meth:`.PackedSequences.kmers` for the encoding. Windows containing a code other than 0-3 are
+    skipped.
+
+    :param codes: an array of base codes
+    :param k: the k-mer size, at most 32
+    :param canonical: use the lesser of each k-mer and its reverse complement
+    :param offset: a value added to the returned positions
+    :return: the positions and encoded values of the k-mers
+
+    """
+    count = len(codes) - k + 1
+
+    if count < 1:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+
+    # Windows containing an ambiguous base are dropped.
+    ambiguous = np.concatenate(([0], np.cumsum(codes > 3)))
+    valid = ambiguous[k:] == ambiguous[:-k]
+
+    values = codes.astype(np.uint64) & np.uint64(3)
+
+    kmers = np.zeros(count, dtype=np.uint64)
+
+    for position in range(k):
+        kmers = (kmers << np.uint64(2)) | values[position:position + count]
+
+    if canonical:
+        complement = np.uint64(3) - values
+
+        reverse = np.zeros(count, dtype=np.uint64)
+
+        for position in range(k - 1, -1, -1):
+            reverse = (reverse << np.uint64(2)) | complement[position:position + count]
+
+        kmers = np.minimum(kmers, reverse)
+
+    positions = np.flatnonzero(valid)
+
+    return positions + offset, kmers[positions]
+
+
+def get_fastq_codes(block: FastqBlock) -> np.ndarray:
+    """
+    Get base codes for all bytes in a block of FASTQ records.
+
+    Bytes outside of sequence lines are coded as ambiguous, so k-mers encoded from the codes never span
+    more than one read.
+
+    :param block: a block of FASTQ records
+    :return: an array of base codes the same length as the block data
+
+    """
+    boundaries = np.zeros(len(block.data) + 1, dtype=np.int8)
+    boundaries[block.sequence_starts] = 1
+    boundaries[block.newlines[1::4]] = -1
+
+    return np.where(np.cumsum(boundaries[:-1]) > 0, CODES[block.view], 4).astype(np.uint8)
+
+
+def pack_fasta(fasta_path: Path, path: Path) -> PackedSequences:
+    """
+    Pack the sequences in a plain or gzip-compressed FASTA file and write them to ``path``.
+
+    The FASTA file is streamed in blocks and each block is encoded with vectorized operations. Sequence
+    names are taken from the header up to the first whitespace. The store is written to a temporary
+    directory and moved into place when complete.
+
+    :param fasta_path: the path to the FASTA file
+    :param path: the path to the store directory
+    :return: the memory-mapped packed sequences
+
+    """
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    temporary_path.mkdir(parents=True)
+
+    writer = _PackedWriter(temporary_path / "sequences.bin")
+
+    names = []
+    offsets = []
+
+    remainder = b""
+
+    try:
+        with open_decompressed(fasta_path) as f:
+            for data in iter(lambda: f.read(BLOCK_SIZE), b""):
+                remainder = _pack_lines(remainder + data, writer, names, offsets)
+
+            if remainder.strip():
+                _pack_lines(remainder + b"\n", writer, names, offsets)
+    finally:
+        writer.close()
+
+    if len(names) == 0 and writer.count:
+        raise ValueError("FASTA data does not start with a header")
+
+    np.save(temporary_path / "offsets.npy", np.array(offsets + [writer.count], dtype=np.int64))
+    np.save(temporary_path / "ambiguous.npy", np.array(writer.ambiguous, dtype=np.int64).reshape(-1, 2))
+
+    with open(temporary_path / "names.json", "w") as f:
+        json.dump(names, f)
+
+    try:
+        temporary_path.rename(path)
+    except OSError:
+        # Another process packed the same sequences first.
+        shutil.rmtree(temporary_path)
+
+    return PackedSequences.load(path)
+
+
+def _pack_lines(data: bytes, writer: _PackedWriter, names: List[str], offsets: List[int]) -> bytes:
+    """Pack the complete lines in ``data`` and return any incomplete line that follows them."""
+    view = np.frombuffer(data, dtype=np.uint8)
+
+    newlines = np.flatnonzero(view == 10)
+
+    if len(newlines) == 0:
+        return data
+
+    end = int(newlines[-1]) + 1
+
+    view = view[:end]
+
+    line_starts = np.concatenate(([0], newlines[:-1] + 1))
+    headers = line_starts[view[line_starts] == ord(">")]
+    header_ends = newlines[np.searchsorted(newlines, headers)]
+
+    # Mark the bytes belonging to header lines.
+    boundaries = np.zeros(end + 1, dtype=np.int8)
+    boundaries[headers] = 1
+    boundaries[header_ends + 1] -= 1
+
+    is_sequence = (np.cumsum(boundaries[:-1]) == 0) & ~WHITESPACE[view]
+
+    # The number of bases in the block before each header.
+    preceding = np.concatenate(([0], np.cumsum(is_sequence)))[headers]
+
+    for header, header_end, count in zip(headers.tolist(), header_ends.tolist(), preceding.tolist()):
+        name, *_ = data[header + 1:header_end].split(maxsplit=1) or [b""]
+
+        names.append(name.decode())
+        offsets.append(writer.count + count)
+
+    writer.write(CODES[view[is_sequence]])
+
+    return data[end:]
+
+
+def get_packed_path(fasta_path: Path) -> Path:
+    """
+    Get the default store path for a FASTA file.
+
+    For example, ``subtraction.fa.gz`` is packed to ``subtraction.packed`` in the same directory.
+
+    :param fasta_path: the path to the FASTA file
+    :return: the path to the store directory
+
+    """
+    name = fasta_path.name
+
+    for suffix in (".gz", ".fasta", ".fa"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+
+    return fasta_path.with_name(f"{name}.packed")
+
+
+def load_packed_sequences(fasta_path: Path, path: Optional[Path] = None) -> PackedSequences:
+    """
+    Memory-map the packed sequences for a FASTA file, packing them first if they have not been persisted.
+
+    :param fasta_path: the path to the FASTA file
+    :param path: the path to the store directory. Defaults to :func:`.get_packed_path`
+    :return: the packed sequences
+
+    """
+    path = path or get_packed_path(fasta_path)
+
+    if path.is_dir():
+        return PackedSequences.load(path)
+
+    return pack_fasta(fasta_path, path)
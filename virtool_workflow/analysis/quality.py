@@ -0,0 +1,500 @@
+"""
+Calculate sample quality statistics in-process.
+
+The statistics are equivalent to those produced by running FastQC and parsing its output with
+:func:`virtool_workflow.analysis.fastqc.parse_fastqc`, so they can be used directly as sample and
+cache ``quality`` documents.
+
+"""
+import asyncio
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from pathlib import Path
+from typing import BinaryIO, List, Sequence, Tuple
+
+import numpy as np
+
+from virtool_workflow.analysis.fastq import (BLOCK_SIZE,
+                                             FastqBlock,
+                                             decompress_fastq_stream,
+                                             flush_fastq_block,
+                                             read_fastq_blocks,
+                                             split_fastq_block)
+from virtool_workflow.analysis.utils import ReadPaths
+
+#: The percentiles reported for each base position after the mean: median, quartiles, 10th and 90th.
+PERCENTILES = (50, 25, 75, 10, 90)
+
+#: Maps nucleotide bytes to their column in the composition in FastQC order (G, A, T, C). Other bytes map to 4.
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+
+for _code, _bases in enumerate((b"Gg", b"Aa", b"Tt", b"Cc")):
+    BASE_CODES[list(_bases)] = _code
+
+
+def get_encoding(lowest: int) -> Tuple[str, int]:
+    """
+    Get the name and offset of the Phred quality encoding given the lowest observed quality character.
+
+    :param lowest: the lowest quality character (as an integer) seen in the data
+    :return: the encoding name as reported by FastQC and the offset for the encoding
+
+    """
+    if lowest < 33:
+        raise ValueError(f"No known encoding with a lowest quality character of {lowest}")
+
+    if lowest < 64:
+        return "Sanger / Illumina 1.9", 33
+
+    if lowest == 65:
+        return "Illumina 1.3", 64
+
+    if lowest <= 126:
+        return "Illumina 1.5", 64
+
+    raise ValueError(f"No known encoding with a lowest quality character of {lowest}")
+
+
+def _get_linear_interval(length: int) -> int:
+    multiplier = 1
+
+    while True:
+        for base in (2, 5, 10):
+            interval = base * multiplier
+
+            group_count = 9 + (length - 9) // interval
+
+            if (length - 9) % interval:
+                group_count += 1
+
+            if group_count < 75:
+                return interval
+
+        multiplier *= 10
+
+
+def make_base_groups(length: int) -> List[Tuple[int, int]]:
+    """
+    Group base positions the same way FastQC does when reporting per-base statistics.
+
+    Reads of 75 bases or less are not grouped. For longer reads, the first nine positions are reported
+    individually and the remaining positions are grouped into equal intervals.
+
+    :param length: the maximum read length
+    :return: one-based, inclusive ``(start, end)`` positions for each group
+
+    """
+    if length <= 75:
+        return [(position, position) for position in range(1, length + 1)]
+
+    interval = _get_linear_interval(length)
+
+    groups = []
+    start = 1
+
+    while start <= length:
+        end = start + interval - 1
+
+        if start < 10:
+            end = start
+
+        if start == 10 and interval > 10:
+            end = interval - 1
+
+        groups.append((start, min(end, length)))
+
+        if start < 10:
+            start += 1
+        elif start == 10 and interval > 10:
+            start = interval
+        else:
+            start += interval
+
+    return groups
+
+
+def _truncate(values: Sequence[float]) -> List[int]:
+    """
+    Truncate per-base values to integers like :func:`.parse_fastqc` does.
+
+    Values that can't be calculated (NaN) are replaced following :func:`.handle_base_quality_nan`.
+
+    """
+    numeric = [value for value in values if not np.isnan(value)]
+
+    if len(numeric) == len(values):
+        return [int(value) for value in values]
+
+    if numeric:
+        return [int(numeric[0])] * len(values)
+
+    return [0] * len(values)
+
+
+class QualityAccumulator:
+    """
+    Accumulates quality statistics for a stream of FASTQ data.
+
+    Data can be added in blocks of any size using :meth:`.add`. Records split across blocks are carried
+    over to the next block. Blocks of complete records read with :func:`.read_fastq_blocks` can be added
+    directly using :meth:`.add_block`. All accumulation is done with vectorized operations over each block.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.min_length = None
+        self.max_length = 0
+        self.lowest = 255
+
+        #: Counts of G, A, T, C and other bytes at each position.
+        self.bases = np.zeros((0, 5), dtype=np.int64)
+
+        #: Counts of each quality character at each position.
+        self.qualities = np.zeros((0, 256), dtype=np.int64)
+
+        #: Counts of reads by their mean quality character.
+        self.sequence_qualities = np.zeros(256, dtype=np.int64)
+
+        self._remainder = b""
+
+    def add(self, data: bytes):
+        """
+        Add a block of FASTQ data.
+
+        :param data: uncompressed FASTQ data
+
+        """
+        block, self._remainder = split_fastq_block(self._remainder + data)
+
+        if block is not None:
+            self.add_block(block)
+
+    def add_block(self, block: FastqBlock):
+        """
+        Add a block of complete FASTQ records.
+
+        :param block: the block to add
+
+        """
+        lengths = block.lengths
+
+        self.count += len(lengths)
+
+        min_length = int(lengths.min())
+        max_length = int(lengths.max())
+
+        self.min_length = min_length if self.min_length is None else min(self.min_length, min_length)
+
+        if max_length == 0:
+            return
+
+        if max_length > self.max_length:
+            self._grow(max_length)
+
+        total = int(lengths.sum())
+        offsets = np.cumsum(lengths) - lengths
+
+        # The position within its read of every base in the block.
+        positions = np.arange(total, dtype=np.int64) - np.repeat(offsets, lengths)
+
+        sequence = block.view[np.repeat(block.sequence_starts, lengths) + positions]
+        quality = block.view[np.repeat(block.quality_starts, lengths) + positions]
+
+        self.bases[:max_length] += np.bincount(
+            positions * 5 + BASE_CODES[sequence],
+            minlength=max_length * 5
+        ).reshape(max_length, 5)
+
+        self.qualities[:max_length] += np.bincount(
+            positions * 256 + quality,
+            minlength=max_length * 256
+        ).reshape(max_length, 256)
+
+        nonempty = lengths > 0
+
+        sums = np.add.reduceat(quality.astype(np.int64), offsets[nonempty])
+
+        self.sequence_qualities += np.bincount(sums // lengths[nonempty], minlength=256)
+
+        self.lowest = min(self.lowest, int(quality.min()))
+
+    def update(self, other: "QualityAccumulator"):
+        """
+        Add the statistics accumulated by another accumulator to this one.
+
+        This allows a dataset processed in separate parts to be reported as a whole.
+
+        :param other: the accumulator to add
+
+        """
+        other.flush()
+
+        if other.min_length is None:
+            return
+
+        self.count += other.count
+
+        self.min_length = other.min_length if self.min_length is None else min(self.min_length, other.min_length)
+
+        if other.max_length > self.max_length:
+            self._grow(other.max_length)
+
+        self.bases[:other.max_length] += other.bases
+        self.qualities[:other.max_length] += other.qualities
+        self.sequence_qualities += other.sequence_qualities
+
+        self.lowest = min(self.lowest, other.lowest)
+
+    def _grow(self, length: int):
+        padding = length - self.max_length
+
+        self.bases = np.pad(self.bases, ((0, padding), (0, 0)))
+        self.qualities = np.pad(self.qualities, ((0, padding), (0, 0)))
+
+        self.max_length = length
+
+    def flush(self):
+        """
+        Process any record remaining at the end of the stream.
+
+        :raises ValueError: when the data ends with an incomplete record
+
+        """
+        block = flush_fastq_block(self._remainder)
+
+        self._remainder = b""
+
+        if block is not None:
+            self.add_block(block)
+
+    def result(self) -> dict:
+        """
+        Get the quality statistics for all data added to the accumulator.
+
+        :return: a quality :class:`dict` in the same format as :func:`.parse_fastqc`
+
+        """
+        self.flush()
+
+        if self.count:
+            encoding, offset = get_encoding(self.lowest)
+        else:
+            encoding, offset = get_encoding(33)
+
+        g, a, t, c, _ = self.bases.sum(axis=0)
+        bases_total = g + a + t + c
+
+        groups = make_base_groups(self.max_length)
+
+        return {
+            "count": self.count,
+            # FastQC output parsed by `parse_fastqc` retains the line terminator.
+            "encoding": f"{encoding}\n",
+            "length": [self.min_length or 0, self.max_length],
+            "gc": float((g + c) * 100 // bases_total) if bases_total else 0.0,
+            "bases": self._per_base_qualities(groups, offset),
+            "sequences": self._per_sequence_qualities(offset),
+            "composition": self._per_base_composition(groups)
+        }
+
+    def _per_base_qualities(self, groups: List[Tuple[int, int]], offset: int) -> List[List[int]]:
+        counts = self.qualities.sum(axis=1)
+        cumulative = np.cumsum(self.qualities, axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = self.qualities @ np.arange(256) / counts - offset
+
+        percentiles = [
+            np.argmax(cumulative >= (counts * percentile // 100)[:, None], axis=1) - offset
+            for percentile in PERCENTILES
+        ]
+
+        bases = []
+
+        for start, end in groups:
+            positions = slice(start - 1, end)
+
+            observed = counts[positions] > 0
+            sufficient = counts[positions] > 100
+
+            values = [means[positions][observed].mean() if observed.any() else np.nan]
+
+            for percentile in percentiles:
+                values.append(percentile[positions][sufficient].mean() if sufficient.any() else np.nan)
+
+            bases += [_truncate(values)] * (end - start + 1)
+
+        return bases
+
+    def _per_sequence_qualities(self, offset: int) -> List[int]:
+        sequences = [0] * 50
+
+        for character in np.flatnonzero(self.sequence_qualities):
+            quality = int(character) - offset
+
+            if 0 <= quality < 50:
+                sequences[quality] += int(self.sequence_qualities[character])
+
+        return sequences
+
+    def _per_base_composition(self, groups: List[Tuple[int, int]]) -> List[List[int]]:
+        composition = []
+
+        for start, end in groups:
+            counts = self.bases[start - 1:end, :4].sum(axis=0)
+            total = counts.sum()
+
+            if total:
+                values = counts * 100 / total
+            else:
+                values = [np.nan] * 4
+
+            composition += [_truncate(values)] * (end - start + 1)
+
+        return composition
+
+
+def _merge_positions(left: list, right: list) -> list:
+    """Average per-position values of the right reads into those of the left reads."""
+    overlap = min(len(left), len(right))
+
+    if overlap == 0:
+        return left or right
+
+    averaged = (np.asarray(right[:overlap]) + np.asarray(left[:overlap])) / 2
+
+    return averaged.tolist() + left[overlap:] + right[overlap:]
+
+
+def merge_quality(left: dict, right: dict) -> dict:
+    """
+    Merge the quality statistics for the left and right reads of a paired sample.
+
+    Counts and quality histograms are summed, lengths are combined, and GC content and per-base
+    statistics are averaged.
+
+    :param left: the quality statistics for the left reads
+    :param right: the quality statistics for the right reads
+    :return: the quality statistics for the sample
+
+    """
+    return {
+        "count": left["count"] + right["count"],
+        "encoding": left["encoding"],
+        "length": [
+            min(left["length"][0], right["length"][0]),
+            max(left["length"][1], right["length"][1])
+        ],
+        "gc": (left["gc"] + right["gc"]) / 2,
+        "bases": _merge_positions(left["bases"], right["bases"]),
+        "sequences": (np.asarray(left["sequences"]) + np.asarray(right["sequences"])).tolist(),
+        "composition": _merge_positions(left["composition"], right["composition"])
+    }
+
+
+def compute_quality(path: Path) -> dict:
+    """
+    Calculate quality statistics for a single FASTQ file.
+
+    The file is decompressed and processed in blocks of :data:`BLOCK_SIZE` bytes.
+
+    :param path: the path to the FASTQ file
+    :return: the quality statistics for the file
+
+    """
+    accumulator = QualityAccumulator()
+
+    for block in read_fastq_blocks(path):
+        accumulator.add_block(block)
+
+    return accumulator.result()
+
+
+def compute_stream_quality(f: BinaryIO) -> dict:
+    """
+    Calculate quality statistics for FASTQ data read sequentially from a buffered binary stream.
+
+    The stream can be a pipe or a file that is still being written. Gzip-compressed data is decompressed
+    transparently using :func:`.decompress_fastq_stream`.
+
+    :param f: a buffered binary stream supporting ``peek``
+    :return: the quality statistics for the data
+
+    """
+    accumulator = QualityAccumulator()
+
+    source = decompress_fastq_stream(f)
+
+    for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+        accumulator.add(block)
+
+    accumulator.flush()
+
+    return accumulator.result()
+
+
+def compress_and_accumulate_quality(
+        source_path: Path,
+        target_path: Path,
+        compresslevel: int = 6
+) -> QualityAccumulator:
+    """
+    Gzip-compress uncompressed FASTQ data and accumulate its quality statistics in a single pass.
+
+    The source can be a named pipe, allowing statistics to be calculated while another process is
+    writing the data.
+
+    :param source_path: the path to the uncompressed FASTQ data
+    :param target_path: the path to write the compressed FASTQ file to
+    :param compresslevel: the gzip compression level
+    :return: the accumulator containing statistics for the data
+
+    """
+    accumulator = QualityAccumulator()
+
+    with open(source_path, "rb") as source, gzip.open(target_path, "wb", compresslevel=compresslevel) as target:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+            accumulator.add(block)
+            target.write(block)
+
+    accumulator.flush()
+
+    return accumulator
+
+
+def compress_and_compute_quality(source_path: Path, target_path: Path, compresslevel: int = 6) -> dict:
+    """
+    Gzip-compress uncompressed FASTQ data and calculate its quality statistics in a single pass.
+
+    See :func:`.compress_and_accumulate_quality`.
+
+    :param source_path: the path to the uncompressed FASTQ data
+    :param target_path: the path to write the compressed FASTQ file to
+    :param compresslevel: the gzip compression level
+    :return: the quality statistics for the data
+
+    """
+    return compress_and_accumulate_quality(source_path, target_path, compresslevel).result()
+
+
+async def calculate_quality(read_paths: ReadPaths) -> dict:
+    """
+    Calculate quality statistics for a sample without running FastQC.
+
+    Each read file is processed concurrently in a separate worker process. The result for paired
+    data is merged using :func:`.merge_quality`.
+
+    :param read_paths: the paths to the FASTQ files for the sample
+    :return: a quality :class:`dict` in the same format as :func:`.parse_fastqc`
+
+    """
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=len(read_paths)) as executor:
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, compute_quality, path) for path in read_paths
+        ])
+
+    return reduce(merge_quality, results)
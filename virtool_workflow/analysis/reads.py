@@ -1,23 +1,31 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
 from dataclasses import dataclass
+from functools import reduce
 from pathlib import Path
+from typing import AsyncIterator, Optional
 
 from aiohttp import ClientSession
 
-from virtool_workflow.analysis.fastqc import fastqc
+from virtool_workflow.analysis.quality import calculate_quality, compute_stream_quality, merge_quality
 from virtool_workflow.analysis.skewer import skewer
+from virtool_workflow.analysis.subsample import Subsample, subsample, subsample_reads
 from virtool_workflow.analysis.trimming import (trimming_cache_key,
                                                 trimming_min_length,
                                                 trimming_parameters)
-from virtool_workflow.api.caches import RemoteReadCaches
+from virtool_workflow.analysis.utils import ReadPaths
+from virtool_workflow.api.caches import RemoteCaches, RemoteReadCaches
 from virtool_workflow.data_model.samples import Sample
+from virtool_workflow.execution.threads import ThreadAllocator
 from virtool_workflow.fixtures.providers import FixtureGroup
 from virtool_workflow.caching.caches import GenericCaches
-from virtool_workflow.abc.caches.analysis_caches import ReadsCache
+from virtool_workflow.abc.caches.analysis_caches import AlignmentCache, DepletedReadsCache, ReadsCache
 
 fixtures = FixtureGroup(
     trimming_min_length,
     trimming_cache_key,
-    trimming_parameters
+    trimming_parameters,
+    subsample
 )
 
 
@@ -27,12 +35,14 @@ class Reads:
     Dataclass storing the trimmed reads for a sample.
 
     :param sample: The target sample.
-    :param quality: The fastqc results for the trimmed reads.
+    :param quality: The quality statistics for the sample reads before trimming.
     :param path: The path to the directory containing the trimmed read files.
+    :param subsample: The subsample the reads were taken from in preview mode.
     """
     sample: Sample
     quality: dict
     path: Path
+    subsample: Optional[Subsample] = None
 
     @property
     def left(self):
@@ -43,6 +53,70 @@ class Reads:
         return self.path / "reads_2.fq.gz"
 
 
+@asynccontextmanager
+async def open_read_paths(sample: Sample) -> AsyncIterator[ReadPaths]:
+    """
+    Provide paths to the sample reads that can be passed to a program that reads them sequentially.
+
+    If the reads are still downloading, named pipes fed by the downloads are provided so the program can start
+    before the downloads finish. The pipes are removed when the context exits. Otherwise, the paths to the
+    complete read files are provided.
+
+    :param sample: the sample
+    :return: the paths to read the sample reads from
+
+    """
+    downloads = sample.read_downloads
+
+    if not downloads or all(download.complete for download in downloads):
+        yield await sample.get_read_paths()
+        return
+
+    async with AsyncExitStack() as stack:
+        yield tuple([
+            await stack.enter_async_context(
+                download.fifo(download.path.with_name(download.path.name.replace(".fq", ".stream.fq")))
+            ) for download in downloads
+        ])
+
+
+def compute_download_quality(download) -> dict:
+    """
+    Calculate quality statistics for a read file as it is downloaded.
+
+    This blocks until the download is complete, so it should be run in a thread.
+
+    :param download: the :class:`.StreamingDownload` for the read file
+    :return: the quality statistics for the file
+
+    """
+    with download.open() as f:
+        return compute_stream_quality(f)
+
+
+async def calculate_sample_quality(sample: Sample, run_in_executor) -> dict:
+    """
+    Calculate quality statistics for the sample reads.
+
+    If the reads are still downloading, each file is read in a thread as it arrives, so the statistics can be
+    calculated while the reads are being trimmed. Otherwise, the complete files are processed with
+    :func:`.calculate_quality`.
+
+    :param sample: the sample
+    :param run_in_executor: the running workflow's ``run_in_executor`` callable
+    :return: the quality statistics for the sample reads
+
+    """
+    downloads = sample.read_downloads
+
+    if not downloads or all(download.complete for download in downloads):
+        return await calculate_quality(await sample.get_read_paths())
+
+    results = await asyncio.gather(*[run_in_executor(compute_download_quality, download) for download in downloads])
+
+    return reduce(merge_quality, results)
+
+
 @fixtures.fixture
 def sample_caches(
         sample: Sample,
@@ -52,7 +126,7 @@ def sample_caches(
         run_in_executor,
 ):
     cache_path = work_path / "caches" / sample.id
-    cache_path.mkdir(parents=True)
+    cache_path.mkdir(parents=True, exist_ok=True)
     return RemoteReadCaches(
         sample.id,
         sample.paired,
@@ -63,6 +137,56 @@ def sample_caches(
     )
 
 
+@fixtures.fixture
+def alignment_caches(
+        sample: Sample,
+        work_path: Path,
+        jobs_api_url: str,
+        http: ClientSession,
+        run_in_executor,
+):
+    """
+    Caches for alignments of the sample's trimmed reads.
+
+    Use :func:`virtool_workflow.caching.keys.alignment_cache_key` to compute keys.
+    """
+    cache_path = work_path / "caches" / sample.id
+    cache_path.mkdir(parents=True, exist_ok=True)
+    return RemoteCaches[AlignmentCache](
+        sample.id,
+        sample.paired,
+        cache_path,
+        http,
+        jobs_api_url,
+        run_in_executor
+    )
+
+
+@fixtures.fixture
+def depleted_reads_caches(
+        sample: Sample,
+        work_path: Path,
+        jobs_api_url: str,
+        http: ClientSession,
+        run_in_executor,
+):
+    """
+    Caches for the sample's trimmed reads with host reads removed.
+
+    Use :func:`virtool_workflow.caching.keys.depleted_reads_cache_key` to compute keys.
+    """
+    cache_path = work_path / "caches" / sample.id
+    cache_path.mkdir(parents=True, exist_ok=True)
+    return RemoteCaches[DepletedReadsCache](
+        sample.id,
+        sample.paired,
+        cache_path,
+        http,
+        jobs_api_url,
+        run_in_executor
+    )
+
+
 @fixtures.fixture
 async def reads(
     sample: Sample,
@@ -70,25 +194,50 @@ async def reads(
     trimming_min_length: int,
     trimming_parameters: dict,
     trimming_cache_key: str,
-    work_path: Path,
+    subsample: Optional[Subsample],
     run_subprocess,
-    run_in_executor
+    run_in_executor,
+    thread_allocator: ThreadAllocator
 ):
     """
     The trimmed sample reads.
 
     If a cache exists it will be used, otherwise a new cache will be created.
+
+    In preview mode, a subsample of the sample reads is trimmed and cached separately.
+
+    If the sample reads are being streamed, Skewer reads them through named pipes while they are downloading.
+
+    The quality statistics describe the reads before trimming. They are calculated while Skewer runs.
     """
 
     try:
         cache = await sample_caches.get(trimming_cache_key)
-        return Reads(sample, quality=cache.quality, path=cache.path)
+        return Reads(sample, quality=cache.quality, path=cache.path, subsample=subsample)
     except KeyError:
-        result = await skewer(
-            **trimming_parameters
-        )(sample.read_paths, run_subprocess, run_in_executor)
-
-        quality = await fastqc(work_path, run_subprocess)(sample.read_paths)
+        trim = skewer(**trimming_parameters)
+
+        if subsample is None:
+            async with open_read_paths(sample) as read_paths:
+                result, quality = await asyncio.gather(
+                    trim(read_paths, run_subprocess, run_in_executor, thread_allocator),
+                    calculate_sample_quality(sample, run_in_executor)
+                )
+        else:
+            read_paths = await sample.get_read_paths()
+
+            read_paths = await subsample_reads(
+                read_paths,
+                read_paths[0].parent / "subsample",
+                subsample.n,
+                subsample.fraction,
+                subsample.seed
+            )
+
+            result, quality = await asyncio.gather(
+                trim(read_paths, run_subprocess, run_in_executor, thread_allocator),
+                calculate_quality(read_paths)
+            )
 
         async with sample_caches.create(trimming_cache_key) as cache:
             for path in result.read_paths:
@@ -96,4 +245,4 @@ async def reads(
 
                 cache.quality = quality
 
-        return Reads(sample=sample, quality=quality, path=result.left.parent)
+        return Reads(sample=sample, quality=quality, path=result.left.parent, subsample=subsample)
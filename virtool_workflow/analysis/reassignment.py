@@ -0,0 +1,313 @@
+"""
+Reassign multi-mapping reads to the sequences they most likely came from.
+
+This is the expectation-maximization used by Pathoscope. Reads are represented as the rows of a sparse
+read-by-sequence likelihood matrix in CSR form. Reads with identical alignments are collapsed into a single
+weighted row, which greatly shrinks the matrix for high-depth samples. Each E and M step is a handful of
+vectorized operations over the whole matrix.
+
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from virtool_workflow.analysis.alignments import Alignments, SequenceTable
+from virtool_workflow.analysis.sketches import hash_kmers
+
+#: The default maximum number of EM iterations.
+MAX_ITERATIONS = 30
+
+#: The default change in :attr:`.Reassignment.pi` below which the EM is considered converged.
+EPSILON = 1e-7
+
+#: The default prior on the abundance of each sequence.
+PI_PRIOR = 0.0
+
+#: The default prior on the share of multi-mapping reads for each sequence.
+THETA_PRIOR = 0.0
+
+
+@dataclass
+class ReadMatrix:
+    """
+    A sparse read-by-sequence matrix in CSR form.
+
+    Each row holds the sequences one read, or a group of identical reads, aligned to. Only the best score
+    for each read and sequence is kept.
+
+    """
+    #: The sequences the reads were aligned against.
+    table: SequenceTable
+    #: The start of each row in :attr:`sequences` followed by the total number of entries.
+    offsets: np.ndarray
+    #: The table position of the sequence for each entry.
+    sequences: np.ndarray
+    #: The alignment score for each entry.
+    scores: np.ndarray
+    #: The number of reads represented by each row.
+    weights: np.ndarray
+
+    def __len__(self):
+        return len(self.weights)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """The number of sequences in each row."""
+        return np.diff(self.offsets)
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The row for each entry."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.sizes)
+
+    @property
+    def likelihoods(self) -> np.ndarray:
+        """
+        The likelihood of each entry, derived from its score.
+
+        Likelihoods are relative to the best score in each row, so the best entries have a likelihood of one.
+
+        """
+        if len(self.scores) == 0:
+            return np.zeros(0)
+
+        best = np.maximum.reduceat(self.scores, self.offsets[:-1])
+
+        return np.exp(self.scores - np.repeat(best, self.sizes).astype(np.float64))
+
+
+def _collapse(offsets: np.ndarray, keys: np.ndarray, weights: np.ndarray):
+    """Merge rows with identical entries, summing their weights."""
+    sizes = np.diff(offsets)
+
+    collapsed_keys = []
+    collapsed_sizes = []
+    collapsed_weights = []
+
+    # Rows can only be identical if they are the same size, so each size is collapsed separately as a
+    # 2D array. Rows are sorted by a hash of their entries and adjacent rows are compared to find groups.
+    for size in np.unique(sizes).tolist():
+        rows = np.flatnonzero(sizes == size)
+
+        block = keys[offsets[rows][:, None] + np.arange(size)]
+
+        hashes = np.zeros(len(rows), dtype=np.uint64)
+
+        for column in block.T:
+            hashes = hash_kmers(hashes ^ column)
+
+        order = np.argsort(hashes)
+        block = block[order]
+
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (hashes[order][1:] != hashes[order][:-1]) | (block[1:] != block[:-1]).any(axis=1)
+
+        collapsed_keys.append(block[first].ravel())
+        collapsed_sizes.append(np.full(first.sum(), size, dtype=np.int64))
+        collapsed_weights.append(np.add.reduceat(weights[rows][order], np.flatnonzero(first)))
+
+    if not collapsed_keys:
+        return offsets, keys, weights
+
+    return (
+        np.concatenate(([0], np.cumsum(np.concatenate(collapsed_sizes)))),
+        np.concatenate(collapsed_keys),
+        np.concatenate(collapsed_weights).astype(np.int64)
+    )
+
+
+def build_read_matrix(alignments: Alignments, collapse: bool = True) -> ReadMatrix:
+    """
+    Build a read-by-sequence matrix from aggregated alignments.
+
+    :param alignments: the aggregated alignments
+    :param collapse: merge reads with identical sequences and scores into weighted rows
+    :return: the matrix
+
+    """
+    sequence_count = len(alignments.table)
+
+    pairs = alignments.reads.astype(np.int64) * sequence_count + alignments.sequences
+
+    # Sort by read and sequence, then by descending score, so the first entry for each pair is its best.
+    order = np.lexsort((-alignments.scores.astype(np.int64), pairs))
+    pairs = pairs[order]
+
+    first = np.concatenate(([True], pairs[1:] != pairs[:-1])) if len(pairs) else np.zeros(0, dtype=bool)
+
+    pairs = pairs[first]
+    scores = alignments.scores[order][first].astype(np.int64)
+
+    reads = pairs // sequence_count
+    sequences = pairs % sequence_count
+
+    _, starts = np.unique(reads, return_index=True)
+
+    offsets = np.append(starts, len(reads)).astype(np.int64)
+    weights = np.ones(len(starts), dtype=np.int64)
+
+    # Sequences and scores are combined into a single key for each entry so rows can be compared exactly.
+    keys = (sequences.astype(np.uint64) << np.uint64(32)) | (scores & 0xffffffff).astype(np.uint64)
+
+    if collapse:
+        offsets, keys, weights = _collapse(offsets, keys, weights)
+
+    return ReadMatrix(
+        alignments.table,
+        offsets,
+        (keys >> np.uint64(32)).astype(np.int32),
+        (keys & np.uint64(0xffffffff)).astype(np.uint32).view(np.int32).astype(np.int64),
+        weights
+    )
+
+
+@dataclass
+class Reassignment:
+    """The result of reassigning reads with :func:`.reassign`."""
+    #: The reads that were reassigned.
+    matrix: ReadMatrix
+    #: The estimated abundance of each sequence after the first iteration.
+    initial_pi: np.ndarray
+    #: The estimated abundance of each sequence.
+    pi: np.ndarray
+    #: The estimated share of the multi-mapping reads for each sequence.
+    theta: np.ndarray
+    #: The posterior probability for each entry in the matrix.
+    posteriors: np.ndarray
+    #: The number of iterations run.
+    iterations: int
+
+    @property
+    def counts(self) -> np.ndarray:
+        """The expected number of reads from each sequence."""
+        return np.bincount(
+            self.matrix.sequences,
+            weights=self.posteriors * self.matrix.weights[self.matrix.rows],
+            minlength=len(self.matrix.table)
+        )
+
+    @property
+    def best_hit_counts(self) -> np.ndarray:
+        """The number of reads whose most likely sequence is each sequence, before reassignment."""
+        return self._count_best(self.matrix.likelihoods)
+
+    @property
+    def reassigned_counts(self) -> np.ndarray:
+        """The number of reads whose most likely sequence is each sequence, after reassignment."""
+        return self._count_best(self.posteriors)
+
+    def _count_best(self, values: np.ndarray) -> np.ndarray:
+        matrix = self.matrix
+
+        if len(matrix) == 0:
+            return np.zeros(len(matrix.table), dtype=np.int64)
+
+        best = np.maximum.reduceat(values, matrix.offsets[:-1])
+
+        # Reads are split evenly between tied sequences.
+        is_best = values == best[matrix.rows]
+        ties = np.bincount(matrix.rows, weights=is_best, minlength=len(matrix))
+
+        return np.bincount(
+            matrix.sequences,
+            weights=is_best * (matrix.weights / ties)[matrix.rows],
+            minlength=len(matrix.table)
+        )
+
+
+def reassign(
+        matrix: ReadMatrix,
+        max_iterations: int = MAX_ITERATIONS,
+        epsilon: float = EPSILON,
+        pi_prior: float = PI_PRIOR,
+        theta_prior: float = THETA_PRIOR
+) -> Reassignment:
+    """
+    Reassign multi-mapping reads using expectation-maximization.
+
+    Reads that align to a single sequence only contribute to the abundance estimate ``pi``. Multi-mapping
+    reads are distributed between their sequences in proportion to ``pi``, ``theta``, and their
+    likelihoods. The EM stops when the total change in ``pi`` is at most ``epsilon``.
+
+    Only sequences that received alignments are included in the calculation. Estimates for other sequences
+    are zero.
+
+    :param matrix: the read-by-sequence matrix
+    :param max_iterations: the maximum number of iterations
+    :param epsilon: the convergence threshold
+    :param pi_prior: the prior on the abundance of each sequence
+    :param theta_prior: the prior on the share of multi-mapping reads for each sequence
+    :return: the reassignment
+
+    """
+    sequences, columns = np.unique(matrix.sequences, return_inverse=True)
+
+    count = max(len(sequences), 1)
+
+    sizes = matrix.sizes
+    multi = sizes > 1
+
+    unique_sums = np.bincount(
+        columns[matrix.offsets[:-1][~multi]],
+        weights=matrix.weights[~multi],
+        minlength=count
+    )
+
+    unique_total = float(matrix.weights[~multi].sum())
+    multi_total = float(matrix.weights[multi].sum())
+
+    # Reads that align to a single sequence always have a posterior of one, so the EM only iterates over
+    # the entries for multi-mapping reads.
+    entry_multi = multi[matrix.rows]
+
+    multi_columns = columns[entry_multi]
+    multi_likelihoods = matrix.likelihoods[entry_multi]
+    multi_offsets = np.concatenate(([0], np.cumsum(sizes[multi])))[:-1]
+    multi_rows = np.repeat(np.arange(multi.sum()), sizes[multi])
+    multi_weights = matrix.weights[multi][multi_rows].astype(np.float64)
+    multi_posteriors = np.zeros(len(multi_columns))
+
+    pi = np.full(count, 1 / count)
+    theta = pi.copy()
+    initial_pi = pi
+
+    iterations = 0
+
+    for iterations in range(1, max_iterations + 1):
+        # E step: the posterior probability of each multi-mapping read coming from each of its sequences.
+        values = (pi * theta)[multi_columns] * multi_likelihoods
+
+        sums = np.add.reduceat(values, multi_offsets)[multi_rows] if len(values) else values
+
+        multi_posteriors = np.divide(values, sums, out=np.zeros_like(values), where=sums > 0)
+
+        # M step.
+        theta_sums = np.bincount(multi_columns, weights=multi_posteriors * multi_weights, minlength=count)
+        pi_sums = theta_sums + unique_sums
+
+        pi_pseudo = pi_prior * pi_sums.max(initial=0)
+        new_pi = (pi_sums + pi_pseudo) / max(unique_total + multi_total + pi_pseudo * count, 1)
+
+        if iterations == 1:
+            initial_pi = new_pi
+
+        theta_pseudo = theta_prior * theta_sums.max(initial=0)
+        theta = (theta_sums + theta_pseudo) / max(multi_total + theta_pseudo * count, 1)
+
+        change = np.abs(new_pi - pi).sum()
+
+        pi = new_pi
+
+        if change <= epsilon or multi_total == 0:
+            break
+
+    posteriors = np.ones(len(matrix.sequences))
+    posteriors[entry_multi] = multi_posteriors
+
+    def expand(values: np.ndarray) -> np.ndarray:
+        expanded = np.zeros(len(matrix.table))
+        expanded[sequences] = values[:len(sequences)]
+
+        return expanded
+
+    return Reassignment(matrix, expand(initial_pi), expand(pi), expand(theta), posteriors, iterations)
@@ -9,11 +9,17 @@ from virtool_workflow.data_model.samples import Sample
 @fixture
 async def sample(
         sample_provider: AbstractSampleProvider,
-        work_path: Path
+        work_path: Path,
+        stream_reads: bool = False
 ) -> Sample:
     """
     The sample associated with the current job.
 
+    If ``stream_reads`` is set, the reads are downloaded in the background and are available as
+    :attr:`.Sample.read_downloads` before the downloads finish. :attr:`.Sample.read_paths` is not set until the
+    downloads finish. Use :meth:`.Sample.get_read_paths` to wait for the complete files. Downloads that are still
+    running when the workflow finishes are cancelled.
+
     Returns a :class:`.Sample` object.
 
     """
@@ -21,7 +27,16 @@ async def sample(
     read_path.mkdir()
 
     sample_ = await sample_provider.get()
-    await sample_provider.download_reads(read_path, sample_.paired)
+
+    if stream_reads:
+        sample_.read_downloads = await sample_provider.stream_reads(read_path, sample_.paired)
+    else:
+        await sample_provider.download_reads(read_path, sample_.paired)
+        sample_.read_paths = make_read_paths(read_path, sample_.paired)
+
     sample_.reads_path = read_path
-    sample_.read_paths = make_read_paths(read_path, sample_.paired)
-    return sample_
+
+    yield sample_
+
+    for download in sample_.read_downloads or []:
+        download.cancel()
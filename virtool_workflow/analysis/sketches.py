@@ -0,0 +1,326 @@
+"""
+Screen sample reads against k-mer sketches of the OTUs in a reference index.
+
+Each OTU is represented by a scaled MinHash sketch: the hashes of its canonical k-mers that fall below a
+threshold set by the ``scaled`` factor. Because every sketch uses the same threshold, the fraction of an
+OTU's sketch that is found in the reads estimates how much of the OTU is contained in the sample.
+
+Screening results can be used to choose the OTUs passed to :meth:`.Index.build_isolate_index`.
+
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from virtool_workflow.analysis.fastq import read_fastq_blocks, split_fastq_block
+from virtool_workflow.analysis.indexes import Index
+from virtool_workflow.analysis.packed import CODES, encode_kmers, get_fastq_codes
+from virtool_workflow.analysis.utils import ReadPaths
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
+
+#: The default k-mer size.
+K = 21
+
+#: The default fraction of hashes, as ``1 / scaled``, kept in a sketch.
+SCALED = 10
+
+#: The minimum containment for an OTU to be reported as a candidate.
+MIN_CONTAINMENT = 0.1
+
+
+def hash_kmers(kmers: np.ndarray) -> np.ndarray:
+    """
+    Hash encoded k-mers to uniformly distributed 64-bit integers.
+
+    Uses the MurmurHash3 64-bit finalizer.
+
+    :param kmers: a ``uint64`` array of encoded k-mers
+    :return: a ``uint64`` array of hashes
+
+    """
+    hashes = kmers ^ (kmers >> np.uint64(33))
+    hashes *= np.uint64(0xff51afd7ed558ccd)
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xc4ceb9fe1a85ec53)
+    hashes ^= hashes >> np.uint64(33)
+
+    return hashes
+
+
+def get_max_hash(scaled: int) -> np.uint64:
+    """
+    Get the largest hash kept in a sketch with the given ``scaled`` factor.
+
+    :param scaled: the scaled factor
+    :return: the maximum hash
+
+    """
+    return np.uint64(2 ** 64 // scaled - 1)
+
+
+def sketch_codes(codes: np.ndarray, k: int, scaled: int) -> np.ndarray:
+    """
+    Get the sorted, unique hashes kept in a sketch of an array of base codes.
+
+    :param codes: an array of base codes as used by :mod:`virtool_workflow.analysis.packed`
+    :param k: the k-mer size
+    :param scaled: the scaled factor
+    :return: a sorted ``uint64`` array of hashes
+
+    """
+    _, kmers = encode_kmers(codes, k, canonical=True)
+
+    hashes = hash_kmers(kmers)
+
+    return np.unique(hashes[hashes <= get_max_hash(scaled)])
+
+
+@dataclass
+class OTUSketches:
+    """Scaled MinHash sketches for the OTUs in a reference index."""
+    #: The k-mer size.
+    k: int
+    #: The scaled factor.
+    scaled: int
+    #: The ID of the OTU for each sketch.
+    otu_ids: List[str]
+    #: The hashes of all sketches, sorted within each sketch.
+    hashes: np.ndarray
+    #: The start of each sketch in :attr:`hashes` followed by the total number of hashes.
+    offsets: np.ndarray
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """The number of hashes in each sketch."""
+        return np.diff(self.offsets)
+
+    @classmethod
+    def load(cls, path: Path) -> "OTUSketches":
+        """
+        Load sketches written by :meth:`.save`.
+
+        :param path: the path to the sketch file
+        :return: the sketches
+
+        """
+        with np.load(path) as data:
+            return cls(
+                int(data["k"]),
+                int(data["scaled"]),
+                json.loads(str(data["otu_ids"])),
+                data["hashes"],
+                data["offsets"]
+            )
+
+    def save(self, path: Path):
+        """
+        Write the sketches to ``path``.
+
+        The file is written under a temporary name and moved into place when complete.
+
+        :param path: the path to the sketch file
+
+        """
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp.npz")
+
+        np.savez(
+            temporary_path,
+            k=self.k,
+            scaled=self.scaled,
+            otu_ids=json.dumps(self.otu_ids),
+            hashes=self.hashes,
+            offsets=self.offsets
+        )
+
+        temporary_path.replace(path)
+
+
+def sketch_otus(json_path: Path, k: int = K, scaled: int = SCALED) -> OTUSketches:
+    """
+    Sketch the OTUs in a reference index JSON file.
+
+    The sketch for an OTU contains the k-mers from all of its isolates.
+
+    :param json_path: the path to the decompressed index JSON
+    :param k: the k-mer size
+    :param scaled: the scaled factor
+    :return: the sketches
+
+    """
+    with open(json_path) as f:
+        otus = json.load(f)
+
+    otu_ids = []
+    sketches = []
+
+    for otu in otus:
+        otu_ids.append(otu["_id"])
+
+        sketches.append(np.unique(np.concatenate([np.zeros(0, dtype=np.uint64)] + [
+            sketch_codes(CODES[np.frombuffer(sequence["sequence"].encode(), dtype=np.uint8)], k, scaled)
+            for isolate in otu["isolates"] for sequence in isolate["sequences"]
+        ])))
+
+    offsets = np.concatenate(([0], np.cumsum([len(sketch) for sketch in sketches]))).astype(np.int64)
+
+    return OTUSketches(k, scaled, otu_ids, np.concatenate([np.zeros(0, dtype=np.uint64)] + sketches), offsets)
+
+
+async def sketch_index(
+        index: Index,
+        k: int = K,
+        scaled: int = SCALED,
+        cache_path: Optional[Path] = None
+) -> OTUSketches:
+    """
+    Get sketches for the OTUs in a reference index.
+
+    Sketches are cached by index ID and sketch parameters, so they are only built once for each index
+    version. The index JSON must already be decompressed.
+
+    :param index: the reference index
+    :param k: the k-mer size
+    :param scaled: the scaled factor
+    :param cache_path: the directory to cache sketches in. Defaults to a ``sketches`` directory in the
+        index directory
+    :return: the sketches
+
+    """
+    cache_path = cache_path or index.path / "sketches"
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    path = cache_path / f"{index.id}-{k}-{scaled}.npz"
+
+    loop = asyncio.get_running_loop()
+
+    if path.is_file():
+        return await loop.run_in_executor(None, OTUSketches.load, path)
+
+    sketches = await loop.run_in_executor(None, sketch_otus, index.json_path, k, scaled)
+    await loop.run_in_executor(None, sketches.save, path)
+
+    return sketches
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """An OTU found when screening reads."""
+    #: The OTU ID.
+    otu_id: str
+    #: The fraction of the OTU's sketch found in the reads.
+    containment: float
+    #: The number of the OTU's sketch hashes found in the reads.
+    shared: int
+    #: The number of hashes in the OTU's sketch.
+    size: int
+
+
+#: The sketch hashes being screened for in a worker process.
+_screen_hashes: Optional[np.ndarray] = None
+_screen_k: int = K
+_screen_max_hash: np.uint64 = get_max_hash(SCALED)
+
+
+def _initialize_worker(hashes: np.ndarray, k: int, scaled: int):
+    global _screen_hashes, _screen_k, _screen_max_hash
+
+    _screen_hashes = hashes
+    _screen_k = k
+    _screen_max_hash = get_max_hash(scaled)
+
+
+def _screen_block(data: bytes) -> np.ndarray:
+    """Find the indexes of the screened hashes that occur in a block of FASTQ records."""
+    block, _ = split_fastq_block(data)
+
+    _, kmers = encode_kmers(get_fastq_codes(block), _screen_k, canonical=True)
+
+    hashes = hash_kmers(kmers)
+    hashes = np.unique(hashes[hashes <= _screen_max_hash])
+
+    indexes = np.minimum(np.searchsorted(_screen_hashes, hashes), len(_screen_hashes) - 1)
+
+    return indexes[_screen_hashes[indexes] == hashes]
+
+
+def screen_fastq(sketches: OTUSketches, read_paths: ReadPaths, processes: int = 1) -> List[Candidate]:
+    """
+    Screen FASTQ files against OTU sketches.
+
+    Files are read in blocks. The blocks are hashed in ``processes`` worker processes.
+
+    :param sketches: the OTU sketches
+    :param read_paths: the paths to the FASTQ files
+    :param processes: the number of worker processes
+    :return: a candidate for every OTU in the order of :attr:`.OTUSketches.otu_ids`
+
+    """
+    hashes = np.unique(sketches.hashes)
+    found = np.zeros(len(hashes), dtype=bool)
+
+    if len(hashes):
+        with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_initialize_worker,
+                initargs=(hashes, sketches.k, sketches.scaled)
+        ) as executor:
+            pending = deque()
+
+            for read_path in read_paths:
+                for block in read_fastq_blocks(read_path):
+                    # Limit the number of blocks held in memory.
+                    if len(pending) >= processes * 2:
+                        found[pending.popleft().result()] = True
+
+                    pending.append(executor.submit(_screen_block, block.data))
+
+            for future in pending:
+                found[future.result()] = True
+
+    present = np.concatenate(([0], np.cumsum(found[np.searchsorted(hashes, sketches.hashes)])))
+
+    shared = present[sketches.offsets[1:]] - present[sketches.offsets[:-1]]
+
+    return [
+        Candidate(otu_id, float(count / size) if size else 0.0, int(count), int(size))
+        for otu_id, count, size in zip(sketches.otu_ids, shared, sketches.sizes)
+    ]
+
+
+async def screen_reads(
+        sketches: OTUSketches,
+        read_paths: ReadPaths,
+        min_containment: float = MIN_CONTAINMENT,
+        processes: Optional[int] = None,
+        thread_allocator: Optional[ThreadAllocator] = None
+) -> List[Candidate]:
+    """
+    Find the OTUs whose sketches are contained in a sample's reads.
+
+    If ``processes`` is not given, worker processes are allocated using the ``thread_allocator``.
+
+    :param sketches: the OTU sketches
+    :param read_paths: the paths to the FASTQ files for the sample
+    :param min_containment: the minimum containment for an OTU to be returned
+    :param processes: the number of worker processes to hash reads in
+    :param thread_allocator: the running workflow's ``thread_allocator``
+    :return: candidate OTUs sorted by descending containment
+
+    """
+    loop = asyncio.get_running_loop()
+
+    with allocate_threads(thread_allocator, processes) as processes:
+        candidates = await loop.run_in_executor(None, screen_fastq, sketches, read_paths, processes)
+
+    return sorted(
+        (candidate for candidate in candidates if candidate.size and candidate.containment >= min_containment),
+        key=lambda candidate: candidate.containment,
+        reverse=True
+    )
@@ -1,12 +1,25 @@
+import asyncio
 import os
 import shutil
 from asyncio.subprocess import Process
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
 from dataclasses import dataclass
+from functools import reduce
+from itertools import chain
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Iterable, List, Optional, Tuple
 
+from virtool_workflow.analysis.fastq import read_fastq_blocks
 from virtool_workflow.analysis.library_types import LibraryType
+from virtool_workflow.analysis.quality import (QualityAccumulator,
+                                               compress_and_accumulate_quality,
+                                               merge_quality)
 from virtool_workflow.analysis.utils import ReadPaths
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
+
+#: The number of consecutive records written to a shard at a time when splitting reads.
+SHARD_BLOCK_RECORDS = 10000
 
 
 @dataclass
@@ -18,6 +31,8 @@ class SkewerResult:
     process: Process
     #: The command used to run Skewer.
     command: List[str]
+    #: The quality of the trimmed reads if it was calculated during trimming.
+    quality: Optional[dict] = None
 
     @property
     def left(self) -> Path:
@@ -54,15 +69,34 @@ def skewer(
         max_indel_rate: float = 0.03,
         end_quality: int = 0,
         mean_quality: int = 0,
-        number_of_processes: int = 1,
+        number_of_processes: Optional[int] = None,
         quiet: bool = True,
         other_options: Iterable[str] = ("-n", "-z"),
+        with_quality: bool = False,
+        shards: int = 1,
         **kwargs
 ):
-    """Create a coroutine function that will run skewer with the given parameters."""
+    """
+    Create a coroutine function that will run skewer with the given parameters.
+
+    If ``with_quality`` is set, Skewer writes uncompressed output to named pipes. The output is compressed
+    in worker processes which calculate quality statistics for the trimmed reads at the same time. The
+    statistics are available as :attr:`.SkewerResult.quality`.
+
+    If ``shards`` is greater than one, the reads are split into that many shards which are trimmed by
+    concurrent Skewer processes. The ``number_of_processes`` are divided between the shards. See
+    :func:`.run_sharded`.
+
+    If ``number_of_processes`` is not given, threads are allocated using the ``thread_allocator`` passed to
+    the returned function. One thread is used if there is no allocator.
+
+    """
     if shutil.which("skewer") is None:
         raise RuntimeError("skewer is not installed.")
 
+    if with_quality:
+        other_options = [option for option in other_options if option not in ("-z", "--compress")]
+
     command = [
         "skewer",
         "-r", str(max_error_rate),
@@ -71,31 +105,365 @@ def skewer(
         "-l", str(min_length),
         "-q", str(end_quality),
         "-Q", str(mean_quality),
-        "-t", str(number_of_processes),
         *other_options
     ]
 
     if quiet:
         command.append("--quiet")
 
-    async def run_skewer(read_paths, run_subprocess, run_in_executor):
-        nonlocal command
-        command += [str(read_path) for read_path in read_paths]
-        command += ["-o", "reads"]
-
+    async def run_skewer(
+            read_paths,
+            run_subprocess,
+            run_in_executor,
+            thread_allocator: Optional[ThreadAllocator] = None
+    ):
         env = dict(os.environ, LD_LIBRARY_PATH="/usr/lib/x86_64-linux-gnu")
 
         reads_path = read_paths[0].parent
 
-        process = await run_subprocess(command, env=env, cwd=reads_path)
+        with allocate_threads(thread_allocator, number_of_processes) as threads:
+            command_ = [*command, "-t", str(max(1, threads // shards))]
+
+            if shards > 1:
+                process, quality = await run_sharded(command_, env, read_paths, shards, with_quality, run_subprocess)
+            else:
+                command_ = [*command_, *[str(read_path) for read_path in read_paths], "-o", "reads"]
+
+                if with_quality:
+                    process, quality = await run_with_quality(
+                        command_, env, reads_path, len(read_paths), run_subprocess
+                    )
+                else:
+                    process = await run_subprocess(command_, env=env, cwd=reads_path)
+                    quality = None
 
         read_paths = await run_in_executor(rename_trimming_results, reads_path)
 
-        return SkewerResult(read_paths, process, command)
+        return SkewerResult(read_paths, process, command_, quality)
 
     return run_skewer
 
 
+def get_trimming_output_names(count: int) -> List[str]:
+    """
+    Get the names of the uncompressed files Skewer writes trimmed reads to.
+
+    :param count: the number of read files being trimmed
+    :return: the output file names
+
+    """
+    if count == 1:
+        return ["reads-trimmed.fastq"]
+
+    return ["reads-trimmed-pair1.fastq", "reads-trimmed-pair2.fastq"]
+
+
+async def accumulate_quality(
+        command: List[str],
+        env: dict,
+        path: Path,
+        count: int,
+        run_subprocess
+) -> Tuple[Process, List[QualityAccumulator]]:
+    """
+    Run Skewer, compressing its output and accumulating quality statistics as the output is written.
+
+    Named pipes are created in place of the Skewer output files. Each is read by a worker process that
+    writes the gzip-compressed trimmed reads and accumulates their quality statistics.
+
+    A write end of each pipe is held open until Skewer exits. This prevents Skewer and the workers from
+    blocking while they open the pipes, and guarantees the workers see end-of-file even if Skewer fails
+    before opening its output.
+
+    :param command: the Skewer command
+    :param env: the environment for the Skewer process
+    :param path: the directory Skewer is run in
+    :param count: the number of read files being trimmed
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :return: the Skewer process and a quality accumulator for each trimmed read file
+
+    """
+    results = await accumulate_quality_concurrently([(command, path)], env, count, run_subprocess)
+
+    return results[0]
+
+
+async def accumulate_quality_concurrently(
+        runs: List[Tuple[List[str], Path]],
+        env: dict,
+        count: int,
+        run_subprocess
+) -> List[Tuple[Process, List[QualityAccumulator]]]:
+    """
+    Run several Skewer processes concurrently, compressing their output and accumulating quality statistics
+    as the output is written.
+
+    This works like :func:`.accumulate_quality`, but the worker processes for every run are started before
+    any pipe is held open. Workers are forked from this process, so a worker started later would inherit the
+    held write ends of the other runs' pipes and those pipes would never reach end-of-file.
+
+    :param runs: the command for each Skewer process and the directory to run it in
+    :param env: the environment for the Skewer processes
+    :param count: the number of read files being trimmed by each process
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :return: the Skewer process and a quality accumulator for each trimmed read file, for each run
+    :raises RuntimeError: when a Skewer process exits with a non-zero code
+
+    """
+    loop = asyncio.get_running_loop()
+
+    fifo_paths = [[path / name for name in get_trimming_output_names(count)] for _, path in runs]
+
+    for fifo_path in chain.from_iterable(fifo_paths):
+        os.mkfifo(fifo_path)
+
+    holders = [[] for _ in runs]
+    processes = []
+
+    def release(index: int):
+        for holder in holders[index]:
+            os.close(holder)
+
+        holders[index] = []
+
+    with ProcessPoolExecutor(max_workers=len(runs) * count) as executor:
+        # Each worker blocks opening its pipe, so submitting starts a new worker process for every pipe.
+        workers = [
+            asyncio.gather(*[
+                loop.run_in_executor(
+                    executor,
+                    compress_and_accumulate_quality,
+                    fifo_path,
+                    fifo_path.with_suffix(".fastq.gz")
+                ) for fifo_path in run_fifo_paths
+            ]) for run_fifo_paths in fifo_paths
+        ]
+
+        async def run(index: int) -> Tuple[Process, List[QualityAccumulator]]:
+            command, path = runs[index]
+
+            process = await run_subprocess(command, env=env, cwd=path, wait=False)
+            processes.append(process)
+
+            skewer_exit = asyncio.ensure_future(process.wait())
+
+            # The workers can only finish before Skewer if one of them fails.
+            await asyncio.wait([skewer_exit, workers[index]], return_when=asyncio.FIRST_COMPLETED)
+
+            if not skewer_exit.done():
+                process.terminate()
+                await skewer_exit
+
+            release(index)
+
+            accumulators = await workers[index]
+
+            if process.returncode != 0:
+                raise RuntimeError(f"Skewer exited with code {process.returncode}")
+
+            return process, accumulators
+
+        try:
+            # The holders are opened close-on-exec so Skewer processes don't inherit them either.
+            for index, run_fifo_paths in enumerate(fifo_paths):
+                holders[index] = [os.open(fifo_path, os.O_RDWR | os.O_CLOEXEC) for fifo_path in run_fifo_paths]
+
+            return list(await asyncio.gather(*[run(index) for index in range(len(runs))]))
+        finally:
+            for process in processes:
+                if process.returncode is None:
+                    process.terminate()
+
+            for index in range(len(runs)):
+                release(index)
+
+            for fifo_path in chain.from_iterable(fifo_paths):
+                # Give any worker still waiting to open its pipe an end-of-file.
+                with suppress(OSError):
+                    os.close(os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK))
+
+                fifo_path.unlink()
+
+            # Let the workers finish before the executor is shut down so shutting down doesn't block.
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def run_with_quality(command: List[str], env: dict, path: Path, count: int, run_subprocess):
+    """
+    Run Skewer, compressing its output and calculating quality statistics as the output is written.
+
+    See :func:`.accumulate_quality`.
+
+    :param command: the Skewer command
+    :param env: the environment for the Skewer process
+    :param path: the directory Skewer is run in
+    :param count: the number of read files being trimmed
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :return: the Skewer process and the merged quality statistics for the trimmed reads
+
+    """
+    process, accumulators = await accumulate_quality(command, env, path, count, run_subprocess)
+
+    return process, reduce(merge_quality, [accumulator.result() for accumulator in accumulators])
+
+
+def split_fastq(path: Path, shard_paths: List[Path], block_records: int = SHARD_BLOCK_RECORDS):
+    """
+    Split a FASTQ file into uncompressed shards.
+
+    Blocks of ``block_records`` records are distributed between the shards in turn. Splitting the left
+    and right files of a paired dataset with the same arguments keeps the pairs in the same order in
+    corresponding shards.
+
+    :param path: the path to the FASTQ file to split
+    :param shard_paths: the paths to write the shards to
+    :param block_records: the number of consecutive records written to a shard at a time
+
+    """
+    shards = [open(shard_path, "wb") for shard_path in shard_paths]
+
+    # The index of the first record in the current block.
+    record = 0
+
+    try:
+        for block in read_fastq_blocks(path):
+            ends = block.record_ends
+
+            start = 0
+            index = 0
+
+            while index < len(ends):
+                index = min(len(ends), index + block_records - (record + index) % block_records)
+                end = int(ends[index - 1])
+
+                shards[(record + index - 1) // block_records % len(shards)].write(block.data[start:end])
+
+                start = end
+
+            record += len(ends)
+    finally:
+        for shard in shards:
+            shard.close()
+
+
+def concatenate_shards(path: Path, shard_paths: List[Path]):
+    """
+    Concatenate the Skewer output for each shard into ``path`` in shard order.
+
+    Gzip-compressed output can be concatenated directly because a series of gzip members is a valid
+    gzip file.
+
+    :param path: the directory to write the combined output to
+    :param shard_paths: the directories containing the Skewer output for each shard
+
+    """
+    for name in sorted(os.listdir(shard_paths[0])):
+        if name.startswith("reads-trimmed"):
+            with open(path / name, "wb") as target:
+                for shard_path in shard_paths:
+                    with open(shard_path / name, "rb") as source:
+                        shutil.copyfileobj(source, target)
+
+
+async def run_sharded(
+        command: List[str],
+        env: dict,
+        read_paths: ReadPaths,
+        shards: int,
+        with_quality: bool,
+        run_subprocess
+) -> Tuple[Process, Optional[dict]]:
+    """
+    Trim reads by splitting them into shards which are trimmed by concurrent Skewer processes.
+
+    The read files are split concurrently in worker processes using :func:`.split_fastq`. Once all shards
+    are trimmed, the output is combined using :func:`.concatenate_shards` and the shards are removed.
+
+    The shards are written to disk uncompressed before trimming starts rather than fed to Skewer through
+    named pipes. Each Skewer process reads the left and right files of a paired shard in step, while each
+    read file is split by its own worker that writes the shards in turn. With pipes, a worker blocked on a
+    full pipe for one shard starves the other shards of that file, and the Skewer processes waiting on them
+    stop draining the other file's pipes, so the split can deadlock. Writing the shards costs one extra
+    pass over the uncompressed reads, which is cheap compared to trimming and compression.
+
+    If ``with_quality`` is set, the shards are run with :func:`.accumulate_quality_concurrently`.
+
+    :param command: the Skewer command without input or output arguments
+    :param env: the environment for the Skewer processes
+    :param read_paths: the paths to the reads to trim
+    :param shards: the number of shards to split the reads into
+    :param with_quality: calculate quality statistics while the trimmed reads are compressed
+    :param run_subprocess: the running workflow's ``run_subprocess`` callable
+    :return: the Skewer process for the first shard and the quality if it was calculated
+
+    """
+    loop = asyncio.get_running_loop()
+
+    reads_path = read_paths[0].parent
+    shards_path = reads_path / "shards"
+
+    shard_paths = [shards_path / str(index) for index in range(shards)]
+
+    for shard_path in shard_paths:
+        shard_path.mkdir(parents=True)
+
+    def get_shard_read_paths(shard_path: Path) -> List[Path]:
+        return [shard_path / f"reads_{suffix}.fastq" for suffix in range(1, len(read_paths) + 1)]
+
+    try:
+        with ProcessPoolExecutor(max_workers=len(read_paths)) as executor:
+            await asyncio.gather(*[
+                loop.run_in_executor(
+                    executor,
+                    split_fastq,
+                    read_path,
+                    [get_shard_read_paths(shard_path)[index] for shard_path in shard_paths]
+                ) for index, read_path in enumerate(read_paths)
+            ])
+
+        def get_shard_command(shard_path: Path) -> List[str]:
+            return [
+                *command,
+                *[str(shard_read_path) for shard_read_path in get_shard_read_paths(shard_path)],
+                "-o", "reads"
+            ]
+
+        async def trim(shard_path: Path):
+            process = await run_subprocess(get_shard_command(shard_path), env=env, cwd=shard_path)
+
+            if process.returncode != 0:
+                raise RuntimeError(f"Skewer exited with code {process.returncode}")
+
+            return process, None
+
+        if with_quality:
+            results = await accumulate_quality_concurrently(
+                [(get_shard_command(shard_path), shard_path) for shard_path in shard_paths],
+                env,
+                len(read_paths),
+                run_subprocess
+            )
+        else:
+            results = await asyncio.gather(*[trim(shard_path) for shard_path in shard_paths])
+
+        await loop.run_in_executor(None, concatenate_shards, reads_path, shard_paths)
+    finally:
+        await loop.run_in_executor(None, shutil.rmtree, shards_path)
+
+    process = results[0][0]
+
+    if not with_quality:
+        return process, None
+
+    accumulators = results[0][1]
+
+    for _, shard_accumulators in results[1:]:
+        for accumulator, shard_accumulator in zip(accumulators, shard_accumulators):
+            accumulator.update(shard_accumulator)
+
+    return process, reduce(merge_quality, [accumulator.result() for accumulator in accumulators])
+
+
 def rename_trimming_results(path: Path):
     """
     Rename Skewer output to a simple name used in Virtool.
@@ -0,0 +1,177 @@
+"""
+Subsample sample reads for quick-look analyses.
+
+Reads are sampled in a single pass over each FASTQ file. Left and right files of paired data are sampled
+independently using random number generators with the same seed, so the same records are selected from
+both files and pairs stay synchronized.
+
+"""
+import asyncio
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from virtool_workflow.analysis.fastq import read_fastq_blocks
+from virtool_workflow.analysis.utils import ReadPaths, make_read_paths
+
+
+@dataclass(frozen=True)
+class Subsample:
+    """Describes a subsample of reads."""
+    #: The number of reads to sample.
+    n: Optional[int] = None
+    #: The fraction of reads to sample.
+    fraction: Optional[float] = None
+    #: The seed for the random number generator used to select reads.
+    seed: int = 0
+
+    def __post_init__(self):
+        if (self.n is None) == (self.fraction is None):
+            raise ValueError("Exactly one of n or fraction must be given")
+
+        if self.n is not None and self.n < 1:
+            raise ValueError("n must be at least 1")
+
+        if self.fraction is not None and not 0 < self.fraction <= 1:
+            raise ValueError("fraction must be greater than 0 and at most 1")
+
+
+def _sample_fraction(path: Path, target, fraction: float, rng: np.random.Generator) -> int:
+    count = 0
+
+    for block in read_fastq_blocks(path):
+        selected = rng.random(len(block)) < fraction
+
+        target.write(block.select(selected))
+
+        count += len(block)
+
+    return count
+
+
+def _sample_number(path: Path, target, n: int, rng: np.random.Generator) -> int:
+    # Every record is given a random key and the records with the n smallest keys are kept. This is
+    # equivalent to reservoir sampling and is simple to vectorize.
+    keys = np.empty(0)
+    indices = np.empty(0, dtype=np.int64)
+    records = np.empty(0, dtype=object)
+
+    count = 0
+
+    for block in read_fastq_blocks(path):
+        block_keys = rng.random(len(block))
+
+        if len(keys) < n:
+            candidates = np.arange(len(block))
+        else:
+            candidates = np.flatnonzero(block_keys < keys.max())
+
+        if len(candidates):
+            starts = block.record_starts[candidates].tolist()
+            ends = block.record_ends[candidates].tolist()
+
+            candidate_records = np.empty(len(candidates), dtype=object)
+            candidate_records[:] = [block.data[start:end] for start, end in zip(starts, ends)]
+
+            keys = np.concatenate((keys, block_keys[candidates]))
+            indices = np.concatenate((indices, candidates + count))
+            records = np.concatenate((records, candidate_records))
+
+            if len(keys) > n:
+                kept = np.argpartition(keys, n - 1)[:n]
+
+                keys = keys[kept]
+                indices = indices[kept]
+                records = records[kept]
+
+        count += len(block)
+
+    target.write(b"".join(records[np.argsort(indices)]))
+
+    return count
+
+
+def subsample_fastq(path: Path, target_path: Path, subsample: Subsample, compresslevel: int = 6) -> int:
+    """
+    Write a random subsample of the records in a FASTQ file to a gzip-compressed FASTQ file.
+
+    Records are written in their original order. If a number of reads is requested, it is sampled
+    without replacement. A fraction is sampled by selecting each record with that probability.
+
+    :param path: the path to the FASTQ file to sample
+    :param target_path: the path to write the subsample to
+    :param subsample: the subsample to take
+    :param compresslevel: the gzip compression level
+    :return: the number of records in the sampled file
+
+    """
+    rng = np.random.default_rng(subsample.seed)
+
+    with gzip.open(target_path, "wb", compresslevel=compresslevel) as target:
+        if subsample.n is not None:
+            return _sample_number(path, target, subsample.n, rng)
+
+        return _sample_fraction(path, target, subsample.fraction, rng)
+
+
+async def subsample_reads(
+        read_paths: ReadPaths,
+        path: Path,
+        n: Optional[int] = None,
+        fraction: Optional[float] = None,
+        seed: int = 0
+) -> ReadPaths:
+    """
+    Take a random subsample of reads for a sample.
+
+    Either ``n`` or ``fraction`` must be given. Each read file is sampled concurrently in a separate
+    worker process. The subsampled reads are written to ``path`` as ``reads_1.fq.gz`` and, if the data is
+    paired, ``reads_2.fq.gz``.
+
+    :param read_paths: the paths to the FASTQ files for the sample
+    :param path: the directory to write the subsampled reads to
+    :param n: the number of reads to sample
+    :param fraction: the fraction of reads to sample
+    :param seed: the seed for the random number generator used to select reads
+    :return: the paths to the subsampled reads
+    :raises ValueError: when paired read files contain different numbers of records
+
+    """
+    subsample = Subsample(n, fraction, seed)
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    output_paths = make_read_paths(path, len(read_paths) == 2)
+
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=len(read_paths)) as executor:
+        counts = await asyncio.gather(*[
+            loop.run_in_executor(executor, subsample_fastq, read_path, output_path, subsample)
+            for read_path, output_path in zip(read_paths, output_paths)
+        ])
+
+    if len(set(counts)) > 1:
+        raise ValueError("Paired FASTQ files contain different numbers of records")
+
+    return output_paths
+
+
+def subsample(preview: float, preview_seed: int) -> Optional[Subsample]:
+    """
+    The subsample of reads to use when the workflow is run in preview mode.
+
+    ``None`` if preview mode is disabled.
+
+    """
+    if not preview:
+        return None
+
+    if preview < 1:
+        return Subsample(fraction=preview, seed=preview_seed)
+
+    return Subsample(n=int(preview), seed=preview_seed)
@@ -1,8 +1,179 @@
-from typing import List
+import asyncio
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
 
 from virtool_workflow import fixture
 from virtool_workflow.abc.data_providers import AbstractSubtractionProvider
-from virtool_workflow.data_model import Subtraction
+from virtool_workflow.analysis.fastq import BLOCK_SIZE, open_decompressed
+from virtool_workflow.analysis.packed import CODES, WHITESPACE
+from virtool_workflow.data_model import NucleotideComposition, Subtraction
+
+#: Maps each byte to its index in a composition count: ``A``, ``C``, ``G``, ``T``, ``N`` and whitespace. Any
+#: byte that is not a base or whitespace is counted as ``N``.
+_COMPOSITION_CLASSES = np.where(WHITESPACE, 5, CODES)
+
+
+async def prepare_subtraction(provider: AbstractSubtractionProvider) -> Subtraction:
+    """
+    Get a subtraction and download its files.
+
+    The FASTA and Bowtie2 files are downloaded concurrently.
+
+    :param provider: the provider for the subtraction
+    :return: the subtraction
+
+    """
+    subtraction = await provider.get()
+
+    await asyncio.gather(subtraction.get_fasta_path(), subtraction.get_bowtie2_index_path())
+
+    return subtraction
+
+
+def _count_block(data: bytes, counts: np.ndarray, line_start: bool, in_header: bool) -> Tuple[int, bool]:
+    """
+    Add the byte counts for the sequence data in a block of FASTA data to ``counts``.
+
+    Lines can span blocks, so whether the block starts at the beginning of a line and whether it starts inside
+    a header line are carried over from the previous block.
+
+    :param data: the block of FASTA data
+    :param counts: the byte counts to add to
+    :param line_start: whether the block starts at the beginning of a line
+    :param in_header: whether the block starts inside a header line
+    :return: the number of headers that start in the block and whether the block ends inside a header line
+
+    """
+    view = np.frombuffer(data, dtype=np.uint8)
+
+    newlines = np.flatnonzero(view == 10)
+
+    line_starts = newlines[newlines < len(view) - 1] + 1
+
+    if line_start:
+        line_starts = np.concatenate(([0], line_starts))
+
+    headers = line_starts[view[line_starts] == ord(">")]
+
+    starts = np.concatenate(([0], headers)) if in_header else headers
+
+    # Headers that don't end in this block run to the end of it.
+    ends = np.append(newlines, len(view))[np.searchsorted(newlines, starts)]
+
+    counts += np.bincount(view, minlength=256)
+
+    # Header lines are a tiny fraction of the data, so their bytes are gathered and subtracted.
+    sizes = ends - starts
+
+    if len(starts):
+        header_bytes = view[np.repeat(starts - (np.cumsum(sizes) - sizes), sizes) + np.arange(sizes.sum())]
+        counts -= np.bincount(header_bytes, minlength=256)
+
+    return len(headers), bool(len(ends)) and int(ends[-1]) == len(view)
+
+
+def count_nucleotides(fasta_path: Path, block_size: int = BLOCK_SIZE) -> Tuple[NucleotideComposition, int]:
+    """
+    Calculate the nucleotide composition and sequence count of a plain or gzip-compressed FASTA file.
+
+    The file is streamed in large blocks and the bytes in each block are counted once with a single
+    :func:`numpy.bincount`. Bases are counted case-insensitively and ambiguous bases of any kind are counted
+    as ``N``.
+
+    :param fasta_path: the path to the FASTA file
+    :param block_size: the number of bytes to read at a time
+    :return: the nucleotide composition and the number of sequences
+
+    """
+    counts = np.zeros(256, dtype=np.int64)
+    count = 0
+
+    line_start = True
+    in_header = False
+
+    with open_decompressed(fasta_path) as f:
+        for data in iter(lambda: f.read(block_size), b""):
+            headers, in_header = _count_block(data, counts, line_start, in_header)
+            count += headers
+
+            line_start = data.endswith(b"\n")
+
+    a, c, g, t, n = np.bincount(_COMPOSITION_CLASSES, weights=counts, minlength=6)[:5].tolist()
+
+    total = max(a + c + g + t + n, 1)
+
+    return NucleotideComposition(a / total, c / total, g / total, t / total, n / total), count
+
+
+async def calculate_composition(
+        fasta_path: Path,
+        block_size: int = BLOCK_SIZE
+) -> Tuple[NucleotideComposition, int]:
+    """
+    Calculate the nucleotide composition and sequence count of a FASTA file in a thread.
+
+    Decompression and counting release the GIL, so this can run alongside ``bowtie2-build`` on the same
+    file. The result can be passed to :meth:`.AbstractSubtractionProvider.finalize` as
+    ``dataclasses.asdict(composition)``.
+
+    :param fasta_path: the path to the FASTA file
+    :param block_size: the number of bytes to read at a time
+    :return: the nucleotide composition and the number of sequences
+
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, count_nucleotides, fasta_path, block_size)
+
+
+class SubtractionDownloads:
+    """
+    Prepares subtractions concurrently.
+
+    Iterate over it with ``async for`` to get each :class:`.Subtraction` as soon as its files are ready, so work
+    on the first subtraction can start while the others download. Preparation starts the first time the
+    subtractions are requested.
+
+    """
+
+    def __init__(self, providers: Iterable[AbstractSubtractionProvider]):
+        self.providers = list(providers)
+        self._tasks: Optional[List[asyncio.Task]] = None
+        self._pending = None
+
+    @property
+    def tasks(self) -> List[asyncio.Task]:
+        """A task preparing each subtraction, in the order of the providers."""
+        if self._tasks is None:
+            self._tasks = [asyncio.ensure_future(prepare_subtraction(provider)) for provider in self.providers]
+
+        return self._tasks
+
+    def __aiter__(self):
+        self._pending = asyncio.as_completed(self.tasks)
+        return self
+
+    async def __anext__(self) -> Subtraction:
+        try:
+            future = next(self._pending)
+        except StopIteration:
+            raise StopAsyncIteration
+
+        return await future
+
+    async def gather(self) -> List[Subtraction]:
+        """
+        Wait for all subtractions to be ready.
+
+        :return: the subtractions in the order of the providers
+
+        """
+        return list(await asyncio.gather(*self.tasks))
+
+    def cancel(self):
+        """Cancel the preparation of any subtractions that are not ready."""
+        for task in self._tasks or []:
+            task.cancel()
 
 
 # noinspection PyTypeChecker
@@ -10,10 +181,27 @@ from virtool_workflow.data_model import Subtraction
 async def subtractions(
         subtraction_providers: List[AbstractSubtractionProvider]
 ) -> List[Subtraction]:
-    """The subtractions to be used for the current job."""
-    _subtractions = [await provider for provider in subtraction_providers]
+    """
+    The subtractions to be used for the current job.
+
+    All subtractions are fetched concurrently. Their files are downloaded when they are first requested with
+    :meth:`.Subtraction.get_fasta_path` or :meth:`.Subtraction.get_bowtie2_index_path`, so files a workflow
+    does not use are never downloaded.
+
+    """
+    return list(await asyncio.gather(*[provider.get() for provider in subtraction_providers]))
+
+
+@fixture
+async def subtraction_downloads(subtraction_providers: List[AbstractSubtractionProvider]):
+    """
+    A :class:`.SubtractionDownloads` object that yields each subtraction for the current job as soon as it is ready.
+
+    Subtractions that are still downloading when the workflow finishes are cancelled.
+
+    """
+    downloads = SubtractionDownloads(subtraction_providers)
 
-    for provider in subtraction_providers:
-        await provider.download()
+    yield downloads
 
-    return _subtractions
+    downloads.cancel()
@@ -1,11 +1,13 @@
 """Calculate trimming parameters which are passed the Skewer read trimming tool."""
 import hashlib
 import json
-from typing import Dict, Union
+from dataclasses import asdict
+from typing import Dict, Optional, Union
 
 from virtool_workflow.analysis.library_types import LibraryType
 from virtool_workflow.analysis.sample import Sample
 from virtool_workflow.analysis.skewer import calculate_trimming_min_length
+from virtool_workflow.analysis.subsample import Subsample
 
 
 TRIM_PARAMETERS = {
@@ -58,13 +60,23 @@ def trimming_parameters(
     }
 
 
-def trimming_cache_key(sample: Sample, trimming_parameters: dict):
-    """Compute a unique cache key based on the trimming parameters"""
-    trim_param_json = json.dumps({
+def trimming_cache_key(sample: Sample, trimming_parameters: dict, subsample: Optional[Subsample]):
+    """
+    Compute a unique cache key based on the trimming parameters.
+
+    Subsampled reads are cached separately from the full set of trimmed reads.
+
+    """
+    key = {
         "id": sample.id,
         "min_length": sample.min_length,
         **trimming_parameters,
-    }, sort_keys=True)
+    }
+
+    if subsample is not None:
+        key["subsample"] = asdict(subsample)
+
+    trim_param_json = json.dumps(key, sort_keys=True)
 
     raw_key = "reads-" + trim_param_json
 
@@ -1,10 +1,14 @@
 import asyncio
+import json
 import shutil
+from dataclasses import fields
 from pathlib import Path
+from typing import List
 
 import aiohttp
 
 from virtool_workflow.abc.caches.analysis_caches import ReadsCache
+from virtool_workflow.abc.caches.cache import Cache
 from virtool_workflow.api.errors import NotFound, JobsAPIServerError, raising_errors_by_status_code
 from virtool_workflow.api.utils import upload_file_via_put, read_file_from_response
 from virtool_workflow.caching.caches import GenericCacheWriter, GenericCaches, GenericCache
@@ -16,10 +20,27 @@ class CacheAlreadyOpen(Exception):
     pass
 
 
-class RemoteReadsCacheWriter(GenericCacheWriter[ReadsCache]):
+#: Cached files that are uploaded and downloaded through the reads endpoints.
+READS_FILENAMES = ("reads_1.fq.gz", "reads_2.fq.gz")
+
+#: Cache attributes that are stored in the cache document by the jobs API.
+API_ATTRIBUTES = ("quality",)
+
+#: The name of the cache artifact storing cache attributes that the jobs API does not store.
+METADATA_FILENAME = "metadata.json"
+
+
+class RemoteCacheWriter(GenericCacheWriter[Cache]):
+    """
+    Creates a sample cache through the jobs API.
+
+    The cache class is set with a type argument (eg. ``RemoteCacheWriter[AlignmentCache]``). When the cache
+    is finalized, the attributes in :data:`API_ATTRIBUTES` are sent to the API. Any other attributes are written
+    to a :data:`METADATA_FILENAME` artifact that is uploaded with the cached files.
+    """
 
     def __init__(self, key, path, sample_id, http, jobs_api_url, run_in_executor):
-        super(RemoteReadsCacheWriter, self).__init__(key, path)
+        super(RemoteCacheWriter, self).__init__(key, path)
         self.http = http
         self.sample_id = sample_id
         self.url = f"{jobs_api_url}/samples/{sample_id}/caches"
@@ -51,7 +72,7 @@ class RemoteReadsCacheWriter(GenericCacheWriter[ReadsCache]):
         """Upload a file to the cache."""
         await self.run_in_executor(shutil.copyfile, path, self.path / path.name)
 
-        if path.name in ("reads_1.fq.gz", "reads_2.fq.gz"):
+        if path.name in READS_FILENAMES:
             return await upload_file_via_put(self.http,
                                              f"{self.url}/{self.key}/reads/{path.name}",
                                              path,
@@ -62,13 +83,34 @@ class RemoteReadsCacheWriter(GenericCacheWriter[ReadsCache]):
             "type": format_,
         })
 
+    @property
+    def finalize_json(self) -> dict:
+        """The data sent to the API when the cache is finalized."""
+        return {key: getattr(self, key) for key in self._expected_attrs if key in API_ATTRIBUTES}
+
+    @property
+    def metadata(self) -> dict:
+        """The cache attributes that are stored in the :data:`METADATA_FILENAME` artifact."""
+        return {
+            key: getattr(self, key) for key in self._expected_attrs if key not in ("key", "path", *API_ATTRIBUTES)
+        }
+
     async def close(self):
         """Finalize the cache."""
-        await super(RemoteReadsCacheWriter, self).close()
+        await super(RemoteCacheWriter, self).close()
 
-        response = await self.http.patch(f"{self.url}/{self.key}", json={
-            "quality": self.cache.quality
-        })
+        metadata = self.metadata
+
+        if metadata:
+            metadata_path = self.path / METADATA_FILENAME
+            await self.run_in_executor(metadata_path.write_text, json.dumps(metadata))
+
+            await upload_file_via_put(self.http, f"{self.url}/{self.key}/artifacts", metadata_path, params={
+                "name": METADATA_FILENAME,
+                "type": "json",
+            })
+
+        response = await self.http.patch(f"{self.url}/{self.key}", json=self.finalize_json)
 
         if response.status != 200:
             raise JobsAPIServerError(response.status)
@@ -80,7 +122,18 @@ class RemoteReadsCacheWriter(GenericCacheWriter[ReadsCache]):
             pass
 
 
-class RemoteReadCaches(GenericCaches[ReadsCache]):
+class RemoteReadsCacheWriter(RemoteCacheWriter[ReadsCache]):
+    """Creates a trimmed reads cache through the jobs API."""
+
+
+class RemoteCaches(GenericCaches[Cache]):
+    """
+    Access and create sample caches through the jobs API.
+
+    The cache class is set with a type argument (eg. ``RemoteCaches[AlignmentCache]``). All kinds of caches
+    share the same upload, polling, and download logic.
+    """
+
     def __init__(
             self,
             sample_id: str,
@@ -100,7 +153,7 @@ class RemoteReadCaches(GenericCaches[ReadsCache]):
         self.run_in_executor = run_in_executor
         self.poll_rate = poll_rate
 
-    async def get(self, key: str) -> ReadsCache:
+    async def get(self, key: str) -> GenericCache:
         """
         Get the cache with the given key.
 
@@ -126,21 +179,41 @@ class RemoteReadCaches(GenericCaches[ReadsCache]):
         cache_path = self.path / key
         cache_path.mkdir()
 
-        files = ("reads_1.fq.gz", "reads_2.fq.gz") if self.paired else ("reads_1.fq.gz",)
+        for filename in self.get_filenames(cache):
+            endpoint = "reads" if filename in READS_FILENAMES else "artifacts"
 
-        for filename in files:
-            response = await self.http.get(f"{self.url}/{key}/reads/{filename}")
+            response = await self.http.get(f"{self.url}/{key}/{endpoint}/{filename}")
             await read_file_from_response(response, cache_path)
 
-        return ReadsCache(
-            key=key,
-            path=cache_path,
-            quality=cache["quality"],
-        )
+        names = [field.name for field in fields(self.cache_class) if field.name not in ("key", "path")]
+
+        attributes = {name: cache[name] for name in names if name in API_ATTRIBUTES}
+
+        if len(attributes) < len(names):
+            attributes.update(json.loads(await self.run_in_executor((cache_path / METADATA_FILENAME).read_text)))
+
+        return self.cache_class(key=key, path=cache_path, **attributes)
+
+    def get_filenames(self, cache: dict) -> List[str]:
+        """
+        Get the names of the files to download for a cache.
+
+        :param cache: the cache document returned by the API
+        :return: the names of the cached files
+        """
+        return [file["name"] for file in cache["files"]]
 
     def create(self, key: str) -> GenericCacheWriter[GenericCache]:
         """Create a new cache writer."""
         cache_path = self.path / key
         cache_path.mkdir()
-        return RemoteReadsCacheWriter(key, cache_path, self.sample_id,
-                                      self.http, self.jobs_api_url, self.run_in_executor)
+        return RemoteCacheWriter[self.cache_class](key, cache_path, self.sample_id,
+                                                   self.http, self.jobs_api_url, self.run_in_executor)
+
+
+class RemoteReadCaches(RemoteCaches[ReadsCache]):
+    """Access and create trimmed reads caches through the jobs API."""
+
+    def get_filenames(self, cache: dict) -> List[str]:
+        """Get the names of the trimmed reads files for the sample."""
+        return list(READS_FILENAMES) if self.paired else [READS_FILENAMES[0]]
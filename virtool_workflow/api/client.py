@@ -1,3 +1,5 @@
+import asyncio
+
 import aiohttp
 from functools import wraps
 
@@ -8,6 +10,16 @@ async def http():
         yield JobApiHttpSession(session)
 
 
+def transfer_limiter(max_transfers: int) -> asyncio.Semaphore:
+    """
+    An :class:`asyncio.Semaphore` shared by all file transfers with the Jobs API.
+
+    Hold it while transferring a file to keep the number of concurrent transfers within ``max_transfers``.
+
+    """
+    return asyncio.Semaphore(max_transfers)
+
+
 async def authenticated_http(job_id, key, http):
     """:class:`Aiohttp.ClientSession` instance which includes authentication headers for the jobs API."""
     http.auth = aiohttp.BasicAuth(login=f"job-{job_id}", password=key)
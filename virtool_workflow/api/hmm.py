@@ -1,8 +1,9 @@
+import asyncio
 import gzip
 import json
 import shutil
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 import aiofiles
 import aiohttp
@@ -12,6 +13,10 @@ from virtool_workflow.abc.data_providers import AbstractHMMsProvider
 from virtool_workflow.api.errors import raising_errors_by_status_code
 from virtool_workflow.api.utils import read_file_from_response
 from virtool_workflow.data_model import HMM
+from virtool_workflow.execution.threads import ThreadAllocator, allocate_threads
+
+#: The size of the chunks ``profiles.hmm`` is written to disk in as it is downloaded.
+CHUNK_SIZE = 1024 * 1024
 
 
 def _hmm_from_dict(hmm_json) -> HMM:
@@ -30,17 +35,24 @@ def _hmm_from_dict(hmm_json) -> HMM:
     )
 
 
+def _load_hmms(path: Path) -> List[HMM]:
+    with open(path) as f:
+        return [_hmm_from_dict(hmm) for hmm in json.load(f)]
+
+
 class HMMsProvider(AbstractHMMsProvider):
 
     def __init__(self,
                  http: aiohttp.ClientSession,
                  jobs_api_url: str,
                  work_path: Path,
-                 number_of_processes: int = 3):
+                 number_of_processes: Optional[int] = None,
+                 thread_allocator: Optional[ThreadAllocator] = None):
         self.http = http
         self.url = f"{jobs_api_url}/hmms"
         self.path = work_path / "hmms"
         self.number_of_processes = number_of_processes
+        self.thread_allocator = thread_allocator
 
         self.path.mkdir(parents=True, exist_ok=True)
 
@@ -54,20 +66,27 @@ class HMMsProvider(AbstractHMMsProvider):
             await read_file_from_response(response, self.path / "annotations.json.gz")
 
         try:
-            decompress_file(str(self.path / "annotations.json.gz"),
-                            str(self.path / "annotations.json"),
-                            self.number_of_processes)
+            with allocate_threads(self.thread_allocator, self.number_of_processes) as processes:
+                decompress_file(str(self.path / "annotations.json.gz"),
+                                str(self.path / "annotations.json"),
+                                processes)
         except gzip.BadGzipFile:
             shutil.copyfile(self.path / "annotations.json.gz", self.path / "annotations.json")
 
-        async with aiofiles.open(self.path / "annotations.json") as f:
-            hmms_json = json.loads(await f.read())
-            return [_hmm_from_dict(hmm) for hmm in hmms_json]
+        return await asyncio.get_running_loop().run_in_executor(None, _load_hmms, self.path / "annotations.json")
+
+    async def get_profiles(self, etag: Optional[str] = None) -> Optional[Path]:
+        headers = {"If-None-Match": etag} if etag else None
+
+        async with self.http.get(f"{self.url}/files/profiles.hmm", headers=headers) as response:
+            if response.status == 304:
+                return None
 
-    async def get_profiles(self) -> Path:
-        async with self.http.get(f"{self.url}/files/profiles.hmm") as response:
             async with raising_errors_by_status_code(response, accept=[200]):
+                self.profiles_etag = response.headers.get("ETag")
+
                 async with aiofiles.open(self.path / "profiles.hmm", "wb") as f:
-                    await f.write(await response.read())
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await f.write(chunk)
 
         return self.path / "profiles.hmm"
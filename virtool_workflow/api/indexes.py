@@ -1,4 +1,6 @@
+import asyncio
 from pathlib import Path
+from typing import Optional
 
 import aiohttp
 
@@ -32,17 +34,33 @@ class IndexProvider(AbstractIndexProvider):
     :param index_path: The file system path to store index files.
     :param http: An :obj:`aiohttp.ClientSession` to use when making HTTP requests.
     :param jobs_api_url: The base URL for the jobs API (should include `/api`).
+    :param transfer_limiter: A semaphore limiting the number of concurrent file transfers. Transfers for
+        this index are not limited if it is not provided.
     """
 
+    #: The files downloaded for an index by default.
+    files = [
+        "otus.json.gz",
+        "reference.fa.gz",
+        "reference.1.bt2",
+        "reference.2.bt2",
+        "reference.3.bt2",
+        "reference.4.bt2",
+        "reference.rev.1.bt2",
+        "reference.rev.2.bt2",
+    ]
+
     def __init__(self,
                  index_id: str,
                  ref_id: str,
                  http: aiohttp.ClientSession,
-                 jobs_api_url: str):
+                 jobs_api_url: str,
+                 transfer_limiter: Optional[asyncio.Semaphore] = None):
         self._index_id = index_id
         self._ref_id = ref_id
         self.http = http
         self.jobs_api_url = jobs_api_url
+        self.transfer_limiter = transfer_limiter
 
     async def get(self) -> Index:
         """Get the index for the current job."""
@@ -81,22 +99,23 @@ class IndexProvider(AbstractIndexProvider):
         )
 
     async def download(self, target_path: Path, *names) -> Path:
-        """Download files associated with the current index."""
-        if not names:
-            names = {
-                "otus.json.gz",
-                "reference.fa.gz",
-                "reference.1.bt2",
-                "reference.2.bt2",
-                "reference.3.bt2",
-                "reference.4.bt2",
-                "reference.rev.1.bt2",
-                "reference.rev.2.bt2",
-            }
-
-        for name in names:
-            async with self.http.get(f"{self.jobs_api_url}/indexes/{self._index_id}/files/{name}") as response:
-                await read_file_from_response(response, target_path / name)
+        """
+        Download files associated with the current index concurrently.
+
+        :param target_path: The directory to download the files to.
+        :param names: The names of the files to download. Defaults to all index files.
+        :return: The directory the files were downloaded to.
+        """
+        names = names or self.files
+
+        transfer_limiter = self.transfer_limiter or asyncio.Semaphore(len(names))
+
+        async def download_file(name: str):
+            async with transfer_limiter:
+                async with self.http.get(f"{self.jobs_api_url}/indexes/{self._index_id}/files/{name}") as response:
+                    await read_file_from_response(response, target_path / name)
+
+        await asyncio.gather(*[download_file(name) for name in names])
 
         return target_path
 
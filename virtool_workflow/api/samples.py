@@ -1,7 +1,7 @@
 import logging
 import pprint
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 import aiohttp
 
@@ -10,10 +10,12 @@ from virtool_workflow.analysis.utils import ReadPaths, make_read_paths
 from virtool_workflow.api.errors import (raising_errors_by_status_code,
                                          AlreadyFinalized,
                                          JobsAPIServerError)
+from virtool_workflow.api.streams import iter_chunks
 from virtool_workflow.api.utils import (upload_file_via_put,
                                         read_file_from_response)
 from virtool_workflow.data_model import Sample
 from virtool_workflow.data_model.files import VirtoolFileFormat, VirtoolFile
+from virtool_workflow.storage.streams import StreamingDownload
 
 logger = logging.getLogger(__name__)
 
@@ -89,6 +91,26 @@ class SampleProvider(AbstractSampleProvider):
 
         return make_read_paths(target_path, paired)
 
+    async def stream_reads(self, target_path: Path, paired: bool = None) -> List[StreamingDownload]:
+        """
+        Start downloading the reads for the sample concurrently in the background.
+
+        The reads can be read while they are downloading. See :class:`.StreamingDownload`.
+
+        :param target_path: The path where the file(s) will be downloaded.
+        :param paired: Indicates that the sample is paired. If not provided then the sample
+            will be fetched again via `.get()`.
+        :return: A :class:`.StreamingDownload` for each read file.
+        """
+        if paired is None:
+            sample = await self.get()
+            paired = sample.paired
+
+        return [
+            StreamingDownload(path).start(iter_chunks(self.http, f"{self.url}/reads/{path.name}"))
+            for path in make_read_paths(target_path, paired)
+        ]
+
     async def download_artifact(self, filename: str, target_path: Path):
         async with self.http.get(f"{self.url}/artifacts/{filename}") as response:
             await read_file_from_response(response, target_path / filename)
@@ -1,12 +1,14 @@
-from .client import http
+from .client import http, transfer_limiter
 from .jobs import acquire_job, push_status
 from .. import FixtureScope
-from ..config.fixtures import jobs_api_url
+from ..config.fixtures import jobs_api_url, max_transfers
 from ..fixtures import FixtureGroup
 
 api_fixtures = FixtureGroup(
     jobs_api_url,
     http,
+    max_transfers,
+    transfer_limiter,
     acquire_job,
     push_status
 )
@@ -0,0 +1,28 @@
+"""
+Stream files from the Jobs API.
+
+Pass the chunks to :meth:`virtool_workflow.storage.streams.StreamingDownload.start` to read a file while it is
+downloading.
+
+"""
+from typing import AsyncIterator
+
+import aiohttp
+
+from virtool_workflow.api.errors import raising_errors_by_status_code
+from virtool_workflow.storage.streams import CHUNK_SIZE
+
+
+async def iter_chunks(http: aiohttp.ClientSession, url: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Download a file, yielding each chunk as it arrives.
+
+    :param http: the session to make the request with
+    :param url: the URL of the file
+    :param chunk_size: the number of bytes to read from the response at a time
+    :return: an iterator of the chunks of the file
+    """
+    async with http.get(url) as response:
+        async with raising_errors_by_status_code(response):
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
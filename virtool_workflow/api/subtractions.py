@@ -1,6 +1,7 @@
+import asyncio
 from numbers import Number
 from pathlib import Path
-from typing import Dict
+from typing import Awaitable, Callable, Dict, Optional
 
 import aiohttp
 
@@ -10,9 +11,14 @@ from virtool_workflow.api.utils import (upload_file_via_put,
                                         read_file_from_response,
                                         upload_file_via_put)
 from virtool_workflow.data_model import Subtraction, NucleotideComposition
+from virtool_workflow.storage.utils import FileFetcher
 
 
-def subtraction_from_json(subtraction_json: dict, path: Path) -> Subtraction:
+def subtraction_from_json(
+        subtraction_json: dict,
+        path: Path,
+        fetch: Optional[Callable[..., Awaitable[Path]]] = None
+) -> Subtraction:
     return Subtraction(
         subtraction_json["id"],
         subtraction_json["name"],
@@ -20,6 +26,7 @@ def subtraction_from_json(subtraction_json: dict, path: Path) -> Subtraction:
         subtraction_json["count"] if "count" in subtraction_json else None,
         NucleotideComposition(**subtraction_json["gc"]) if "gc" in subtraction_json else {},
         path,
+        fetch,
     )
 
 
@@ -31,26 +38,45 @@ class SubtractionProvider(AbstractSubtractionProvider):
     :param http: An class:`aiohttp.ClientSession` to use when making requests.
     :param jobs_api_url: The url for the jobs API (including /api).
     :param subtraction_work_path: The working path for subtraction files.
+    :param transfer_limiter: A semaphore limiting the number of concurrent file transfers. Transfers for
+        this subtraction are not limited if it is not provided.
+
+    Subtractions returned by the provider download their files on demand, so each file is only downloaded the
+    first time it is needed.
     """
 
+    #: The files downloaded for a subtraction by default.
+    files = [
+        "subtraction.fa.gz",
+        "subtraction.1.bt2",
+        "subtraction.2.bt2",
+        "subtraction.3.bt2",
+        "subtraction.4.bt2",
+        "subtraction.rev.1.bt2",
+        "subtraction.rev.2.bt2",
+    ]
+
     def __init__(
             self,
             subtraction_id: str,
             http: aiohttp.ClientSession,
             jobs_api_url: str,
             subtraction_work_path: Path,
+            transfer_limiter: Optional[asyncio.Semaphore] = None
     ):
         self.subtraction_id = subtraction_id
         self.http = http
         self.api_url = f"{jobs_api_url}/subtractions/{subtraction_id}"
         self.path = subtraction_work_path / subtraction_id
+        self.transfer_limiter = transfer_limiter
+        self.fetcher = FileFetcher(self.download, self.path)
         if not self.path.exists():
             self.path.mkdir()
 
     async def get(self) -> Subtraction:
         async with self.http.get(self.api_url) as response:
             async with raising_errors_by_status_code(response) as subtraction_json:
-                return subtraction_from_json(subtraction_json, self.path)
+                return subtraction_from_json(subtraction_json, self.path, self.fetcher.fetch)
 
     async def upload(self, path: Path):
         """
@@ -76,26 +102,27 @@ class SubtractionProvider(AbstractSubtractionProvider):
         """
         async with self.http.patch(self.api_url, json={"gc": gc}) as response:
             async with raising_errors_by_status_code(response) as subtraction_json:
-                return subtraction_from_json(subtraction_json, self.path)
+                return subtraction_from_json(subtraction_json, self.path, self.fetcher.fetch)
 
     async def download(self, target_path: Path = None, *names):
-        if not names:
-            names = [
-                "subtraction.fa.gz",
-                "subtraction.1.bt2",
-                "subtraction.2.bt2",
-                "subtraction.3.bt2",
-                "subtraction.4.bt2",
-                "subtraction.rev.1.bt2",
-                "subtraction.rev.2.bt2",
-            ]
-
-        if not target_path:
-            target_path = self.path
-
-        for name in names:
-            async with self.http.get(f"{self.api_url}/files/{name}") as response:
-                await read_file_from_response(response, target_path / name)
+        """
+        Download files relating to this subtraction concurrently.
+
+        :param target_path: The directory to download the files to. Defaults to the subtraction path.
+        :param names: The names of the files to download. Defaults to all subtraction files.
+        :return: The directory the files were downloaded to.
+        """
+        names = names or self.files
+        target_path = target_path or self.path
+
+        transfer_limiter = self.transfer_limiter or asyncio.Semaphore(len(names))
+
+        async def download_file(name: str):
+            async with transfer_limiter:
+                async with self.http.get(f"{self.api_url}/files/{name}") as response:
+                    await read_file_from_response(response, target_path / name)
+
+        await asyncio.gather(*[download_file(name) for name in names])
 
         return target_path
 
@@ -70,8 +70,18 @@ class GenericCacheWriter(AbstractCacheWriter):
 
 
 class GenericCaches(AbstractCaches):
+    """
+    A :class:`AbstractCaches` for caches of the class given as a type argument.
+
+    Subscripting creates a subclass, so caches for different kinds of artifacts can share an implementation.
+    """
     cache_class = Cache
 
+    def __init_subclass__(cls, cache_class: GenericCache = None, **kwargs):
+        if cache_class is not None:
+            cls.cache_class = cache_class
+        super(GenericCaches, cls).__init_subclass__(**kwargs)
+
     @abstractmethod
     async def get(self, key: str) -> GenericCache:
         pass
@@ -82,5 +92,10 @@ class GenericCaches(AbstractCaches):
 
     def __class_getitem__(cls, item):
         """Set the cache_class."""
-        cls.cache_class = item
-        return cls
+
+        class _Temp(cls, cache_class=item):
+            ...
+
+        _Temp.__name__ = f"{cls.__name__}[{getattr(item, '__name__', item)}]"
+
+        return _Temp
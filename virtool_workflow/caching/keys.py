@@ -0,0 +1,73 @@
+"""Compute keys for caches of artifacts derived from trimmed sample reads."""
+import hashlib
+import json
+from typing import Iterable, Optional
+
+
+def derived_cache_key(
+        kind: str,
+        reads_key: str,
+        index_id: Optional[str] = None,
+        subtraction_ids: Optional[Iterable[str]] = None,
+        parameters: Optional[dict] = None
+) -> str:
+    """
+    Compute a cache key for an artifact derived from trimmed reads.
+
+    The key changes if the reads, index, subtractions, or tool parameters change. The order of
+    ``subtraction_ids`` does not affect the key.
+
+    :param kind: the kind of artifact, such as ``"alignments"`` or ``"depleted"``
+    :param reads_key: the cache key for the trimmed reads, usually the ``trimming_cache_key`` fixture
+    :param index_id: the ID of the reference index used to make the artifact
+    :param subtraction_ids: the IDs of the subtractions used to make the artifact
+    :param parameters: the parameters for the tools used to make the artifact
+    :return: the cache key
+
+    """
+    key = {
+        "reads": reads_key,
+        "index": index_id,
+        "subtractions": sorted(subtraction_ids or []),
+        "parameters": parameters or {},
+    }
+
+    raw_key = f"{kind}-" + json.dumps(key, sort_keys=True)
+
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def alignment_cache_key(
+        reads_key: str,
+        index_id: str,
+        subtraction_ids: Optional[Iterable[str]] = None,
+        parameters: Optional[dict] = None
+) -> str:
+    """
+    Compute a cache key for alignments of trimmed reads against a reference index.
+
+    :param reads_key: the cache key for the trimmed reads
+    :param index_id: the ID of the reference index the reads were aligned against
+    :param subtraction_ids: the IDs of any subtractions host reads were removed for before alignment
+    :param parameters: the alignment parameters
+    :return: the cache key
+
+    """
+    return derived_cache_key("alignments", reads_key, index_id, subtraction_ids, parameters)
+
+
+def depleted_reads_cache_key(
+        reads_key: str,
+        subtraction_ids: Iterable[str],
+        parameters: Optional[dict] = None
+) -> str:
+    """
+    Compute a cache key for trimmed reads with host reads removed.
+
+    :param reads_key: the cache key for the trimmed reads
+    :param subtraction_ids: the IDs of the subtractions host reads were removed for
+    :param parameters: the depletion parameters
+    :return: the cache key
+
+    """
+    return derived_cache_key("depleted", reads_key, subtraction_ids=subtraction_ids, parameters=parameters)
@@ -20,6 +20,18 @@ def work_path(value: str) -> Path:
         yield temp
 
 
+@options.fixture(default=os.path.join(os.getcwd(), "cache"), type=click.Path())
+def cache_path(value: str) -> Path:
+    """The path where data that can be reused by later jobs on the same host should be stored."""
+    return Path(value)
+
+
+@options.fixture(default=4, type=int)
+def max_transfers(_):
+    """The maximum number of files transferred to or from the Jobs API at once."""
+    ...
+
+
 @options.fixture(default=2, type=int)
 def proc(_):
     """The number of processes as an integer."""
@@ -32,6 +44,24 @@ def mem(_):
     ...
 
 
+@options.fixture(default=0.0, type=float)
+def preview(_):
+    """Analyze a random subsample of the reads. Use a number below 1 for a fraction of reads or a larger number for a count of reads. Use 0 to analyze all reads."""
+    ...
+
+
+@options.fixture(default=0, type=int)
+def preview_seed(_):
+    """The seed used to select reads in preview mode."""
+    ...
+
+
+@options.fixture(default=False, is_flag=True)
+def stream_reads(_):
+    """A flag indicating that sample reads should be trimmed while they are downloading."""
+    ...
+
+
 @options.fixture(default=False, is_flag=True)
 def dev_mode(_):
     """A flag indicating that development mode is enabled."""
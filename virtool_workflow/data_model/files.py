@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import date
-from typing import Literal
+from typing import Literal, Tuple
 
 VirtoolFileFormat = Literal[
     "sam",
@@ -13,6 +13,16 @@ VirtoolFileFormat = Literal[
     "unknown",
 ]
 
+#: The suffixes of the files that make up a Bowtie2 index, appended to the index prefix after a ``.``.
+BOWTIE2_SUFFIXES: Tuple[str, ...] = (
+    "1.bt2",
+    "2.bt2",
+    "3.bt2",
+    "4.bt2",
+    "rev.1.bt2",
+    "rev.2.bt2",
+)
+
 
 @dataclass
 class VirtoolFile:
@@ -1,7 +1,9 @@
+import asyncio
 from dataclasses import dataclass, field
 from typing import List, Optional
 
 from virtool_workflow.analysis.library_types import LibraryType
+from virtool_workflow.analysis.utils import ReadPaths
 
 
 @dataclass
@@ -33,6 +35,7 @@ class Sample:
     def __post_init__(self):
         self.reads_path = None
         self.read_paths = None
+        self.read_downloads = None
 
     @property
     def min_length(self) -> Optional[int]:
@@ -53,3 +56,21 @@ class Sample:
 
         """
         return self.quality["length"][1] if self.quality else None
+
+    async def get_read_paths(self) -> ReadPaths:
+        """
+        Wait for the read files to finish downloading if they are being streamed.
+
+        Reads are only streamed when the ``stream_reads`` option is set. Otherwise, the read files are already
+        downloaded and :attr:`read_paths` can be used directly.
+
+        While the reads are streaming, :attr:`read_paths` is ``None`` so incomplete files can't be used by
+        mistake. It is set once the downloads finish. Read the partial files through :attr:`read_downloads`.
+
+        :return: the paths to the read files
+
+        """
+        if self.read_downloads and self.read_paths is None:
+            self.read_paths = tuple(await asyncio.gather(*[download.wait() for download in self.read_downloads]))
+
+        return self.read_paths
@@ -1,6 +1,9 @@
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from virtool_workflow.data_model.files import BOWTIE2_SUFFIXES
 
 
 @dataclass(frozen=True)
@@ -68,11 +71,20 @@ class Subtraction(ABC):
     The subtraction directory contains the FASTA and Bowtie2 files for the subtraction.
     """
 
+    _fetch: Optional[Callable[..., Awaitable[Path]]] = field(default=None, repr=False, compare=False)
+    """
+    A function that downloads the named subtraction files to :attr:`path` if they have not been downloaded.
+
+    The files are assumed to be present in :attr:`path` if this is not set.
+    """
+
     @property
     def fasta_path(self) -> Path:
         """
         The path in the running workflow's work_path to the GZIP-compressed FASTA file for the subtraction.
 
+        The file may not have been downloaded yet. Use :meth:`.get_fasta_path` to make sure it is present.
+
         eg. ``<work_path>/subtractions/<id>/subtraction.fa.gz``
 
         :type: :class:`.Path`
@@ -85,6 +97,9 @@ class Subtraction(ABC):
         """
         The path to Bowtie2 prefix in the the running workflow's work_path
 
+        The index files may not have been downloaded yet. Use :meth:`.get_bowtie2_index_path` to make sure they
+        are present.
+
         For example, ``<work_path>/subtractions/<id>/subtraction`` refers to the Bowtie2 index files:
             - ``<work_path>/subtractions/<id>/subtraction.1.bt2``
             - ``<work_path>/subtractions/<id>/subtraction.2.bt2``
@@ -97,3 +112,29 @@ class Subtraction(ABC):
 
         """
         return self.path / "subtraction"
+
+    async def get_fasta_path(self) -> Path:
+        """
+        Download the FASTA file for the subtraction if it has not been downloaded.
+
+        :return: the path to the FASTA file
+
+        """
+        if self._fetch is not None:
+            await self._fetch(self.fasta_path.name)
+
+        return self.fasta_path
+
+    async def get_bowtie2_index_path(self) -> Path:
+        """
+        Download the Bowtie2 index files for the subtraction if they have not been downloaded.
+
+        The FASTA file is not downloaded.
+
+        :return: the path to the Bowtie2 index prefix
+
+        """
+        if self._fetch is not None:
+            await self._fetch(*[f"{self.bowtie2_index_path.name}.{suffix}" for suffix in BOWTIE2_SUFFIXES])
+
+        return self.bowtie2_index_path
@@ -1,7 +1,9 @@
 from .run_subprocess import run_subprocess
 from .run_in_executor import run_in_executor
+from .threads import thread_allocator
 
 __all__ = [
     "run_subprocess",
     "run_in_executor",
+    "thread_allocator",
 ]
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""Start downloading the inputs for a job as soon as it is acquired."""
+import asyncio
+import logging
+from typing import Iterable, List
+
+from virtool_workflow.data_model import Job
+from virtool_workflow.fixtures.scope import FixtureScope
+from virtool_workflow.workflow import Workflow
+
+logger = logging.getLogger(__name__)
+
+#: Fixtures that download job inputs, mapped to the job argument each one requires. ``None`` means the fixture
+#: doesn't require a job argument.
+#:
+#: The ``indexes`` and ``subtractions`` fixtures are not included. They only fetch small documents and their
+#: large files are downloaded when a workflow first asks for them, so prefetching them would not start any
+#: large transfers.
+PREFETCH_FIXTURES = {
+    "sample": "sample_id",
+    "hmms": None,
+}
+
+
+def get_prefetch_fixtures(job: Job, dependencies: Iterable[str]) -> List[str]:
+    """
+    Get the names of the input fixtures that should be prefetched for a job.
+
+    :param job: the acquired job
+    :param dependencies: the names of the fixtures the workflow requires
+    :return: the names of the fixtures to prefetch
+    """
+    dependencies = set(dependencies)
+
+    return [
+        name for name, argument in PREFETCH_FIXTURES.items()
+        if name in dependencies and (argument is None or argument in job.args)
+    ]
+
+
+def prefetch_inputs(scope: FixtureScope, workflow: Workflow, job: Job) -> List[asyncio.Future]:
+    """
+    Start instantiating the input fixtures the workflow requires in the background.
+
+    The fixture dependency graph of the workflow's startup, step, and cleanup functions is inspected without
+    instantiating anything. The input fixtures it contains are then instantiated concurrently, so their downloads
+    run in parallel instead of one after another as the steps are bound. Binding a step to a prefetched fixture
+    waits for the running instantiation.
+
+    :param scope: the scope the workflow will be bound in
+    :param workflow: the workflow
+    :param job: the acquired job
+    :return: a future for each prefetched fixture
+    """
+    dependencies = scope.get_dependencies(*workflow.on_startup, *workflow.steps, *workflow.on_cleanup)
+
+    names = get_prefetch_fixtures(job, dependencies)
+
+    if names:
+        logger.info(f"Prefetching {', '.join(names)}")
+
+    return scope.prefetch(*names)
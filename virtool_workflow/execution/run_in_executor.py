@@ -1,4 +1,5 @@
 """Helper functions for threading and running subprocesses within Virtool Workflows."""
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Any, Protocol, Coroutine, runtime_checkable
 
@@ -22,10 +23,11 @@ def run_in_executor(thread_pool_executor: ThreadPoolExecutor) -> FunctionExecuto
     """
     Fixture to execute functions in a #concurrent.futures.ThreadPoolExecutor.
 
-    Wraps :func:`concurrent.futures.ThreadPoolExecutor.submit()` as an async function.
+    Wraps :func:`concurrent.futures.ThreadPoolExecutor.submit()` as an async function. The event loop is not
+    blocked while the function runs.
     """
     async def _run_in_executor(func: Callable, *args, **kwargs):
         future = thread_pool_executor.submit(func, *args, **kwargs)
-        return future.result()
+        return await asyncio.wrap_future(future)
 
     return _run_in_executor
@@ -0,0 +1,99 @@
+"""Allocation of the threads available to a job between the external tools it runs."""
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from virtool_workflow.data_model import Job
+from virtool_workflow.fixtures.workflow_fixture import fixture
+
+
+class ThreadAllocator:
+    """
+    Divides the threads reserved by a job between the external tools running at the same time.
+
+    A tool is given an even share of the threads with respect to all other tools that are running when
+    it is started. Allocation never blocks. A tool started while another is running may cause the job to
+    briefly use more threads than it reserved. This is preferable to waiting for a long-running tool to
+    finish.
+
+    """
+
+    def __init__(self, threads: int):
+        #: The total number of threads available to the job.
+        self.threads: int = max(1, threads)
+        #: The number of tools currently holding an allocation.
+        self.active: int = 0
+
+    def share(self, demand: int = 1) -> int:
+        """
+        Get the number of threads each of ``demand`` additional tools would be given if they were started now.
+
+        :param demand: the number of tools that will be started
+        :return: the number of threads for each tool
+
+        """
+        return max(1, self.threads // (self.active + demand))
+
+    @contextmanager
+    def allocate(self, maximum: Optional[int] = None, demand: int = 1) -> Iterator[int]:
+        """
+        Allocate threads to one or more tools for the duration of a ``with`` block.
+
+        Pass ``demand`` when several tools will be run concurrently in the block. The yielded number of
+        threads is the share for each of them.
+
+        :param maximum: the most threads that the tool can make use of
+        :param demand: the number of tools that will be run concurrently in the block
+        :return: the number of threads for each tool
+
+        """
+        threads = self.share(demand)
+
+        if maximum is not None:
+            threads = max(1, min(threads, maximum))
+
+        self.active += demand
+
+        try:
+            yield threads
+        finally:
+            self.active -= demand
+
+
+@contextmanager
+def allocate_threads(
+        thread_allocator: Optional[ThreadAllocator],
+        threads: Optional[int] = None,
+        maximum: Optional[int] = None,
+        demand: int = 1
+) -> Iterator[int]:
+    """
+    Allocate threads to a tool unless an explicit number of ``threads`` was requested.
+
+    One thread is used if neither ``threads`` nor a ``thread_allocator`` are provided.
+
+    :param thread_allocator: the allocator for the running job
+    :param threads: an explicit number of threads requested by the caller
+    :param maximum: the most threads that the tool can make use of
+    :param demand: the number of tools that will be run concurrently in the block
+    :return: the number of threads for each tool
+
+    """
+    if threads is not None:
+        yield threads
+    elif thread_allocator is None:
+        yield 1
+    else:
+        with thread_allocator.allocate(maximum, demand) as allocated:
+            yield allocated
+
+
+@fixture
+def thread_allocator(job: Job, proc: int) -> ThreadAllocator:
+    """
+    A fixture for the :class:`.ThreadAllocator` used to divide threads between external tools.
+
+    The job's reserved ``proc`` is used, but it is limited by the ``proc`` configured for the workflow
+    runner.
+
+    """
+    return ThreadAllocator(min(job.proc, proc))
@@ -7,6 +7,7 @@ from contextlib import asynccontextmanager
 from virtool_workflow import hooks
 from virtool_workflow.fixtures.scope import FixtureScope
 from virtool_workflow.execution import states
+from virtool_workflow.execution.prefetch import prefetch_inputs
 from virtool_workflow.workflow import Workflow
 
 logger = logging.getLogger(__name__)
@@ -84,7 +85,9 @@ class WorkflowExecution:
         self.scope["execution"] = self
         self.scope["current_step"] = self.current_step
         self.scope["results"] = {}
-        await self.scope.get_or_instantiate("job")
+        job = await self.scope.get_or_instantiate("job")
+
+        prefetch_inputs(self.scope, self.workflow, job)
 
         self.scope["logger"] = logging.getLogger(self.scope["job_id"])
 
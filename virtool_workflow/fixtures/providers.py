@@ -35,6 +35,10 @@ def for_fixtures(*receivers: Callable, **fixtures):
 class FixtureGroup(FixtureProvider, dict):
     """A dict defining a group of fixture functions."""
 
+    #: Incremented whenever a fixture is added to or removed from any group, so
+    #: lookups cached from groups can tell when they are stale.
+    version = 0
+
     def __init__(self, *args, **kwargs):
         super(FixtureGroup, self).__init__()
         self.update(**{f.__name__: f for f in args})
@@ -44,6 +48,26 @@ class FixtureGroup(FixtureProvider, dict):
         if name in self:
             return self[name]
 
+    def __setitem__(self, name: str, fixture: Callable):
+        super().__setitem__(name, fixture)
+        FixtureGroup.version += 1
+
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+        FixtureGroup.version += 1
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        FixtureGroup.version += 1
+
+    def pop(self, *args):
+        FixtureGroup.version += 1
+        return super().pop(*args)
+
+    def clear(self):
+        super().clear()
+        FixtureGroup.version += 1
+
     def fixture(self, func: callable):
         if func.__name__.startswith("_"):
             func.__name__ = func.__name__.lstrip("_")
@@ -59,6 +83,14 @@ class FixtureGroup(FixtureProvider, dict):
 class InstanceFixtureGroup(FixtureGroup):
     """A dict which acts as a :class:`FixtureProvider`, providing it's instances as fixture values."""
 
+    # Instances are looked up directly rather than through cached lookups,
+    # so changing them doesn't need to change the version.
+    __setitem__ = dict.__setitem__
+    __delitem__ = dict.__delitem__
+    update = dict.update
+    pop = dict.pop
+    clear = dict.clear
+
     def __call__(self, name: str, _: Callable = None):
         if name in self:
             return lambda: self[name]
@@ -3,9 +3,9 @@ import inspect
 import asyncio
 import logging
 from contextlib import AbstractAsyncContextManager, suppress
+from contextvars import ContextVar
 from functools import wraps
-from inspect import signature
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from virtool_workflow.utils import coerce_to_coroutine_function, wrapped_partial
 
 from virtool_workflow.fixtures.errors import (
@@ -18,10 +18,19 @@ from virtool_workflow.fixtures.providers import (
     FixtureProvider,
     InstanceFixtureGroup,
 )
+from virtool_workflow.fixtures.signatures import get_parameters
 from virtool_workflow.workflow import Workflow
 
 logger = logging.getLogger(__name__)
 
+#: The names of the fixtures being instantiated by the current task, outermost first.
+_instantiating_chain: ContextVar[Tuple[str, ...]] = ContextVar("instantiating_chain", default=())
+
+
+def _retrieve_exception(future: asyncio.Future):
+    if not future.cancelled():
+        future.exception()
+
 
 class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
     """A scope maintaining instances of fixtures."""
@@ -40,10 +49,15 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
         self.update(**instances, scope=self)
         self._overrides = FixtureGroup()
         self._providers = [self, self._overrides, *providers]
-        self._generators, self._async_generators = [], []
+        #: Generator and async generator fixtures in the order they were instantiated.
+        self._generators = []
+        self._instantiating: Dict[str, asyncio.Future] = {}
+        #: The fixtures each in-flight instantiation is waiting for.
+        self._waiting: Dict[str, Set[str]] = {}
 
-        self.add_provider = self._providers.append
-        self.add_providers = self._providers.extend
+        #: The providers to check for each fixture name that has been looked up.
+        self._registry: Dict[str, Tuple[FixtureProvider, ...]] = {}
+        self._registry_version = FixtureGroup.version
 
         self.name = scope_name or id(self)
         self.open = False
@@ -62,12 +76,17 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
         Close the :class:`FixtureScope`.
 
         - Remove references to any instances
-        - Return control to each generator fixture
-        - Return control to each async generator fixture
+        - Return control to each generator and async generator fixture, in
+          the reverse of the order they were instantiated in
         - Remove references to generators and async generators
         """
         logger.info(f"Closing {FixtureScope.__name__} {self.name}")
 
+        for task in self._instantiating.values():
+            task.cancel()
+
+        self._instantiating.clear()
+        self._waiting.clear()
         self.clear()
 
         async def return_control_to_generator(gen):
@@ -82,23 +101,25 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
                 await gen.__anext__()
                 raise FixtureMultipleYield("Fixture must only yield once")
 
-        tasks = [return_control_to_generator(gen)
-                 for gen in self._generators]
-
-        tasks.extend([
-            return_control_to_async_generator(gen)
-            for gen in self._async_generators
-        ])
-
+        generators = self._generators[::-1]
         self._generators.clear()
-        self._async_generators.clear()
 
-        tasks.extend([
+        # A fixture is always instantiated after the fixtures it depends on,
+        # so reversing the order finishes it before them.
+        results = []
+        for gen in generators:
+            try:
+                if inspect.isasyncgen(gen):
+                    await return_control_to_async_generator(gen)
+                else:
+                    await return_control_to_generator(gen)
+            except Exception as error:
+                results.append(error)
+
+        results.extend(await asyncio.gather(*[
             provider.close() for provider in self._providers
             if id(provider) != id(self) and hasattr(provider, "close")
-        ])
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        ], return_exceptions=True))
 
         for error in results:
             if isinstance(error, Exception):
@@ -139,7 +160,7 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
             instance = next(instance)
 
         elif inspect.isasyncgen(instance):
-            self._async_generators.append(instance)
+            self._generators.append(instance)
             instance = await instance.__anext__()
 
         self[fixture_.__name__] = instance
@@ -147,15 +168,66 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
         logger.debug(f"Instantiated {fixture_} as {instance}")
         return instance
 
+    def add_provider(self, provider: FixtureProvider):
+        """
+        Add a provider to be checked after the existing providers.
+
+        :param provider: The provider
+        """
+        self._providers.append(provider)
+        self._registry.clear()
+
+    def add_providers(self, providers: Iterable[FixtureProvider]):
+        """
+        Add providers to be checked after the existing providers.
+
+        :param providers: The providers
+        """
+        self._providers.extend(providers)
+        self._registry.clear()
+
+    def _get_providers(self, name: str) -> Tuple[FixtureProvider, ...]:
+        """
+        Get the providers that may provide a fixture, in the order they
+        should be checked.
+
+        :class:`FixtureGroup` providers are indexed by the names of their
+        fixtures, so only the first group containing the fixture is included.
+        Other providers can depend on the function requesting the fixture,
+        so they are always included. The result is cached until a provider
+        is added or any :class:`FixtureGroup` changes.
+
+        :param name: The name of the fixture
+        :return: The providers
+        """
+        if self._registry_version != FixtureGroup.version:
+            self._registry.clear()
+            self._registry_version = FixtureGroup.version
+
+        with suppress(KeyError):
+            return self._registry[name]
+
+        providers = []
+        for provider in self._providers:
+            if type(provider).__call__ is not FixtureGroup.__call__:
+                providers.append(provider)
+            elif name in provider:
+                providers.append(provider)
+                break
+
+        self._registry[name] = tuple(providers)
+
+        return self._registry[name]
+
     def _get_fixture_from_providers(self, name, request_from: Callable = None):
         """
-        Search all providers for a fixture.
+        Search the providers for a fixture.
 
         :param name: The name of the fixture
         :request_from: The function which the fixture will be bound to
         :raise KeyError: When the fixture cannot be found
         """
-        for provider in self._providers:
+        for provider in self._get_providers(name):
             fixture = provider(name, request_from)
             if fixture is not None:
                 return fixture
@@ -167,43 +239,204 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
         """
         Get the value of a fixture, instantiating the fixture if needed.
 
+        If the fixture is already being instantiated, for example by :meth:`.prefetch`, the running
+        instantiation is awaited instead of starting another. If an instantiation fails, the error is
+        raised for every later request instead of instantiating the fixture again.
+
         :param name: The name of the workflow fixture to get
         :param requested_by: The function which teh fixture will be bound to
         :return: The value of the fixture
         :raise FixtureNotFound: When the fixture cannot be found
+        :raise RecursionError: When the fixture depends on itself
         """
         with suppress(KeyError):
             return self[name]
 
-        fixture = self._get_fixture_from_providers(name, requested_by)
-        return await self.instantiate(fixture)
+        chain = _instantiating_chain.get()
+
+        if name in chain:
+            raise RecursionError(f"Fixture '{name}' depends on itself: {' -> '.join((*chain, name))}")
+
+        # The fixture may already be waiting for this instantiation through
+        # a fixture that is being instantiated concurrently.
+        path = self._get_waiting_path(name, chain) if chain else None
+
+        if path is not None:
+            cycle = (*chain[chain.index(path[-1]):], *path)
+            raise RecursionError(f"Fixture '{path[-1]}' depends on itself: {' -> '.join(cycle)}")
+
+        if name not in self._instantiating:
+            fixture = self._get_fixture_from_providers(name, requested_by)
+
+            async def instantiate():
+                _instantiating_chain.set((*chain, name))
+
+                instance = await self.instantiate(fixture)
+
+                # Failed instantiations are kept so their error is raised to
+                # later requesters. Fixtures partially set up by a failed
+                # attempt can't always be instantiated again.
+                if self._instantiating.get(name) is asyncio.current_task():
+                    del self._instantiating[name]
+
+                return instance
+
+            self._instantiating[name] = asyncio.ensure_future(instantiate())
+            self._instantiating[name].add_done_callback(_retrieve_exception)
+
+        if chain:
+            self._waiting.setdefault(chain[-1], set()).add(name)
+
+        try:
+            # Shielding keeps the instantiation running for other requesters
+            # if this one is cancelled.
+            return await asyncio.shield(self._instantiating[name])
+        finally:
+            if chain:
+                self._waiting.get(chain[-1], set()).discard(name)
+
+    def _get_waiting_path(
+        self, name: str, targets: Tuple[str, ...]
+    ) -> Optional[List[str]]:
+        """
+        Find a path from a fixture to one of ``targets`` through the fixtures
+        that in-flight instantiations are waiting for.
+
+        :param name: The name of the fixture to start from
+        :param targets: The names of the fixtures to find
+        :return: The names of the fixtures on the path, or ``None`` if there
+                 is no path
+        """
+        paths = [[name]]
+        visited = set()
+
+        while paths:
+            path = paths.pop()
+
+            if path[-1] in targets:
+                return path
+
+            if path[-1] in visited:
+                continue
+
+            visited.add(path[-1])
+
+            paths.extend(
+                [*path, waited] for waited in self._waiting.get(path[-1], ())
+            )
+
+        return None
+
+    def get_dependencies(self, *functions: Callable) -> Set[str]:
+        """
+        Find the names of the fixtures that binding the functions would require, without instantiating them.
+
+        The dependencies of fixtures that already have instances are not included. Parameters that don't
+        match a fixture are ignored.
+
+        :param functions: The functions to find the dependencies of
+        :return: The names of the fixtures
+        """
+        names = set()
+
+        requests = [
+            (coerce_to_coroutine_function(func), name)
+            for func in functions
+            for name in get_parameters(func)
+        ]
+
+        while requests:
+            requested_by, name = requests.pop()
+
+            if name in names:
+                continue
+
+            names.add(name)
+
+            if name in self:
+                continue
+
+            try:
+                fixture = self._get_fixture_from_providers(name, requested_by)
+            except FixtureNotFound:
+                continue
+
+            requests.extend(
+                (coerce_to_coroutine_function(fixture), dependency)
+                for dependency in get_parameters(fixture)
+            )
+
+        return names
+
+    def prefetch(self, *names: str) -> List[asyncio.Future]:
+        """
+        Start instantiating fixtures in the background.
+
+        Requesting one of the fixtures waits for the running instantiation. Any error is raised when the
+        fixture is requested.
+
+        :param names: The names of the fixtures
+        :return: A future for the value of each fixture
+        """
+        futures = [asyncio.ensure_future(self.get_or_instantiate(name)) for name in names]
+
+        for future in futures:
+            future.add_done_callback(_retrieve_exception)
+
+        return futures
 
     async def bind(self, func, **kwargs):
         """
         Bind fixture values to the parameters of a function.
 
         Fixtures are instantiated at the time that this function is called.
+        Fixtures that don't depend on each other are instantiated
+        concurrently, as are their own dependencies, and a fixture required
+        by more than one of them is only instantiated once.
 
-        :raise FixtureNotFound: When there is a parameter which does not
-                                correspond to a fixture.
+        :raise FixtureBindingError: When a fixture for one of the parameters
+                                    cannot be found or instantiated.
         """
-        if hasattr(func, "__follow_wrapped__"):
-            sig = signature(func, follow_wrapped=func.__follow_wrapped__)
-        else:
-            sig = signature(func, follow_wrapped=True)
+        parameters = get_parameters(func)
 
         func = coerce_to_coroutine_function(func)
 
-        kwargs = {k: v for k, v in kwargs.items() if k in sig.parameters}
+        kwargs = {k: v for k, v in kwargs.items() if k in parameters}
 
         fixtures = {}
-        for name in sig.parameters:
+        tasks = {}
+        for name in parameters:
             if name in kwargs:
                 continue
+            if name in self:
+                fixtures[name] = self[name]
+            else:
+                tasks[name] = asyncio.ensure_future(
+                    self.get_or_instantiate(name, func)
+                )
+
+        if tasks:
+            for task in tasks.values():
+                task.add_done_callback(_retrieve_exception)
+
             try:
-                fixtures[name] = await self.get_or_instantiate(name, func)
-            except Exception as error:
-                raise FixtureBindingError(func, name) from error
+                await asyncio.wait(
+                    tasks.values(), return_when=asyncio.FIRST_EXCEPTION
+                )
+            finally:
+                # Instantiations other requesters are waiting for keep running.
+                for task in tasks.values():
+                    task.cancel()
+
+            for name, task in tasks.items():
+                if not task.done() or task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    raise FixtureBindingError(func, name) from task.exception()
+
+            fixtures.update(
+                (name, task.result()) for name, task in tasks.items()
+            )
 
         self.update(fixtures)
         kwargs.update(fixtures)
@@ -214,10 +447,8 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
         """
         Bind fixtures to the function using :func:`functools.partial`.
         """
-        sig = signature(func)
-
         fixtures = {}
-        for name in sig.parameters:
+        for name in get_parameters(func):
             try:
                 fixtures[name] = await self.get_or_instantiate(name, func)
             except FixtureNotFound:
@@ -238,11 +469,11 @@ class FixtureScope(AbstractAsyncContextManager, InstanceFixtureGroup):
         :return: A new function which does not require arguments
         :raise KeyError: When a fixture cannot be found
         """
-        sig = signature(func)
+        parameters = get_parameters(func)
         func = coerce_to_coroutine_function(func)
 
         async def get_values(func, fixtures):
-            for name, parameter in sig.parameters.items():
+            for name in parameters:
                 fixtures[name] = await self.get_or_instantiate(
                     name, requested_by=func
                 )
@@ -0,0 +1,42 @@
+"""Inspect the parameters of the functions fixtures are bound to."""
+import inspect
+from contextlib import suppress
+from typing import Callable, Tuple
+from weakref import WeakKeyDictionary
+
+_parameters = WeakKeyDictionary()
+
+
+def get_signature(func: Callable) -> inspect.Signature:
+    """
+    Get the signature used to bind fixtures to a function.
+
+    Wrapped functions use the signature of the function they wrap, unless the wrapper sets
+    ``__follow_wrapped__`` to ``False``.
+
+    :param func: the function
+    :return: the signature
+    """
+    return inspect.signature(func, follow_wrapped=getattr(func, "__follow_wrapped__", True))
+
+
+def get_parameters(func: Callable) -> Tuple[str, ...]:
+    """
+    Get the names of the parameters fixtures are bound to for a function.
+
+    The names are cached for as long as the function exists, so steps and hook callbacks that are bound
+    repeatedly are only inspected once. Callables that can't be weakly referenced or hashed are inspected
+    every time.
+
+    :param func: the function
+    :return: the parameter names
+    """
+    with suppress(KeyError, TypeError):
+        return _parameters[func]
+
+    parameters = tuple(get_signature(func).parameters)
+
+    with suppress(TypeError):
+        _parameters[func] = parameters
+
+    return parameters
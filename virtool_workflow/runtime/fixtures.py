@@ -6,6 +6,7 @@ from virtool_workflow.environment import WorkflowEnvironment
 from virtool_workflow.execution.run_in_executor import (run_in_executor,
                                                         thread_pool_executor)
 from virtool_workflow.execution.run_subprocess import run_subprocess
+from virtool_workflow.execution.threads import thread_allocator
 from virtool_workflow.fixtures import FixtureGroup
 from virtool_workflow.results import results
 from virtool_workflow.runtime.providers import providers
@@ -21,9 +22,13 @@ _workflow_fixtures = [
     config.work_path,
     config.mem,
     config.proc,
+    config.preview,
+    config.preview_seed,
+    config.stream_reads,
     run_in_executor,
     thread_pool_executor,
     run_subprocess,
+    thread_allocator,
 ]
 
 workflow = FixtureGroup(
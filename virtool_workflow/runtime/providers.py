@@ -34,14 +34,14 @@ def analysis_provider(job, http, jobs_api_url) -> AnalysisProvider:
 
 
 @providers.fixture
-def hmms_provider(http, jobs_api_url, work_path) -> HMMsProvider:
-    return HMMsProvider(http, jobs_api_url, work_path)
+def hmms_provider(http, jobs_api_url, work_path, thread_allocator) -> HMMsProvider:
+    return HMMsProvider(http, jobs_api_url, work_path, thread_allocator=thread_allocator)
 
 
 @providers.fixture
-def index_provider(job, http, jobs_api_url) -> IndexProvider:
+def index_provider(job, http, jobs_api_url, transfer_limiter) -> IndexProvider:
     try:
-        return IndexProvider(job.args["index_id"], job.args["ref_id"], http, jobs_api_url)
+        return IndexProvider(job.args["index_id"], job.args["ref_id"], http, jobs_api_url, transfer_limiter)
     except KeyError as e:
         key = e.args[0]
 
@@ -63,7 +63,7 @@ def sample_provider(job, http, jobs_api_url) -> SampleProvider:
 
 @providers.fixture
 def subtraction_providers(
-    job, http, jobs_api_url, work_path
+    job, http, jobs_api_url, work_path, transfer_limiter
 ) -> List[SubtractionProvider]:
     ids = job.args["subtraction_id"]
     if isinstance(ids, str) or isinstance(ids, bytes):
@@ -73,6 +73,6 @@ def subtraction_providers(
     subtraction_work_path.mkdir()
 
     return [
-        SubtractionProvider(id_, http, jobs_api_url, subtraction_work_path)
+        SubtractionProvider(id_, http, jobs_api_url, subtraction_work_path, transfer_limiter)
         for id_ in ids
     ]
@@ -0,0 +1,270 @@
+"""
+Read files while they are still downloading.
+
+A :class:`.StreamingDownload` always spools the file to disk. Consumers that read sequentially can start while
+bytes are still arriving, either in a thread using :meth:`.StreamingDownload.open` or in an external program
+through a named pipe using :meth:`.StreamingDownload.fifo`. Consumers that need to seek should wait for the
+complete file using :meth:`.StreamingDownload.wait`.
+
+"""
+import asyncio
+import errno
+import io
+import os
+import threading
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Optional
+
+import aiofiles
+
+#: The number of bytes read at a time.
+CHUNK_SIZE = 1024 * 1024
+
+#: The number of seconds between attempts to open a named pipe before its consumer has opened it.
+FIFO_POLL_INTERVAL = 0.01
+
+
+class StreamingDownload:
+    """
+    A file that is being downloaded to disk and can be read before the download is complete.
+
+    :param path: the path the file is downloaded to
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        #: The number of bytes that have been written to :attr:`path`.
+        self.size = 0
+        #: Set when the download has completed successfully.
+        self.complete = False
+        #: The exception that caused the download to fail.
+        self.error: Optional[BaseException] = None
+
+        #: The task running the download.
+        self.task: Optional[asyncio.Task] = None
+
+        self._condition = threading.Condition()
+        self._finished = asyncio.get_event_loop().create_future()
+
+    @classmethod
+    def from_path(cls, path: Path) -> "StreamingDownload":
+        """
+        Create a completed download for a file that is already on disk.
+
+        :param path: the path to the file
+        :return: the download
+        """
+        download = cls(path)
+        download._advance(path.stat().st_size)
+        download._finish()
+
+        return download
+
+    @property
+    def done(self) -> bool:
+        """Whether the download has finished, successfully or not."""
+        return self.complete or self.error is not None
+
+    def start(self, chunks: AsyncIterable[bytes]) -> "StreamingDownload":
+        """
+        Start downloading the file in the background.
+
+        Use :func:`virtool_workflow.api.streams.iter_chunks` to download a file from the Jobs API.
+
+        :param chunks: the chunks of the file as they are received
+        :return: the download
+        """
+        self.task = asyncio.ensure_future(self.download(chunks))
+
+        # Errors are raised to readers, so the task doesn't need to be awaited.
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+        return self
+
+    async def download(self, chunks: AsyncIterable[bytes]) -> Path:
+        """
+        Write the file to :attr:`path`, making each chunk available to readers as it arrives.
+
+        :param chunks: the chunks of the file as they are received
+        :return: the path to the file
+        """
+        try:
+            async with aiofiles.open(self.path, "wb") as f:
+                async for chunk in chunks:
+                    await f.write(chunk)
+                    await f.flush()
+
+                    self._advance(len(chunk))
+        except BaseException as error:
+            self._finish(error)
+            raise
+
+        self._finish()
+
+        return self.path
+
+    def cancel(self):
+        """Cancel the download if it is running."""
+        if self.task is not None:
+            self.task.cancel()
+
+    def _advance(self, count: int):
+        with self._condition:
+            self.size += count
+            self._condition.notify_all()
+
+    def _finish(self, error: Optional[BaseException] = None):
+        with self._condition:
+            self.complete = error is None
+            self.error = error
+            self._condition.notify_all()
+
+        if not self._finished.done():
+            if error is None:
+                self._finished.set_result(self.path)
+            else:
+                self._finished.set_exception(error)
+
+                # The exception is raised by the download itself, so it doesn't need to be retrieved here.
+                self._finished.exception()
+
+    def _wait_for(self, position: int, stop: Optional[threading.Event] = None) -> int:
+        """
+        Block until there are bytes after ``position``, the download finishes, or ``stop`` is set and return
+        the size.
+
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.size > position or self.done or (stop is not None and stop.is_set())
+            )
+
+            if stop is not None and stop.is_set():
+                return position
+
+            if self.error is not None:
+                raise IOError(f"Download of {self.path.name} failed") from self.error
+
+            return self.size
+
+    async def wait(self) -> Path:
+        """
+        Wait for the download to complete.
+
+        Use this for consumers that need to seek in the file.
+
+        :return: the path to the complete file
+        """
+        return await asyncio.shield(self._finished)
+
+    def _stop(self, stop: threading.Event):
+        with self._condition:
+            stop.set()
+            self._condition.notify_all()
+
+    def open(self) -> BinaryIO:
+        """
+        Open the file for sequential reading while it is downloading.
+
+        Reads block until more data arrives and end-of-file is only reached when the download is complete.
+        Reads should be done in a thread, not on the event loop.
+
+        :return: a binary file object
+        """
+        return io.BufferedReader(_FollowingReader(self), CHUNK_SIZE)
+
+    def _feed(self, fifo_path: Path, stop: threading.Event):
+        # Opening the pipe without blocking lets the feeder give up if the consumer never opens it.
+        while not stop.is_set():
+            try:
+                fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as error:
+                if error.errno != errno.ENXIO:
+                    raise
+
+                stop.wait(FIFO_POLL_INTERVAL)
+        else:
+            return
+
+        os.set_blocking(fd, True)
+
+        with io.BufferedReader(_FollowingReader(self, stop), CHUNK_SIZE) as source:
+            try:
+                with open(fd, "wb") as fifo:
+                    for data in iter(lambda: source.read(CHUNK_SIZE), b""):
+                        fifo.write(data)
+            except BrokenPipeError:
+                # The consumer closed the pipe before reading everything.
+                pass
+
+    @asynccontextmanager
+    async def fifo(self, fifo_path: Path) -> AsyncIterator[Path]:
+        """
+        Expose the file as a named pipe that an external program can read while the file is downloading.
+
+        The pipe is fed from a thread and is removed when the context exits.
+
+        :param fifo_path: the path to create the named pipe at
+        :return: the path to the named pipe
+        :raises IOError: when the download fails
+        """
+        os.mkfifo(fifo_path)
+
+        stop = threading.Event()
+
+        feeder = asyncio.get_running_loop().run_in_executor(None, self._feed, fifo_path, stop)
+
+        async def close():
+            # The consumer is finished, so the feeder shouldn't wait for it or for any more of the download.
+            self._stop(stop)
+
+            try:
+                await feeder
+            finally:
+                fifo_path.unlink()
+
+        try:
+            yield fifo_path
+        except BaseException:
+            with suppress(Exception):
+                await close()
+
+            raise
+
+        await close()
+
+
+class _FollowingReader(io.RawIOBase):
+    """A raw reader that follows a :class:`.StreamingDownload` as it is written."""
+
+    def __init__(self, download: StreamingDownload, stop: Optional[threading.Event] = None):
+        self._download = download
+        self._stop = stop
+        self._file = None
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self._download._wait_for(self._position, self._stop)
+
+        if size <= self._position:
+            return 0
+
+        if self._file is None:
+            self._file = open(self._download.path, "rb", buffering=0)
+
+        count = self._file.readinto(memoryview(buffer)[:size - self._position])
+
+        self._position += count
+
+        return count
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+        super().close()
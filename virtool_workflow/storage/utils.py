@@ -1,6 +1,7 @@
 import asyncio
 import shutil
-from typing import Iterable, Tuple, Callable
+from functools import partial
+from typing import Awaitable, Callable, Dict, Iterable, Tuple
 from pathlib import Path
 from virtool_workflow.execution.run_in_executor import FunctionExecutor
 
@@ -46,3 +47,49 @@ async def move_paths(
     """
 
     await _bulk_apply_to_paths(shutil.move, paths, run_in_executor)
+
+
+class FileFetcher:
+    """
+    Downloads files into a directory the first time they are requested.
+
+    Each file is downloaded at most once, even if several coroutines request it at the same time. A file is
+    downloaded again the next time it is requested if its download failed.
+
+    :param download: a function that downloads the named files into a directory, such as
+        :meth:`.IndexProvider.download`
+    :param path: the directory to download the files to
+    """
+
+    def __init__(self, download: Callable[..., Awaitable], path: Path):
+        self.download = download
+        self.path = path
+        self._tasks: Dict[str, asyncio.Future] = {}
+
+    @property
+    def names(self) -> Iterable[str]:
+        """The names of the files that have been requested."""
+        return self._tasks.keys()
+
+    async def fetch(self, *names: str) -> Path:
+        """
+        Download any of the named files that have not already been requested.
+
+        :param names: the names of the files
+        :return: the directory containing the files
+        """
+        for name in names:
+            if name not in self._tasks:
+                task = asyncio.ensure_future(self.download(self.path, name))
+                task.add_done_callback(partial(self._forget_failed, name))
+
+                self._tasks[name] = task
+
+        # Downloads are shielded so a cancelled caller does not cancel a download other callers are waiting for.
+        await asyncio.gather(*[asyncio.shield(self._tasks[name]) for name in names])
+
+        return self.path
+
+    def _forget_failed(self, name: str, task: asyncio.Future):
+        if (task.cancelled() or task.exception() is not None) and self._tasks.get(name) is task:
+            del self._tasks[name]